@@ -90,8 +90,9 @@
 
 
 import streamlit as st
-from workflow import generate_response
+from workflow import DEFAULT_PATIENT_ID, generate_response_stream
 from datetime import datetime
+from itertools import chain
 
 # --- Streamlit Configuration ---
 st.set_page_config(page_title="Health Tutor Console", layout="wide")
@@ -351,6 +352,8 @@ if "preset_query" not in st.session_state:
     st.session_state.preset_query = None
 if "show_chat" not in st.session_state:
     st.session_state.show_chat = False
+if "patient_id" not in st.session_state:
+    st.session_state.patient_id = DEFAULT_PATIENT_ID
 
 # --- Sidebar: Chat History ---
 with st.sidebar:
@@ -458,10 +461,12 @@ with main_col:
             st.markdown(query)
 
         with st.chat_message("assistant"):
+            # Spinner only until the first token; then the answer streams in
             with st.spinner("Thinking..."):
-                answer = generate_response(query)
+                stream = generate_response_stream(query, st.session_state.patient_id)
+                first_delta = next(stream, "")
 
-            st.markdown(answer)
+            answer = st.write_stream(chain([first_delta], stream))
 
         active_messages.append({"role": "assistant", "content": answer})
         st.session_state.sessions[st.session_state.current_session] = active_messages
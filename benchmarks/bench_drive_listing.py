@@ -0,0 +1,62 @@
+"""
+Benchmark: list-then-fetch vs streaming paginated listing into the fetch engine.
+
+Run from the repo root:
+    python benchmarks/bench_drive_listing.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import drive_manager  # noqa: E402
+import extraction_cache  # noqa: E402
+from benchmarks.fake_drive import FakeDriveService  # noqa: E402
+
+N_FILES = 2500
+PAGE_SIZE = 500
+LATENCY = 0.01  # seconds per simulated download round trip
+LIST_LATENCY = 0.4  # large pages take much longer to list than a small file to download
+WORKERS = 32
+
+
+def fresh_drive():
+    extraction_cache.CACHE_DIR = tempfile.mkdtemp(prefix="extraction-cache-")
+    service = FakeDriveService(latency=LATENCY, list_latency=LIST_LATENCY)
+    for i in range(N_FILES):
+        service.add_file(f"upload-{i}", f"upload_{i}.csv", f"date,steps\n2025-03-01,{i}\n", parents=["patients"])
+    return service
+
+
+def main():
+    service = fresh_drive()
+    single_call = service.files().list(q="'patients' in parents and trashed=false").execute()
+    print(f"single files().list call (old behaviour): {len(single_call['files'])} of {N_FILES} files")
+
+    pool = drive_manager.DriveServicePool(lambda: service)
+    start = time.perf_counter()
+    listed = list(drive_manager.iter_files_in_folder(service, "patients", page_size=PAGE_SIZE))
+    eager = drive_manager.fetch_files_with_content(listed, pool=pool, max_workers=WORKERS)
+    eager_time = time.perf_counter() - start
+
+    service = fresh_drive()
+    pool = drive_manager.DriveServicePool(lambda: service)
+    start = time.perf_counter()
+    streamed = drive_manager.fetch_files_with_content(
+        drive_manager.iter_files_in_folder(service, "patients", page_size=PAGE_SIZE),
+        pool=pool, max_workers=WORKERS,
+    )
+    streamed_time = time.perf_counter() - start
+
+    assert [f["id"] for f, _ in eager] == [f["id"] for f, _ in streamed]
+    assert len(streamed) == N_FILES
+    print(f"{N_FILES} files, page size {PAGE_SIZE}, "
+          f"{LIST_LATENCY * 1000:.0f} ms/page, {LATENCY * 1000:.0f} ms/download")
+    print(f"  list all pages, then fetch: {eager_time:.2f}s")
+    print(f"  streamed pages into fetch:  {streamed_time:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Benchmark: per-call Drive client setup, fresh build() vs DriveServicePool.
+
+Uses the real googleapiclient discovery (static document, no network) with
+anonymous credentials, so it measures exactly the setup work each
+get_drive_service() call used to repeat.
+
+Run from the repo root:
+    python benchmarks/bench_drive_pool.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import google_auth_httplib2  # noqa: E402
+import httplib2  # noqa: E402
+from google.auth.credentials import AnonymousCredentials  # noqa: E402
+from googleapiclient.discovery import build  # noqa: E402
+
+import drive_manager  # noqa: E402
+
+N_CALLS = 50
+
+
+def build_client():
+    http = google_auth_httplib2.AuthorizedHttp(AnonymousCredentials(), http=httplib2.Http())
+    return build("drive", "v3", http=http, cache_discovery=False)
+
+
+def main():
+    start = time.perf_counter()
+    for _ in range(N_CALLS):
+        build_client()
+    fresh_ms = 1000 * (time.perf_counter() - start) / N_CALLS
+
+    pool = drive_manager.DriveServicePool(build_client)
+    for _ in range(N_CALLS):
+        with pool.checkout():
+            pass
+    stats = pool.stats()
+
+    print(f"{N_CALLS} calls")
+    print(f"  before (build per call): {fresh_ms:.2f} ms/call")
+    print(f"  after  (pooled):         {stats['avg_checkout_ms']:.3f} ms/call "
+          f"({stats['builds']} build at {stats['avg_build_ms']:.2f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark: full folder listing vs incremental sync from the Changes feed.
+
+Run from the repo root:
+    python benchmarks/bench_drive_sync.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import drive_manager  # noqa: E402
+import extraction_cache  # noqa: E402
+from benchmarks.fake_drive import FakeDriveService  # noqa: E402
+
+FILES_PER_FOLDER = 1500
+FOLDERS = {"patients": "patient_data", "guidelines": "guidelines", "frameworks": "prompt_framework"}
+
+
+def main():
+    tmp = tempfile.mkdtemp(prefix="drive-sync-")
+    extraction_cache.CACHE_DIR = os.path.join(tmp, "extracted")
+
+    service = FakeDriveService(latency=0.01, list_latency=0.2)
+    for folder in FOLDERS:
+        for i in range(FILES_PER_FOLDER):
+            service.add_file(f"{folder}-{i}", f"{folder}_{i}.txt", f"{folder} {i}", parents=[folder])
+
+    sync = drive_manager.DriveSync(FOLDERS, manifest_path=os.path.join(tmp, "manifest.json"))
+
+    before = service.request_count
+    start = time.perf_counter()
+    first = sync.sync(service)
+    full_time = time.perf_counter() - start
+    full_requests = service.request_count - before
+
+    service.update_file("patients-7", "new reading")
+    service.trash_file("guidelines-3")
+    service.add_file("patients-new", "patients_new.txt", "fresh upload", parents=["patients"])
+    service.add_file("elsewhere", "unrelated.txt", "not synced", parents=["root"])
+
+    # A new process picks up the manifest from disk and only pulls the delta
+    restarted = drive_manager.DriveSync(FOLDERS, manifest_path=os.path.join(tmp, "manifest.json"))
+    before = service.request_count
+    start = time.perf_counter()
+    delta = restarted.sync(service)
+    delta_time = time.perf_counter() - start
+    delta_requests = service.request_count - before
+
+    files = {f["id"]: f for f in restarted.files()}
+    assert first["files"] == 3 * FILES_PER_FOLDER
+    assert "guidelines-3" not in files and "patients-new" in files and "elsewhere" not in files
+    assert files["patients-7"]["md5Checksum"] == service._files["patients-7"]["md5Checksum"]
+    assert len(files) == 3 * FILES_PER_FOLDER
+
+    print(f"{3 * FILES_PER_FOLDER} files across {len(FOLDERS)} folders")
+    print(f"  full sync:  {full_time:.2f}s, {full_requests} requests")
+    print(f"  delta sync: {delta_time:.3f}s, {delta_requests} request(s), "
+          f"{len(delta['changed'])} changed, {len(delta['removed'])} removed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Benchmark: framework matching at 10, 100 and 1000 frameworks.
+
+Synthetic frameworks combine a question type with a condition ("Summarize
+blood pressure trends for hypertension", keywords from both). For each
+library size it times:
+
+- legacy: the previous choose_best_framework loop (strings rebuilt and
+  fuzz.partial_ratio called per framework on every question)
+- index build, FrameworkIndex.match uncached and cached, and match_many
+  (one process.cdist call for the whole batch)
+
+and reports how often the index picks the same framework as an exhaustive
+partial_ratio scan over the same (separator-fixed) strings, i.e. what the
+inverted-index prefilter changes, and how often each method picks the
+framework a synthetic question was generated from.
+
+Run from the repo root:
+    python benchmarks/bench_framework_match.py
+"""
+import os
+import random
+import sys
+import time
+
+from rapidfuzz import fuzz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from framework_matcher import (  # noqa: E402
+    PREFILTER_MIN_FRAMEWORKS, FrameworkIndex, match_string, normalize_query,
+)
+
+SIZES = (10, 100, 1000)
+QUERIES = 300
+
+INTENTS = [
+    ("Summarize health status over the last 30 days", ["summary", "30-day", "health status", "review"]),
+    ("Prepare questions for my doctor visit about", ["appointment", "questions", "doctor visit"]),
+    ("Explain my latest lab results for", ["labs", "lab results", "explain"]),
+    ("Track blood pressure trends for", ["blood pressure", "trend", "readings"]),
+    ("Review medication adherence for", ["medication", "adherence", "missed doses"]),
+    ("Plan meals and diet for", ["diet", "meals", "nutrition"]),
+    ("Exercise and activity guidance for", ["exercise", "steps", "activity"]),
+    ("Check glucose control for", ["glucose", "a1c", "sugar"]),
+    ("Sleep and stress review for", ["sleep", "stress", "fatigue"]),
+    ("Compare this quarter with last quarter for", ["quarter", "compare", "progress"]),
+]
+CONDITIONS = [
+    "hypertension", "type 2 diabetes", "prediabetes", "high cholesterol", "chronic kidney disease",
+    "heart failure", "atrial fibrillation", "obesity", "asthma", "copd", "thyroid disorder", "anemia",
+    "osteoporosis", "arthritis", "depression", "anxiety", "migraine", "sleep apnea", "fatty liver",
+    "gout", "pcos", "pregnancy", "menopause", "older adults", "south asian heart risk",
+    "stroke prevention", "peripheral artery disease", "metabolic syndrome", "kidney stones", "psoriasis",
+    "celiac disease", "ibs", "gerd", "long covid", "post-surgery recovery", "cancer survivorship",
+    "hepatitis", "hiv care", "lupus", "multiple sclerosis", "parkinson's", "dementia care",
+    "smoking cessation", "alcohol reduction", "weight loss", "vitamin d deficiency", "b12 deficiency",
+    "hearing loss", "glaucoma", "diabetic retinopathy", "neuropathy", "dialysis", "transplant care",
+    "sickle cell", "hemochromatosis", "endometriosis", "low testosterone", "adhd", "bipolar disorder",
+    "eating disorders", "chronic pain", "fibromyalgia", "back pain", "allergies", "eczema", "acne",
+    "rosacea", "shingles", "tuberculosis", "malaria", "travel health", "vaccinations", "men's health",
+    "women's health", "teen health", "child growth", "newborn care", "breastfeeding", "fertility",
+    "contraception", "sexual health", "caregiver support", "palliative care", "hospice", "rehab",
+    "sports injury", "concussion", "vertigo", "tinnitus", "dry eye", "dental health", "oral cancer",
+    "skin cancer", "breast cancer", "prostate health", "colon health", "lung health", "liver health",
+    "pancreatitis", "gallstones", "hernia",
+]
+
+
+def synthetic_frameworks(n, rng):
+    combos = [(intent, condition) for condition in CONDITIONS for intent in INTENTS]
+    rng.shuffle(combos)
+    frameworks = []
+    for (name, keywords), condition in combos[:n]:
+        frameworks.append({"name": f"{name} {condition}", "keywords": keywords + [condition]})
+    return frameworks
+
+
+def synthetic_queries(frameworks, rng):
+    fillers = ["can you", "please", "I want to", "help me", "", "quick question:"]
+    queries = []
+    for _ in range(QUERIES):
+        fw = rng.choice(frameworks)
+        words = (fw["name"] + " " + rng.choice(fw["keywords"])).split()
+        rng.shuffle(words)
+        queries.append((f"{rng.choice(fillers)} {' '.join(words[:rng.randint(3, 7)])}".strip(), fw))
+    return queries
+
+
+def legacy_choose(user_query, frameworks):
+    best_score, best_framework = -1, frameworks[0]
+    for fw in frameworks:
+        match = fw.get("name", "") + " ".join(fw.get("keywords", []))
+        score = fuzz.partial_ratio(user_query.lower(), match.lower())
+        if score > best_score:
+            best_score, best_framework = score, fw
+    return best_framework
+
+
+def exhaustive_choose(user_query, choices, frameworks):
+    scores = [fuzz.partial_ratio(normalize_query(user_query), c) for c in choices]
+    return frameworks[scores.index(max(scores))]
+
+
+def per_query_us(fn, queries):
+    started = time.perf_counter()
+    for query in queries:
+        fn(query)
+    return (time.perf_counter() - started) / len(queries) * 1e6
+
+
+def main():
+    rng = random.Random(7)
+    print(f"{'frameworks':>10} {'legacy':>10} {'build':>9} {'uncached':>10} {'cached':>8} "
+          f"{'batch':>8} {'candidates':>10} {'same pick':>9} source hit (legacy / exhaustive / index)")
+    for size in SIZES:
+        frameworks = synthetic_frameworks(size, rng)
+        sources = synthetic_queries(frameworks, rng)
+        queries = [query for query, _ in sources]
+
+        legacy = per_query_us(lambda q: legacy_choose(q, frameworks), queries)
+        started = time.perf_counter()
+        index = FrameworkIndex(frameworks)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        uncached = per_query_us(lambda q: index._score(normalize_query(q)), queries)
+        for query in queries:
+            index.match(query)
+        cached = per_query_us(index.match, queries)
+
+        started = time.perf_counter()
+        index.match_many(queries)
+        batch = (time.perf_counter() - started) / len(queries) * 1e6
+
+        candidates = size
+        if size >= PREFILTER_MIN_FRAMEWORKS:
+            candidates = sum(len(c) if (c := index.candidates(normalize_query(q))) is not None else size
+                             for q in queries) / len(queries)
+        choices = [match_string(fw) for fw in frameworks]
+        same = sum(index.match(q)[0] is exhaustive_choose(q, choices, frameworks) for q in queries) / len(queries)
+        hits = [sum(choose(q) is fw for q, fw in sources) / len(sources) for choose in (
+            lambda q: legacy_choose(q, frameworks), lambda q: exhaustive_choose(q, choices, frameworks),
+            lambda q: index.match(q)[0])]
+        print(f"{size:>10} {legacy:>8.0f}µs {build_ms:>7.1f}ms {uncached:>8.0f}µs {cached:>6.1f}µs "
+              f"{batch:>6.0f}µs {candidates:>10.0f} {same:>9.0%} " + " / ".join(f"{h:.0%}" for h in hits))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark: full-generation FileSearch call vs retrieval-only call.
+
+Uses a stub genai client that returns the same response shape as
+google-genai (candidates[0].grounding_metadata.grounding_chunks plus
+usage_metadata) and sleeps in proportion to the tokens it "generates", using
+typical gemini-2.5-flash throughput. No API key needed.
+
+Run from the repo root:
+    python benchmarks/bench_gemini_retrieval.py
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import workflow  # noqa: E402
+
+RETRIEVAL_SECONDS = 0.6     # server-side file search, same for both modes
+SECONDS_PER_TOKEN = 0.004   # ~250 tokens/s generation
+NATURAL_ANSWER_TOKENS = 1400
+THINKING_TOKENS = 600
+N_CALLS = 5
+
+
+class StubModels:
+    def __init__(self):
+        self.usage = []
+
+    def generate_content(self, model, contents, config):
+        output_tokens = min(NATURAL_ANSWER_TOKENS, config.max_output_tokens)
+        thinking = config.thinking_config
+        thinking_tokens = 0 if thinking and thinking.thinking_budget == 0 else THINKING_TOKENS
+        time.sleep(RETRIEVAL_SECONDS + (output_tokens + thinking_tokens) * SECONDS_PER_TOKEN)
+
+        chunks = [
+            SimpleNamespace(retrieved_context=SimpleNamespace(
+                title="ADA OlderAdults Diabetes 2025 dc25s013.pdf", text=f"Guideline passage {i}."))
+            for i in range(12)
+        ]
+        usage = SimpleNamespace(
+            prompt_token_count=len(contents) // 4,
+            candidates_token_count=output_tokens,
+            thoughts_token_count=thinking_tokens,
+        )
+        self.usage.append(usage)
+        return SimpleNamespace(
+            candidates=[SimpleNamespace(grounding_metadata=SimpleNamespace(grounding_chunks=chunks))],
+            usage_metadata=usage,
+            text="DONE",
+        )
+
+
+def run(retrieval_only):
+    models = StubModels()
+    workflow.genai_client = SimpleNamespace(models=models)
+    latencies = []
+    for _ in range(N_CALLS):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            chunks = workflow.retrieve_guideline_chunks_gemini(
+                "Summarize health status over the last 30 days", "patient context " * 40,
+                retrieval_only=retrieval_only,
+            )
+        latencies.append(time.perf_counter() - start)
+        assert len(chunks) == 12
+    tokens = sum(u.candidates_token_count + u.thoughts_token_count for u in models.usage)
+    return sum(latencies) / N_CALLS, tokens / N_CALLS
+
+
+def main():
+    full_latency, full_tokens = run(retrieval_only=False)
+    minimal_latency, minimal_tokens = run(retrieval_only=True)
+    print(f"avg over {N_CALLS} calls (output + thinking tokens)")
+    print(f"  full generation: {full_latency:.2f}s, {full_tokens:.0f} tokens")
+    print(f"  retrieval-only:  {minimal_latency:.2f}s, {minimal_tokens:.0f} tokens")
+    print(f"  saved per request: {full_latency - minimal_latency:.2f}s, {full_tokens - minimal_tokens:.0f} tokens")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Benchmark: token cost of the patient data formats, on every patient's files in user_data/.
+
+- verbose: the previous format (CSV as "ROW n: key=value, ..." lines, JSON
+  through json.dumps(indent=2))
+- compact: patient_data's header-once tables and pruned JSON outline
+
+Every file is checked for information loss: compact tables are parsed back
+and compared row by row with the CSV, and every non-empty JSON leaf must be
+present in the outline.
+
+Token counts are estimated twice: chars / 4 (what prompt_budget uses) and a
+BPE-style pre-tokenizer count, which is closer to real tokenizers for
+whitespace- and punctuation-heavy text. With ANTHROPIC_API_KEY set, exact
+counts come from the Anthropic token counting endpoint.
+
+Run from the repo root:
+    python benchmarks/bench_patient_format.py
+"""
+import json
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from guideline_dedup import estimate_tokens  # noqa: E402
+from patient_data import (  # noqa: E402
+    CELL_SEPARATOR, DITTO, csv_to_llm_text, json_to_compact_text, load_patient_records,
+    prune_empty, rows_to_compact_text,
+)
+
+PATIENT_DATA_FOLDER = "user_data"
+PRETOKEN_RE = re.compile(r" ?[A-Za-z]+| ?\d{1,3}| ?[^\sA-Za-z\d]+|\s+")
+CELL_SPLIT_RE = re.compile(r" (?<!\\)\| ")
+
+
+def bpe_estimate(text):
+    return len(PRETOKEN_RE.findall(text))
+
+
+def exact_counter():
+    if not os.environ.get("ANTHROPIC_API_KEY"):
+        return None
+    from anthropic import Anthropic
+
+    client = Anthropic()
+
+    def count(text):
+        return client.messages.count_tokens(
+            model="claude-sonnet-4-20250514",
+            messages=[{"role": "user", "content": text}],
+        ).input_tokens
+    return count
+
+
+def _unescape(cell):
+    return DITTO if cell == "\\" + DITTO else cell.replace("\\|", "|")
+
+
+def parse_compact_table(text):
+    """Inverse of rows_to_compact_text (for the lossless check)."""
+    constants, columns, rows = {}, [], []
+    for line in text.split("\n"):
+        if line.startswith("SAME FOR ALL ROWS: "):
+            for pair in CELL_SPLIT_RE.split(line[len("SAME FOR ALL ROWS: "):]):
+                key, value = pair.split("=", 1)
+                constants[key] = _unescape(value)
+        elif line.startswith("COLUMNS: "):
+            columns = line[len("COLUMNS: "):].split(CELL_SEPARATOR)
+        elif line.startswith("(") and line.endswith("same as the row above)"):
+            continue
+        else:
+            cells = CELL_SPLIT_RE.split(line)
+            cells += [""] * (len(columns) - len(cells))
+            row = dict(constants)
+            for column, cell in zip(columns, cells):
+                row[column] = rows[-1][column] if cell == DITTO else _unescape(cell)
+            rows.append(row)
+    return rows
+
+
+def _leaves(value, path=()):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _leaves(item, path + (key,))
+    elif isinstance(value, list):
+        for item in value:
+            yield from _leaves(item, path)
+    else:
+        yield path, value
+
+
+def check_lossless(record, compact):
+    if record.table is not None:
+        table = record.table
+        expected = [{c: row.get(c, "") for c in table.fieldnames} for row in table.rows + table.undated]
+        parsed = [{c: row.get(c, "") for c in table.fieldnames} for row in parse_compact_table(compact)]
+        return expected == parsed
+    if record.data is not None:
+        for path, leaf in _leaves(prune_empty(record.data)):
+            rendered = leaf if isinstance(leaf, str) else json.dumps(leaf)
+            if rendered not in compact or (path and path[-1] not in compact):
+                return False
+        return True
+    return compact == record.text
+
+
+def formats(record):
+    if record.table is not None:
+        with open(record.path, encoding="utf-8") as f:
+            verbose = csv_to_llm_text(f.read())
+        table = record.table
+        compact = rows_to_compact_text(table.fieldnames, table.rows + table.undated, table.date_column)
+    elif record.data is not None:
+        verbose = json.dumps(record.data, indent=2)
+        compact = json_to_compact_text(record.data)
+    else:
+        verbose = compact = record.text
+    return verbose, compact
+
+
+def main():
+    count_exact = exact_counter()
+    records = sorted(
+        (record for entry in os.scandir(PATIENT_DATA_FOLDER) if entry.is_dir()
+         for record in load_patient_records(entry.path)),
+        key=lambda r: r.name,
+    )
+    totals = {"verbose": [0, 0, 0], "compact": [0, 0, 0]}
+
+    header = f"{'file':32} {'format':8} {'chars':>7} {'chars/4':>8} {'bpe est':>8}"
+    print(header + (f" {'exact':>7}" if count_exact else "") + "  lossless")
+    for record in records:
+        verbose, compact = formats(record)
+        lossless = check_lossless(record, compact)
+        for name, text in (("verbose", verbose), ("compact", compact)):
+            counts = [len(text), estimate_tokens(text), bpe_estimate(text)]
+            totals[name] = [a + b for a, b in zip(totals[name], counts)]
+            line = f"{record.name:32} {name:8} {counts[0]:7} {counts[1]:8} {counts[2]:8}"
+            if count_exact:
+                line += f" {count_exact(text):7}"
+            if name == "compact":
+                line += f"  {'yes' if lossless else 'NO'}"
+            print(line)
+
+    print()
+    for name, (chars, est, bpe) in totals.items():
+        print(f"{'TOTAL':32} {name:8} {chars:7} {est:8} {bpe:8}")
+    saved = 1 - totals["compact"][2] / totals["verbose"][2]
+    print(f"\nCompact format: {saved:.0%} fewer tokens (BPE estimate), "
+          f"{1 - totals['compact'][0] / totals['verbose'][0]:.0%} fewer characters")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark: PDF extraction on the bundled guideline PDFs.
+
+Compares the old page-by-page `text +=` loop, the page-parallel engine and
+the lazy mode's time to first page.
+
+Run from the repo root:
+    python benchmarks/bench_pdf_extract.py
+"""
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pdfplumber  # noqa: E402
+
+import pdf_extract  # noqa: E402
+
+GUIDELINE_DIR = "guidelines"
+
+
+def old_extract(path):
+    text = ""
+    with pdfplumber.open(path) as pdf:
+        for page in pdf.pages:
+            extracted = page.extract_text()
+            if extracted:
+                text += extracted + "\n"
+    return text.strip()
+
+
+def main():
+    paths = sorted(p for p in glob.glob(os.path.join(GUIDELINE_DIR, "*.pdf")) if not os.path.basename(p).startswith("Copy of"))
+    pdf_extract.get_pool()  # start workers outside the timed region
+
+    total_old = total_new = 0.0
+    for path in paths:
+        start = time.perf_counter()
+        expected = old_extract(path)
+        old_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        text = pdf_extract.extract_pdf_text(path)
+        new_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pages = pdf_extract.iter_pdf_pages(path, parallel=True)
+        next(pages)
+        first_page = time.perf_counter() - start
+        pages.close()
+
+        assert text == expected, f"text mismatch for {path}"
+        total_old += old_time
+        total_new += new_time
+        print(f"{os.path.basename(path)[:60]:60s} {pdf_extract.count_pages(path):4d} pages  "
+              f"old {old_time:6.2f}s  parallel {new_time:6.2f}s  first page {first_page:5.2f}s")
+
+    print(f"total: old {total_old:.2f}s, parallel {total_new:.2f}s "
+          f"({total_old / total_new:.1f}x, {pdf_extract.PDF_WORKERS} workers)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark: per-delta cost of the streaming safety linter.
+
+Builds a ~400-word answer in the framework's structure (with alarm words,
+value judgments, citations and the disclaimer), splits it into deltas of
+about one token (4 characters) and times:
+
+- SafetyLinter.feed per delta, and with the CitationFormatter in front of
+  it as in generate_response_stream
+- rescanning the whole answer so far on every delta, for comparison
+
+and checks that the streamed output equals lint_text on the whole answer.
+
+Run from the repo root:
+    python benchmarks/bench_safety_linter.py
+"""
+import ast
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from citations import CitationFormatter  # noqa: E402
+from safety_linter import SafetyLinter, SafetyRules, lint_text  # noqa: E402
+
+DELTA_CHARS = 4
+RUNS = 200
+GUIDELINE_MAP = {
+    "AHA_HBP": {"short": "AHA_HBP", "full": "AHA/ACC High Blood Pressure Guideline"},
+    "ADA_GG": {"short": "ADA_GG", "full": "6. Glycemic Goals and Hypoglycemia - Standards of Care in Diabetes - 2025"},
+}
+
+
+def framework_text():
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "frameworks.py")
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    data = next(ast.literal_eval(node.value) for node in tree.body if isinstance(node, ast.Assign))
+    return data[0]["content"]
+
+
+def synthetic_answer(rules):
+    body = ("- Your evening blood pressure ranged from 128/82 to 141/90 mmHg over the last 30 days, "
+            "a worrisome pattern compared with the morning readings [AHA_HBP]. Glucose stayed in the "
+            "normal range on most days with good consistency in tracking [ADA_GG].\n\n")
+    return ("Over the last 30 days you tracked blood pressure and glucose daily.\n\n"
+            "**What's Working for You**\n\n" + body * 3
+            + "**What Needs Attention**\n\n" + body * 3
+            + "**Would You Like**\n\n1. An explanation of any of the trends I listed?\n\n"
+            + "2. A summary for a 60-day time period?\n\n" + rules.disclaimer + "\n")
+
+
+def per_delta_us(fn, deltas):
+    started = time.perf_counter()
+    for _ in range(RUNS):
+        fn(deltas)
+    return (time.perf_counter() - started) / RUNS / len(deltas) * 1e6
+
+
+def linter_only(rules):
+    def run(deltas):
+        linter = SafetyLinter(rules)
+        out = [linter.feed(d) for d in deltas]
+        out.append(linter.finish())
+        return "".join(out)
+    return run
+
+
+def with_citations(rules):
+    def run(deltas):
+        formatter, linter = CitationFormatter(GUIDELINE_MAP), SafetyLinter(rules)
+        out = [linter.feed(formatter.feed(d)) for d in deltas]
+        out.append(linter.feed(formatter.finish()) + linter.finish())
+        return "".join(out)
+    return run
+
+
+def rescan_everything(rules):
+    def run(deltas):
+        text = ""
+        for d in deltas:
+            text += d
+            rules.pattern.findall(text)
+    return run
+
+
+def main():
+    started = time.perf_counter()
+    rules = SafetyRules(framework_text())
+    print(f"🧱 Rules compiled in {(time.perf_counter() - started) * 1000:.2f} ms: "
+          f"{len(rules.categories)} terms, limit {rules.word_limit} words")
+    answer = synthetic_answer(rules)
+    deltas = [answer[i:i + DELTA_CHARS] for i in range(0, len(answer), DELTA_CHARS)]
+    print(f"📝 Answer: {len(answer.split())} words, {len(deltas)} deltas of {DELTA_CHARS} chars")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        same = linter_only(rules)(deltas) == lint_text(answer, rules)
+        timings = [(name, per_delta_us(fn(rules), deltas)) for name, fn in (
+            ("linter", linter_only), ("citations + linter", with_citations), ("rescan whole answer", rescan_everything))]
+    for name, us in timings:
+        print(f"⏱️ {name:>20}: {us:.2f} µs per delta")
+    print(f"🧩 Streamed output equals the whole-text result: {'yes' if same else 'NO'}")
+
+    linter = SafetyLinter(rules)
+    linter.feed(answer)
+    linter.finish()
+
+
+if __name__ == "__main__":
+    main()
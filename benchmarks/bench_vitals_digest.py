@@ -0,0 +1,76 @@
+"""
+Benchmark: trend digest over a large synthetic wearable export.
+
+Builds minute-level readings for a year (several metrics, ~2.6M readings
+in total) as arrays and times the digest for the 30/90/365-day windows.
+Also times the row → array conversion for a 100k-row DatedTable, which is
+the path the CSV files in user_data/ take.
+
+Run from the repo root:
+    python benchmarks/bench_vitals_digest.py
+"""
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from patient_data import DatedTable  # noqa: E402
+from vitals_digest import MetricSeries, digest_text, series_from_table  # noqa: E402
+
+END = date(2025, 11, 25)
+DAYS = 365
+READINGS_PER_DAY = 1440             # one reading a minute
+METRICS = {"heart_rate": (72, 8), "glucose_mg_dl": (125, 25), "spo2": (97, 1.2),
+           "systolic_bp": (124, 9), "steps_per_minute": (8, 12)}
+TABLE_ROWS = 100_000
+
+
+def synthetic_series(rng):
+    start = END.toordinal() - DAYS + 1
+    ordinals = np.repeat(np.arange(start, start + DAYS), READINGS_PER_DAY)
+    series = []
+    for name, (mean, sd) in METRICS.items():
+        drift = np.linspace(0, sd / 2, len(ordinals))
+        values = np.clip(rng.normal(mean, sd, len(ordinals)) + drift, 0, None)
+        series.append(MetricSeries(name, "", "vital", ordinals, values, None))
+    return series
+
+
+def synthetic_table(rng):
+    fieldnames = ["date", "systolic_bp", "diastolic_bp", "resting_pulse"]
+    rows = []
+    for i in range(TABLE_ROWS):
+        day = END - timedelta(days=i % DAYS)
+        rows.append({"date": day.isoformat(), "systolic_bp": str(int(rng.normal(124, 9))),
+                     "diastolic_bp": str(int(rng.normal(80, 6))), "resting_pulse": str(int(rng.normal(74, 5)))})
+    return DatedTable(fieldnames, rows)
+
+
+def main():
+    rng = np.random.default_rng(7)
+    series = synthetic_series(rng)
+    readings = sum(len(s.values) for s in series)
+
+    digest_text(series, END)  # warm-up
+    start = time.perf_counter()
+    text = digest_text(series, END, windows=(30, 90, 365))
+    elapsed = time.perf_counter() - start
+    print(text)
+    print(f"\n📈 Digest of {readings:,} readings ({len(series)} metrics × 3 windows): {elapsed * 1000:.1f} ms")
+
+    table = synthetic_table(rng)
+    start = time.perf_counter()
+    table_series = series_from_table(table)
+    convert = time.perf_counter() - start
+    start = time.perf_counter()
+    digest_text(table_series, END, windows=(30, 90, 365))
+    table_digest = time.perf_counter() - start
+    print(f"📋 {TABLE_ROWS:,}-row DatedTable: rows → arrays {convert * 1000:.0f} ms, digest {table_digest * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Benchmark: streaming rollups of a synthetic multi-million-row wearable export.
+
+Writes a two-year export with a reading every 20 seconds (~3.2M rows,
+heart rate / glucose / SpO2 / steps) and measures:
+
+- the first full ingest (rows/s and peak memory growth)
+- an incremental ingest after one more day is appended, and a call with
+  nothing new
+- the digest and prompt rendering from the rollups
+- that ingesting with tiny chunks gives the same rollups (chunk boundaries
+  don't change the result), and that the reading count matches the file
+
+and compares peak memory with the previous whole-file path (csv.DictReader
+into a DatedTable) on the first TABLE_ROWS rows.
+
+Run from the repo root:
+    python benchmarks/bench_wearable_rollups.py [days]
+"""
+import csv
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from io import StringIO
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from patient_data import DatedTable, PatientFile, render_rollup, window_bounds  # noqa: E402
+from vitals_digest import digest_records  # noqa: E402
+from wearable_rollups import ingest_csv, rollup_folder  # noqa: E402
+
+DAYS = 730
+SECONDS_PER_READING = 20
+START = datetime(2024, 1, 1)
+FIELDNAMES = ["timestamp", "heart_rate", "glucose_mg_dl", "spo2", "steps"]
+TABLE_ROWS = 300_000
+
+
+def write_days(f, rng, first_day, days):
+    per_day = 86400 // SECONDS_PER_READING
+    for d in range(first_day, first_day + days):
+        day = START + timedelta(days=d)
+        stamp = day.strftime("%Y-%m-%dT")
+        seconds = np.arange(per_day) * SECONDS_PER_READING
+        heart = rng.normal(72, 8, per_day).round().astype(int)
+        glucose = (rng.normal(125, 25, per_day) + d * 0.01).round(1)
+        spo2 = rng.normal(97, 1.2, per_day).clip(80, 100).round(1)
+        steps = rng.poisson(3, per_day)
+        f.write("".join(
+            f"{stamp}{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d},{h},{g},{o},{st}\n"
+            for s, h, g, o, st in zip(seconds.tolist(), heart.tolist(), glucose.tolist(),
+                                      spo2.tolist(), steps.tolist())
+        ))
+    return per_day * days
+
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def same_rollups(a, b):
+    for period in ("daily", "weekly", "monthly"):
+        for metric, table in getattr(a, period).items():
+            other = getattr(b, period)[metric]
+            if not all(np.allclose(x, y) for x, y in zip(table, other)):
+                return False
+    return True
+
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else DAYS
+    rng = np.random.default_rng(7)
+    folder = tempfile.mkdtemp()
+    path = os.path.join(folder, "wearable_export.csv")
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(",".join(FIELDNAMES) + "\n")
+            rows = write_days(f, rng, 0, days)
+        size_mb = os.path.getsize(path) / 1e6
+        print(f"📝 Synthetic export: {rows:,} rows, {size_mb:.0f} MB")
+
+        rss_before = max_rss_mb()
+        started = time.perf_counter()
+        rollups = ingest_csv(path)
+        full = time.perf_counter() - started
+        print(f"🌊 Full ingest: {full:.2f}s ({rows / full:,.0f} rows/s, {size_mb / full:.0f} MB/s), "
+              f"peak RSS +{max(0, max_rss_mb() - rss_before):.0f} MB")
+        assert rollups.readings == rows, (rollups.readings, rows)
+
+        with open(path, "a", encoding="utf-8") as f:
+            appended = write_days(f, rng, days, 1)
+        started = time.perf_counter()
+        rollups = ingest_csv(path)
+        print(f"➕ Incremental ingest of {appended:,} appended rows: {(time.perf_counter() - started) * 1000:.0f} ms")
+        assert rollups.readings == rows + appended
+
+        started = time.perf_counter()
+        ingest_csv(path)
+        print(f"💤 Nothing new: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+        record = PatientFile(rollups.name, ".csv", None, None, None, None, path, rollups)
+        start, end = window_bounds([record], 30)
+        started = time.perf_counter()
+        digest = digest_records([record], end, windows=(30, 90, 365))
+        text = render_rollup(rollups, start, end)
+        print(f"📈 Digest + rendering: {(time.perf_counter() - started) * 1000:.1f} ms, "
+              f"~{(len(text) + len(digest)) // 4:,} tokens for the prompt")
+
+        shutil.rmtree(rollup_folder(path))
+        small_chunks = ingest_csv(path, chunk_bytes=64 * 1024)
+        print(f"🧩 64 KB chunks give the same rollups: {'yes' if same_rollups(rollups, small_chunks) else 'NO'}")
+
+        with open(path, encoding="utf-8") as f:
+            head = "".join(f.readline() for _ in range(TABLE_ROWS + 1))
+        tracemalloc.start()
+        DatedTable(FIELDNAMES, list(csv.DictReader(StringIO(head))))
+        whole_file = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        slice_path = os.path.join(folder, "slice.csv")
+        with open(slice_path, "w", encoding="utf-8") as f:
+            f.write(head)
+        del head
+        tracemalloc.start()
+        ingest_csv(slice_path)
+        streamed = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"🧠 Peak memory for {TABLE_ROWS:,} rows: whole file into DatedTable {whole_file / 1e6:.0f} MB, "
+              f"streamed {streamed / 1e6:.0f} MB")
+
+        print()
+        print(digest)
+        print(text[:1500])
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
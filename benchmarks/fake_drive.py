@@ -0,0 +1,173 @@
+"""
+In-memory stand-in for the Drive v3 client used by drive_manager.
+
+Only the calls drive_manager makes are implemented, including the Changes
+feed: every add/update/trash/delete is appended to a change log and page
+tokens are positions in that log. Every HTTP round trip
+sleeps for `latency` seconds so concurrency gains show up the same way they
+would against the real API.
+"""
+import hashlib
+import threading
+import time
+from datetime import datetime, timezone
+
+
+class _FakeResponse(dict):
+    def __init__(self, status, headers):
+        super().__init__(headers)
+        self.status = status
+
+
+class _FakeHttp:
+    def __init__(self, drive):
+        self._drive = drive
+
+    def request(self, uri, method="GET", headers=None, **kwargs):
+        self._drive._round_trip()
+        file_id = uri.split("/", 1)[1]
+        content = self._drive._files[file_id]["content"]
+        return _FakeResponse(200, {"content-length": str(len(content))}), content
+
+
+class _MediaRequest:
+    """Just enough of googleapiclient.http.HttpRequest for MediaIoBaseDownload."""
+
+    def __init__(self, drive, file_id):
+        self.uri = f"media/{file_id}"
+        self.headers = {}
+        self.http = _FakeHttp(drive)
+
+
+class _Execute:
+    def __init__(self, drive, fn, latency=None):
+        self._drive = drive
+        self._fn = fn
+        self._latency = latency
+
+    def execute(self):
+        self._drive._round_trip(self._latency)
+        return self._fn()
+
+
+class _Files:
+    def __init__(self, drive):
+        self._drive = drive
+
+    def list(self, q="", fields=None, pageSize=100, pageToken=None, **kwargs):
+        folder_id = q.split("'")[1] if "' in parents" in q else None
+
+        def run():
+            matches = [
+                self._drive._metadata(f) for f in self._drive._files.values()
+                if not f["trashed"] and (folder_id is None or folder_id in f["parents"])
+            ]
+            start = int(pageToken or 0)
+            page = matches[start:start + pageSize]
+            result = {"files": page}
+            if start + pageSize < len(matches):
+                result["nextPageToken"] = str(start + pageSize)
+            return result
+
+        return _Execute(self._drive, run, self._drive.list_latency)
+
+    def get(self, fileId, fields=None, **kwargs):
+        return _Execute(self._drive, lambda: self._drive._metadata(self._drive._files[fileId]))
+
+    def get_media(self, fileId, **kwargs):
+        return _MediaRequest(self._drive, fileId)
+
+    def export(self, fileId, mimeType, **kwargs):
+        return _MediaRequest(self._drive, fileId)
+
+    def delete(self, fileId, **kwargs):
+        return _Execute(self._drive, lambda: self._drive.delete(fileId))
+
+
+class FakeDriveService:
+    """Mimics `build("drive", "v3", ...)` for a fixed set of in-memory files."""
+
+    def __init__(self, latency=0.05, list_latency=None):
+        self.latency = latency
+        self.list_latency = latency if list_latency is None else list_latency
+        self.request_count = 0
+        self._files = {}
+        self._changes = []  # (file_id, metadata or None when removed)
+        self._lock = threading.Lock()
+
+    def _round_trip(self, latency=None):
+        with self._lock:
+            self.request_count += 1
+        latency = self.latency if latency is None else latency
+        if latency:
+            time.sleep(latency)
+
+    @staticmethod
+    def _metadata(f):
+        return {k: f[k] for k in ("id", "name", "mimeType", "modifiedTime", "md5Checksum", "size", "parents", "trashed")}
+
+    def add_file(self, file_id, name, content, mime_type="text/plain", parents=("root",)):
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        self._files[file_id] = {
+            "id": file_id,
+            "name": name,
+            "mimeType": mime_type,
+            "content": content,
+            "parents": list(parents),
+            "trashed": False,
+            "modifiedTime": datetime.now(timezone.utc).isoformat(),
+            "md5Checksum": hashlib.md5(content).hexdigest(),
+            "size": str(len(content)),
+        }
+        self._record(file_id)
+        return self._files[file_id]
+
+    def update_file(self, file_id, content):
+        f = self._files[file_id]
+        return self.add_file(file_id, f["name"], content, f["mimeType"], f["parents"])
+
+    def trash_file(self, file_id):
+        self._files[file_id]["trashed"] = True
+        self._record(file_id)
+
+    def delete(self, file_id):
+        self._files.pop(file_id, None)
+        self._record(file_id)
+        return {}
+
+    def _record(self, file_id):
+        f = self._files.get(file_id)
+        self._changes.append((file_id, self._metadata(f) if f else None))
+
+    def files(self):
+        return _Files(self)
+
+    def changes(self):
+        return _Changes(self)
+
+
+class _Changes:
+    def __init__(self, drive):
+        self._drive = drive
+
+    def getStartPageToken(self, **kwargs):
+        return _Execute(self._drive, lambda: {"startPageToken": str(len(self._drive._changes))})
+
+    def list(self, pageToken, pageSize=100, fields=None, **kwargs):
+        def run():
+            start = int(pageToken)
+            log = self._drive._changes
+            page = log[start:start + pageSize]
+            changes = [
+                {"fileId": file_id, "removed": meta is None, **({"file": meta} if meta else {})}
+                for file_id, meta in page
+            ]
+            result = {"changes": changes}
+            if start + pageSize < len(log):
+                result["nextPageToken"] = str(start + pageSize)
+            else:
+                result["newStartPageToken"] = str(len(log))
+            return result
+
+        return _Execute(self._drive, run)
@@ -0,0 +1,198 @@
+"""
+Citation numbering and the Source Citations section, done in code.
+
+Claude cites retrieved guidelines with the GUIDELINE_MAP abbreviation each
+chunk is labelled with ("[AHA_HBP]"; "[2 AHA_HBP]" and "[AHA_HBP, ADA_CDRM]"
+are accepted too). CitationFormatter then:
+
+- renumbers known abbreviations by first appearance: "[1 AHA_HBP]",
+  "[2 ADA_CDRM]", the same number every time a source comes back
+- drops any Source Citations list the model wrote anyway and renders its
+  own ("- [n ABBR] Full Document Name", in numerical order) just before the
+  educational disclaimer, or at the end
+
+The disclaimer is recognized by the first words of the framework's own
+disclaimer text ("This information is educational"), with or without an
+"Important Note:" / "Reminder:" label in front; a label alone on its line
+counts when the next line opens the disclaimer. A body line such as
+"Important note: take readings at the same time each day" stays where it is.
+
+It works on a stream of text deltas: text is passed through as it arrives,
+holding back only an unclosed "[..." tag, the start of a line that may
+still turn into a Source Citations heading or the disclaimer, and the
+disclaimer itself (which has to come after the list). Tags with unknown
+abbreviations are left as they are.
+
+The chunk labels come from guideline_resolver.GuidelineResolver.
+"""
+import re
+
+MAX_TAG_CHARS = 60
+CITATION_HEADING = "source citation"
+DISCLAIMER_LABELS = ("important note", "reminder")
+DISCLAIMER_OPENING = "this information is educational"
+DISCLAIMER_OPENING_WORDS = 4
+
+TAG_RE = re.compile(r"\[([^\[\]\n]{1,%d})\]" % MAX_TAG_CHARS)
+TAG_PART_RE = re.compile(r"^\s*(?:#?\s*\d+\s*)?([A-Za-z][A-Za-z0-9_]*)\s*$")
+HEADING_PREFIX_RE = re.compile(r"^[\s#*_>•●○■-]+")
+CITATION_ENTRY_RE = re.compile(r"^[\s*•●○■-]*\[\s*#?\s*\d*\s*[A-Za-z][A-Za-z0-9_]*\s*\]")
+WORD_RE = re.compile(r"[a-z0-9']+")
+LABEL_WORDS_RE = re.compile(r"^(?:(?:%s)(?: |$))+" % "|".join(DISCLAIMER_LABELS))
+
+
+def _words(text):
+    return " ".join(WORD_RE.findall(text.lower().replace("’", "'")))
+
+
+def disclaimer_opening(disclaimer):
+    """The first words of a disclaimer text, which identify the disclaimer line."""
+    words = _words(LABEL_WORDS_RE.sub("", _words(disclaimer or ""))).split()
+    return " ".join(words[:DISCLAIMER_OPENING_WORDS]) or DISCLAIMER_OPENING
+
+
+def disclaimer_start(text, final=False, opening=DISCLAIMER_OPENING):
+    """Whether text (from the start of a line) opens the disclaimer; None while it could still."""
+    line, newline, rest = text.partition("\n")
+    complete = bool(newline) or final
+    words = _words(line)
+    unlabelled = LABEL_WORDS_RE.sub("", words)
+    if unlabelled != words and not unlabelled:
+        # A label alone on its line: the next line decides
+        if not complete:
+            return None
+        if not rest.strip():
+            return True if final else None
+        return disclaimer_start(rest.lstrip(), final, opening)
+    if (unlabelled + " ").startswith(opening + " "):
+        return True
+    if not complete and any(start.startswith(unlabelled) for start in (opening,) + DISCLAIMER_LABELS):
+        return None
+    return False
+
+
+def _heading_kind(text, final, opening):
+    """'citations', 'disclaimer' or 'text' for the line text starts; None while it could still be either."""
+    line, newline, _ = text.partition("\n")
+    head = HEADING_PREFIX_RE.sub("", line).lower()
+    if head.startswith(CITATION_HEADING):
+        return "citations"
+    disclaimer = disclaimer_start(text, final, opening)
+    if disclaimer is None:
+        return None
+    if disclaimer:
+        return "disclaimer"
+    if not (newline or final) and CITATION_HEADING.startswith(head):
+        return None
+    return "text"
+
+
+class CitationFormatter:
+    """Renumbers citation tags in a (streamed) answer and renders the Source Citations section."""
+
+    def __init__(self, guideline_map, disclaimer=None):
+        self.sources = {key.upper(): data for key, data in guideline_map.items()}
+        self.disclaimer_opening = disclaimer_opening(disclaimer)
+        self.numbers = {}          # abbreviation → number, in order of first appearance
+        self.unknown = []
+        self._buffer = ""
+        self._line_start = True
+        self._mode = "text"        # "text", "citations" (model's own list, dropped) or "tail" (disclaimer, held)
+        self._tail = []
+        self._trailing_newlines = 0   # at the end of the text passed on so far
+
+    def _number(self, abbreviation):
+        if abbreviation not in self.numbers:
+            self.numbers[abbreviation] = len(self.numbers) + 1
+        return self.numbers[abbreviation]
+
+    def _replace_tag(self, match):
+        parts = re.split(r"[,;]", match.group(1))
+        abbreviations = []
+        for part in parts:
+            part_match = TAG_PART_RE.match(part)
+            if not part_match or part_match.group(1).upper() not in self.sources:
+                if part_match and part_match.group(1).isupper() and part_match.group(1) not in self.unknown:
+                    self.unknown.append(part_match.group(1))
+                return match.group(0)
+            abbreviations.append(part_match.group(1).upper())
+        return " ".join(f"[{self._number(a)} {a}]" for a in dict.fromkeys(abbreviations))
+
+    def _emit(self, text, out):
+        text = TAG_RE.sub(self._replace_tag, text)
+        if self._mode == "tail":
+            self._tail.append(text)
+        elif text:
+            out.append(text)
+            stripped = text.rstrip("\n")
+            self._trailing_newlines = len(text) - len(stripped) + (self._trailing_newlines if not stripped else 0)
+
+    def _drain(self, final):
+        out = []
+        while self._buffer:
+            line, newline, rest = self._buffer.partition("\n")
+            if self._line_start and self._mode == "citations" and not newline and not final:
+                break  # whether the model's list goes on depends on the whole line
+            if self._line_start:
+                kind = _heading_kind(self._buffer, final, self.disclaimer_opening)
+                if kind is None:
+                    break
+                if kind == "citations":
+                    self._mode = "citations"
+                elif kind == "disclaimer":
+                    self._mode = "tail"
+                elif self._mode == "citations" and line.strip() and not CITATION_ENTRY_RE.match(line):
+                    self._mode = "text"
+                self._line_start = False
+
+            if self._mode == "citations":
+                if not newline and not final:
+                    break
+                self._buffer, self._line_start = rest, True
+                continue
+
+            if not newline and not final:
+                # Hold an unclosed tag until its "]" arrives
+                start = line.rfind("[")
+                if start >= 0 and "]" not in line[start:] and len(line) - start <= MAX_TAG_CHARS:
+                    self._emit(line[:start], out)
+                    self._buffer = line[start:]
+                else:
+                    self._emit(line, out)
+                    self._buffer = ""
+                break
+
+            self._emit(line + newline, out)
+            self._buffer, self._line_start = rest, bool(newline)
+        return "".join(out)
+
+    def feed(self, text):
+        """Processed text that is safe to show now."""
+        self._buffer += text
+        return self._drain(final=False)
+
+    def citation_section(self):
+        if not self.numbers:
+            return ""
+        lines = [f"- [{n} {a}] {self.sources[a]['full'].strip()}" for a, n in self.numbers.items()]
+        return "**Source Citations**\n\n" + "\n".join(lines)
+
+    def finish(self):
+        """The rest of the answer: remaining text, the Source Citations section, then the held disclaimer."""
+        out = self._drain(final=True)
+        section = self.citation_section()
+        tail = "".join(self._tail)
+        if section:
+            out += "\n" * max(0, 2 - self._trailing_newlines) + section + "\n"
+            tail = "\n" + tail.lstrip("\n") if tail else ""
+        if self.unknown:
+            print(f"⚠️ Citation tags not in GUIDELINE_MAP left as written: {', '.join(self.unknown)}")
+        if self.numbers:
+            print(f"📚 Citations: {', '.join(f'{n} {a}' for a, n in self.numbers.items())}")
+        return out + tail
+
+
+def format_citations(text, guideline_map, disclaimer=None):
+    """Whole-text version of CitationFormatter."""
+    formatter = CitationFormatter(guideline_map, disclaimer)
+    return formatter.feed(text) + formatter.finish()
@@ -1,11 +1,21 @@
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload
 from google.oauth2 import service_account
+import google_auth_httplib2
+import httplib2
 import os
 import io
 import json
+import time
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeout
 import streamlit as st
 
+import extraction_cache
+from pdf_extract import extract_pdf_text, get_pool
+
 
 # SAFE initialization for Streamlit Cloud
 for key in ["cached_guidelines", "cached_frameworks", "cached_patient_files"]:
@@ -25,43 +35,208 @@ SCOPES = ["https://www.googleapis.com/auth/drive"]
 # ----------------------------------------------------------------------
 # 2. Authentication
 # ----------------------------------------------------------------------
+HTTP_TIMEOUT_SECONDS = 60
+DRIVE_POOL_MAX_IDLE = 8
+
+_credentials = None
+_credentials_lock = threading.Lock()
+
+
+def get_drive_credentials():
+    """Parses the service account from Streamlit Secrets once per process."""
+    global _credentials
+    with _credentials_lock:
+        if _credentials is None:
+            service_account_info = json.loads(st.secrets["GOOGLE_SERVICE_ACCOUNT"])
+            _credentials = service_account.Credentials.from_service_account_info(
+                service_account_info, scopes=SCOPES
+            )
+        return _credentials
+
+
 def get_drive_service():
-    """Loads Google service account from Streamlit Secrets."""
+    """
+    Builds a new Drive client on the shared credentials.
+    Prefer `DRIVE_POOL.checkout()`, which reuses clients and their connections.
+    """
     try:
-        service_account_info = json.loads(st.secrets["GOOGLE_SERVICE_ACCOUNT"])
-        creds = service_account.Credentials.from_service_account_info(
-            service_account_info, scopes=SCOPES
+        # Each client gets its own httplib2.Http: they are not thread-safe.
+        # Shared credentials mean the access token is refreshed once for all.
+        http = google_auth_httplib2.AuthorizedHttp(
+            get_drive_credentials(), http=httplib2.Http(timeout=HTTP_TIMEOUT_SECONDS)
         )
-        service = build("drive", "v3", credentials=creds)
+        service = build("drive", "v3", http=http, cache_discovery=False)
         return service
     except Exception as e:
         print(f"Error initializing Google Drive service: {e}")
         return None
 
 
+class DriveServicePool:
+    """
+    Process-wide pool of Drive clients.
+
+    A checked-out client is used by one thread at a time and goes back to the
+    pool afterwards, keeping its keep-alive connection for the next caller.
+    Lives at module level, so it survives Streamlit reruns and is shared by
+    every session in the process.
+    """
+
+    def __init__(self, factory, max_idle=DRIVE_POOL_MAX_IDLE):
+        self._factory = factory
+        self._max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+        self._stats = {"checkouts": 0, "builds": 0, "build_seconds": 0.0, "checkout_seconds": 0.0}
+
+    @contextmanager
+    def checkout(self):
+        start = time.perf_counter()
+        with self._lock:
+            service = self._idle.pop() if self._idle else None
+
+        built = service is None
+        if built:
+            service = self._factory()
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._stats["checkout_seconds"] += elapsed
+            if built:
+                self._stats["builds"] += 1
+                self._stats["build_seconds"] += elapsed
+
+        try:
+            yield service
+        finally:
+            if service is not None:
+                with self._lock:
+                    if len(self._idle) < self._max_idle:
+                        self._idle.append(service)
+
+    def stats(self):
+        """Setup cost per call: a fresh build vs the pooled average."""
+        with self._lock:
+            s = dict(self._stats)
+        s["avg_build_ms"] = 1000 * s["build_seconds"] / s["builds"] if s["builds"] else 0.0
+        s["avg_checkout_ms"] = 1000 * s["checkout_seconds"] / s["checkouts"] if s["checkouts"] else 0.0
+        return s
+
+
+DRIVE_POOL = DriveServicePool(get_drive_service)
+
+
 # ----------------------------------------------------------------------
 # 3. File Listing
 # ----------------------------------------------------------------------
-def api_get_files_in_folder(service, folder_id):
-    """Retrieves metadata for non-trashed files within a specific folder ID."""
+LIST_PAGE_SIZE = 1000  # Drive's maximum for files().list
+FILE_LIST_FIELDS = ("id", "name", "mimeType", "modifiedTime", "md5Checksum")
+
+
+def iter_files_in_folder(service, folder_id, fields=FILE_LIST_FIELDS, page_size=LIST_PAGE_SIZE):
+    """
+    Yields metadata for non-trashed files in a folder, following every page.
+
+    Only `fields` are requested. The next page is fetched in the background
+    while the current one is being consumed, so callers can start working on
+    page one before page two arrives. `service` must not be used elsewhere
+    until the generator is exhausted or closed.
+    """
     if not service:
-        return []
+        return
 
     query = f"'{folder_id}' in parents and trashed=false"
+    field_spec = f"nextPageToken, files({', '.join(fields)})"
+
+    def fetch_page(page_token):
+        return (
+            service.files()
+            .list(q=query, fields=field_spec, pageSize=page_size, pageToken=page_token)
+            .execute()
+        )
 
-    results = (
-        service.files()
-        .list(q=query, fields="files(id, name, mimeType, modifiedTime)")
-        .execute()
-    )
+    with ThreadPoolExecutor(max_workers=1) as prefetcher:
+        page = fetch_page(None)
+        while True:
+            page_token = page.get("nextPageToken")
+            next_page = prefetcher.submit(fetch_page, page_token) if page_token else None
 
-    return results.get("files", [])
+            yield from page.get("files", [])
+
+            if next_page is None:
+                return
+            page = next_page.result()
+
+
+def api_get_files_in_folder(service, folder_id, fields=FILE_LIST_FIELDS):
+    """Retrieves metadata for non-trashed files within a specific folder ID."""
+    return list(iter_files_in_folder(service, folder_id, fields=fields))
 
 
 # ----------------------------------------------------------------------
 # 4. File Content Extraction (TXT + DOCX + GOOGLE DOCS + PDF + fallback)
 # ----------------------------------------------------------------------
-def api_get_file_content(service, file_id, mime_type):
+DOCX_MIME_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+PDF_MIME_TYPE = "application/pdf"
+
+# Formats whose extraction is CPU-bound and worth moving to a process pool
+# (PDFs split themselves into page ranges on it, see pdf_extract)
+CPU_HEAVY_MIME_TYPES = {DOCX_MIME_TYPE, PDF_MIME_TYPE}
+
+
+def api_download_file_bytes(service, file_id, mime_type):
+    """
+    Downloads the raw bytes of a file.
+    Google Docs are exported as plain text, everything else is fetched as-is.
+    """
+    if mime_type.startswith("application/vnd.google-apps"):
+        request = service.files().export(fileId=file_id, mimeType="text/plain")
+    else:
+        request = service.files().get_media(fileId=file_id)
+
+    fh = io.BytesIO()
+    downloader = MediaIoBaseDownload(fh, request)
+    done = False
+    while not done:
+        status, done = downloader.next_chunk()
+
+    return fh.getvalue()
+
+
+def extract_text_from_bytes(raw, mime_type, pdf_workers=None):
+    """
+    Turns downloaded bytes into text.
+    Handles:
+    - DOCX → python-docx extraction
+    - PDF → pdfplumber extraction
+    - Google Docs export, TXT or any unknown text → decode bytes
+
+    Kept free of Drive/Streamlit state so it can run in a worker process.
+    `pdf_workers` is passed on to extract_pdf_text (1: this process only).
+    """
+    if mime_type == DOCX_MIME_TYPE:
+        from docx import Document
+        doc = Document(io.BytesIO(raw))
+        return "\n".join([p.text for p in doc.paragraphs])
+
+    if mime_type == PDF_MIME_TYPE:
+        return extract_pdf_text(raw, workers=pdf_workers)
+
+    return raw.decode("utf-8", errors="ignore")
+
+
+def _describe_failure(mime_type):
+    if mime_type.startswith("application/vnd.google-apps"):
+        return "Error exporting Google Doc"
+    if mime_type == DOCX_MIME_TYPE:
+        return "Error extracting DOCX"
+    if mime_type == PDF_MIME_TYPE:
+        return "Error extracting PDF"
+    return "Error retrieving file"
+
+
+def api_get_file_content(service, file_id, mime_type, version=None):
     """
     Downloads the content of a file.
     Handles:
@@ -69,123 +244,337 @@ def api_get_file_content(service, file_id, mime_type):
     - DOCX → python-docx extraction
     - PDF → pdfplumber extraction
     - TXT or any unknown text → decode bytes
+
+    When `version` (md5Checksum or modifiedTime) is given, the extracted text
+    is served from / stored in the shared on-disk extraction cache.
     """
     if not service:
         return ""
 
-    # -------------------------------------------------------------
-    # (A) GOOGLE DOCS EXPORT
-    # -------------------------------------------------------------
-    if mime_type.startswith("application/vnd.google-apps"):
-        try:
-            request = service.files().export(
-                fileId=file_id, mimeType="text/plain"
-            )
-            fh = io.BytesIO()
-            downloader = MediaIoBaseDownload(fh, request)
-            done = False
-            while not done:
-                status, done = downloader.next_chunk()
-
-            return fh.getvalue().decode("utf-8", errors="ignore")
-
-        except Exception as e:
-            print(f"Error exporting Google Doc {file_id}: {e}")
-            return ""
-
+    cached = extraction_cache.get(file_id, version)
+    if cached is not None:
+        return cached
 
-    # -------------------------------------------------------------
-    # (B) DOCX EXTRACTION
-    # -------------------------------------------------------------
-    if mime_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-        try:
-            request = service.files().get_media(fileId=file_id)
-            fh = io.BytesIO()
-            downloader = MediaIoBaseDownload(fh, request)
+    try:
+        raw = api_download_file_bytes(service, file_id, mime_type)
+        text = extract_text_from_bytes(raw, mime_type)
+    except Exception as e:
+        print(f"{_describe_failure(mime_type)} {file_id}: {e}")
+        return ""
 
-            done = False
-            while not done:
-                status, done = downloader.next_chunk()
+    extraction_cache.put(file_id, version, text)
+    return text
 
-            from docx import Document
-            doc = Document(io.BytesIO(fh.getvalue()))
-            full_text = "\n".join([p.text for p in doc.paragraphs])
-            return full_text
 
-        except Exception as e:
-            print(f"Error extracting DOCX {file_id}: {e}")
-            return ""
+# ----------------------------------------------------------------------
+# 4b. Concurrent Fetch Engine
+# ----------------------------------------------------------------------
+FETCH_MAX_WORKERS = 8          # concurrent Drive downloads
+FETCH_TIMEOUT_SECONDS = 60     # per file, download + extraction
 
+def _fetch_one(pool, file, extract_pool, started):
+    """
+    Extract one file in a worker thread, via the disk cache or a fresh download.
+    PDFs are extracted from here so pdf_extract can spread large ones over
+    the shared process pool by page range; a DOCX is one task on that pool.
+    """
+    started.append(time.monotonic())  # the per-file timeout runs from here, not from queueing
+    file_id, mime_type = file["id"], file["mimeType"]
+    version = extraction_cache.file_version(file)
 
-    # -------------------------------------------------------------
-    # (C) PDF EXTRACTION USING pdfplumber  ✅ NEW
-    # -------------------------------------------------------------
-    if mime_type == "application/pdf":
-        try:
-            request = service.files().get_media(fileId=file_id)
-            fh = io.BytesIO()
-            downloader = MediaIoBaseDownload(fh, request)
+    cached = extraction_cache.get(file_id, version)
+    if cached is not None:
+        return cached
 
-            done = False
-            while not done:
-                status, done = downloader.next_chunk()
+    try:
+        with pool.checkout() as service:
+            if not service:
+                return ""
+            raw = api_download_file_bytes(service, file_id, mime_type)
+
+        if extract_pool is not None and mime_type == DOCX_MIME_TYPE:
+            text = extract_pool.submit(extract_text_from_bytes, raw, mime_type).result()
+        else:
+            text = extract_text_from_bytes(raw, mime_type, pdf_workers=None if extract_pool is not None else 1)
+    except Exception as e:
+        print(f"{_describe_failure(mime_type)} {file_id}: {e}")
+        return ""
 
-            import pdfplumber
+    extraction_cache.put(file_id, version, text)
+    return text
 
-            text = ""
-            with pdfplumber.open(io.BytesIO(fh.getvalue())) as pdf:
-                for page in pdf.pages:
-                    extracted = page.extract_text()
-                    if extracted:
-                        text += extracted + "\n"
 
-            return text.strip()
+def fetch_files_with_content(
+    files,
+    pool=None,
+    max_workers=FETCH_MAX_WORKERS,
+    timeout=FETCH_TIMEOUT_SECONDS,
+    extract_in_processes=True,
+):
+    """
+    Fetches the text of many Drive files at once.
 
-        except Exception as e:
-            print(f"Error extracting PDF {file_id}: {e}")
-            return ""
+    `files` may be a list or a lazy iterator such as iter_files_in_folder():
+    each file is submitted as soon as it is yielded, so downloads start while
+    later listing pages are still in flight.
 
+    Downloads overlap on a bounded thread pool, each worker borrowing its own
+    client from `pool` (DRIVE_POOL by default); PDF/DOCX extraction runs on
+    pdf_extract's shared process pool so it does not hold the GIL. Returns (file, text) pairs in
+    input order. A file that fails or exceeds `timeout` seconds yields "".
 
-    # -------------------------------------------------------------
-    # (D) DEFAULT BINARY/TEXT FALLBACK
-    # -------------------------------------------------------------
+    Files with the same md5Checksum (e.g. "X.pdf" and "Copy of X.pdf") are
+    downloaded and extracted once and share the result.
+    """
+    pool = pool or DRIVE_POOL
+
+    extract_pool = None
+    io_pool = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    submitted = []
+    by_checksum = {}
+    duplicates = 0
+    results = []
     try:
-        request = service.files().get_media(fileId=file_id)
-        fh = io.BytesIO()
-        downloader = MediaIoBaseDownload(fh, request)
+        for f in files:
+            checksum = f.get("md5Checksum")
+            if checksum and checksum in by_checksum:
+                submitted.append((f, *by_checksum[checksum]))
+                duplicates += 1
+                continue
+
+            if extract_pool is None and extract_in_processes and f["mimeType"] in CPU_HEAVY_MIME_TYPES:
+                try:
+                    extract_pool = get_pool()
+                except Exception as e:
+                    print(f"⚠️ Process pool unavailable, extracting in threads: {e}")
+                    extract_in_processes = False
+
+            started = []
+            submitted.append((f, io_pool.submit(_fetch_one, pool, f, extract_pool, started), started))
+            if checksum:
+                by_checksum[checksum] = submitted[-1][1:]
+
+        for f, future, started in submitted:
+            while True:
+                remaining = started[0] + timeout - time.monotonic() if started else timeout
+                try:
+                    results.append((f, future.result(timeout=max(0, remaining))))
+                    break
+                except FuturesTimeout:
+                    if started and time.monotonic() >= started[0] + timeout:
+                        print(f"⏱️ Timed out fetching {f.get('name', f['id'])} after {timeout}s")
+                        future.cancel()
+                        results.append((f, ""))
+                        break
+                    # Still queued behind other files when we started waiting
+    finally:
+        # Don't block the caller on stragglers that already timed out
+        io_pool.shutdown(wait=False, cancel_futures=True)
+
+    if duplicates:
+        print(f"🧬 Skipped {duplicates} duplicate files (same md5Checksum)")
+    cache_stats = extraction_cache.stats()
+    print(f"📦 Extraction cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+          f"(hit rate {cache_stats['hit_rate']:.0%})")
+    pool_stats = pool.stats()
+    print(f"🔌 Drive clients: {pool_stats['builds']} built ({pool_stats['avg_build_ms']:.1f} ms each), "
+          f"{pool_stats['checkouts']} checkouts ({pool_stats['avg_checkout_ms']:.2f} ms avg)")
+    return results
+
+
+def fetch_files_concurrently(files, **kwargs):
+    """Same as fetch_files_with_content, but returns only the texts, in order."""
+    return [text for _, text in fetch_files_with_content(files, **kwargs)]
+
+
+def fetch_folder_contents(folder_id, **kwargs):
+    """
+    Streams a folder listing straight into the fetch engine.
+    Returns (file, text) pairs in listing order.
+    """
+    with DRIVE_POOL.checkout() as service:
+        if not service:
+            return []
+        return fetch_files_with_content(iter_files_in_folder(service, folder_id), **kwargs)
+
 
-        done = False
-        while not done:
-            status, done = downloader.next_chunk()
+# ----------------------------------------------------------------------
+# 4c. Incremental Sync (Drive Changes feed)
+# ----------------------------------------------------------------------
+SYNC_MANIFEST_PATH = os.path.join(".cache", "drive_manifest.json")
+SYNCED_FOLDERS = {
+    FOLDER_ID_PATIENT_DATA: "patient_data",
+    FOLDER_ID_GUIDELINES: "guidelines",
+    FOLDER_ID_PROMPT_FRAMEWORK: "prompt_framework",
+}
+SYNC_FILE_FIELDS = FILE_LIST_FIELDS + ("parents",)
+CHANGES_FIELDS = (
+    "nextPageToken, newStartPageToken, "
+    f"changes(fileId, removed, file({', '.join(SYNC_FILE_FIELDS + ('trashed',))}))"
+)
+
+
+class DriveSync:
+    """
+    Keeps a local manifest of the synced folders up to date.
+
+    The first sync lists every folder and records a Changes start-page token.
+    After that each sync is a single changes().list delta: only added, edited,
+    trashed or moved files are touched, and only their extraction cache
+    entries are invalidated (or refreshed). Both kinds of sync work on a copy:
+    the file list, the page token and the sorted view are replaced together
+    once the sync went through, so a sync that fails half-way changes
+    nothing. The manifest is written atomically so other sessions and
+    processes can start from it.
+    """
 
-        return fh.getvalue().decode("utf-8", errors="ignore")
+    def __init__(self, folders=SYNCED_FOLDERS, manifest_path=SYNC_MANIFEST_PATH):
+        self.folders = dict(folders)
+        self.manifest_path = manifest_path
+        self._lock = threading.Lock()
+        self._files = {}
+        self._page_token = None
+        self._sorted = None
+        self._load()
+
+    # -- manifest persistence -------------------------------------------
+    def _load(self):
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Ignoring unreadable Drive manifest: {e}")
+            return
+
+        if manifest.get("folders") != self.folders:
+            print("📁 Synced folders changed, starting a full Drive sync")
+            return
+        self._files = manifest.get("files", {})
+        self._page_token = manifest.get("start_page_token")
+
+    def _save(self):
+        manifest = {
+            "folders": self.folders,
+            "start_page_token": self._page_token,
+            "files": self._files,
+        }
+        directory = os.path.dirname(self.manifest_path) or "."
+        try:
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.manifest_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+            os.replace(tmp_path, self.manifest_path)
+        except OSError as e:
+            print(f"⚠️ Could not save Drive manifest: {e}")
+
+    # -- syncing ----------------------------------------------------------
+    def _source_for(self, file):
+        for parent in file.get("parents", []):
+            if parent in self.folders:
+                return self.folders[parent]
+        return None
 
-    except Exception as e:
-        print(f"Error retrieving file {file_id}: {e}")
-        return ""
+    def _full_sync(self, service):
+        # Take the token first so changes made during the listing are replayed next time
+        token = service.changes().getStartPageToken().execute()["startPageToken"]
+        files = {}
+        for folder_id, source in self.folders.items():
+            for f in iter_files_in_folder(service, folder_id, fields=SYNC_FILE_FIELDS):
+                f["source"] = source
+                files[f["id"]] = f
+        return files, token, [], {"mode": "full", "files": len(files), "changed": [], "removed": []}
+
+    def _delta_sync(self, service):
+        files = dict(self._files)
+        changed, removed, stale = [], [], []  # stale: (file_id, version) extraction cache entries
+        token = page_token = self._page_token
+        while page_token:
+            page = (
+                service.changes()
+                .list(pageToken=page_token, pageSize=LIST_PAGE_SIZE,
+                      fields=CHANGES_FIELDS, includeRemoved=True)
+                .execute()
+            )
+            for change in page.get("changes", []):
+                file_id = change["fileId"]
+                file = change.get("file")
+                old = files.get(file_id)
+                source = self._source_for(file) if file else None
+
+                if change.get("removed") or not file or file.get("trashed") or source is None:
+                    if old is not None:
+                        del files[file_id]
+                        stale.append((file_id, extraction_cache.file_version(old)))
+                        removed.append(old)
+                    continue
+
+                file = {k: file[k] for k in SYNC_FILE_FIELDS if k in file}
+                file["source"] = source
+                if old is not None and extraction_cache.file_version(old) != extraction_cache.file_version(file):
+                    stale.append((file_id, extraction_cache.file_version(old)))
+                files[file_id] = file
+                changed.append(file)
+
+            if "newStartPageToken" in page:
+                token = page["newStartPageToken"]
+            page_token = page.get("nextPageToken")
+
+        return files, token, stale, {"mode": "delta", "files": len(files), "changed": changed, "removed": removed}
+
+    def sync(self, service, refresh=False):
+        """
+        Brings the manifest up to date and returns a summary of what changed.
+        With refresh=True, changed files are re-extracted into the cache right away.
+        """
+        with self._lock:
+            if self._page_token is None:
+                files, token, stale, result = self._full_sync(service)
+            else:
+                files, token, stale, result = self._delta_sync(service)
+
+            # Only a sync that went through gets here: commit everything at once
+            self._files, self._page_token = files, token
+            for file_id, version in stale:
+                extraction_cache.invalidate(file_id, version)
+            if result["mode"] == "full" or result["changed"] or result["removed"]:
+                self._sorted = None
+                self._save()
+
+        print(f"🔄 Drive sync ({result['mode']}): {result['files']} files, "
+              f"{len(result['changed'])} changed, {len(result['removed'])} removed")
+
+        if refresh and result["mode"] == "delta" and result["changed"]:
+            fetch_files_with_content(result["changed"])
+        return result
+
+    def files(self):
+        """All synced files, newest first."""
+        with self._lock:
+            if self._sorted is None:
+                self._sorted = sorted(self._files.values(), key=lambda x: x["modifiedTime"], reverse=True)
+            return [dict(f) for f in self._sorted]
+
+
+DRIVE_SYNC = DriveSync()
 
 
 # ----------------------------------------------------------------------
 # 5. Combine All Files (Patient, Guidelines, Frameworks)
 # ----------------------------------------------------------------------
 def list_data_files():
-    service = get_drive_service()
-    if not service:
-        return []
-
-    patient_data_files = api_get_files_in_folder(service, FOLDER_ID_PATIENT_DATA)
-    guideline_files = api_get_files_in_folder(service, FOLDER_ID_GUIDELINES)
-    framework_files = api_get_files_in_folder(service, FOLDER_ID_PROMPT_FRAMEWORK)
+    with DRIVE_POOL.checkout() as service:
+        if not service:
+            return []
 
-    for f in patient_data_files:
-        f["source"] = "patient_data"
-    for f in guideline_files:
-        f["source"] = "guidelines"
-    for f in framework_files:
-        f["source"] = "prompt_framework"
+        try:
+            DRIVE_SYNC.sync(service)
+        except Exception as e:
+            print(f"Error syncing Drive folders: {e}")
 
-    all_files = patient_data_files + guideline_files + framework_files
-    return sorted(all_files, key=lambda x: x["modifiedTime"], reverse=True)
+    return DRIVE_SYNC.files()
 
 
 # ----------------------------------------------------------------------
@@ -198,18 +587,11 @@ def get_framework_content():
     if "cached_frameworks" in st.session_state and st.session_state["cached_frameworks"] is not None:
         return st.session_state["cached_frameworks"]
 
-    service = get_drive_service()
-    if not service:
-        st.session_state["cached_frameworks"] = ""
-        return ""
-
-    framework_files = api_get_files_in_folder(service, FOLDER_ID_PROMPT_FRAMEWORK)
+    print("Retrieving framework content")
+    framework_files = fetch_folder_contents(FOLDER_ID_PROMPT_FRAMEWORK)
     full_framework_content = []
 
-    for file in framework_files:
-        print(f"Retrieving framework content: {file['name']}")
-        content = api_get_file_content(service, file["id"], file["mimeType"])
-
+    for file, content in framework_files:
         section = (
             f"--- START OF PROMPT FRAMEWORK: {file['name']} ---\n"
             f"{content}\n"
@@ -228,10 +610,13 @@ def get_framework_content():
 # 7. Upload File
 # ----------------------------------------------------------------------
 def upload_file(uploaded_file):
-    service = get_drive_service()
-    if not service:
-        return "Upload failed: Service not initialized."
+    with DRIVE_POOL.checkout() as service:
+        if not service:
+            return "Upload failed: Service not initialized."
+        return _upload_with_service(service, uploaded_file)
 
+
+def _upload_with_service(service, uploaded_file):
     target_folder_id = FOLDER_ID_PATIENT_DATA
     temp_path = uploaded_file.name
 
@@ -258,15 +643,15 @@ def upload_file(uploaded_file):
 # 8. Delete File
 # ----------------------------------------------------------------------
 def delete_file(file_id):
-    service = get_drive_service()
-    if not service:
-        return
+    with DRIVE_POOL.checkout() as service:
+        if not service:
+            return
 
-    try:
-        service.files().delete(fileId=file_id).execute()
-        print(f"File ID {file_id} deleted.")
-    except Exception as e:
-        print(f"Error deleting file {file_id}: {e}")
+        try:
+            service.files().delete(fileId=file_id).execute()
+            print(f"File ID {file_id} deleted.")
+        except Exception as e:
+            print(f"Error deleting file {file_id}: {e}")
 def get_guideline_filenames():
     # ✅ SAFE access
     cached = st.session_state.get("cached_guidelines")
@@ -277,9 +662,9 @@ def get_guideline_filenames():
 
     print("📁 Fetching guideline filenames from Drive")
 
-    service = get_drive_service()
-    if not service:
-        return []
+    with DRIVE_POOL.checkout() as service:
+        if not service:
+            return []
 
     files = []  # fetch from Drive here
 
@@ -292,16 +677,10 @@ def get_all_patient_files():
     if "cached_patient_files" in st.session_state and st.session_state["cached_patient_files"] is not None:
         return st.session_state["cached_patient_files"]
 
-    service = get_drive_service()
-    if not service:
-        st.session_state["cached_patient_files"] = []
-        return []
-
-    patient_files = api_get_files_in_folder(service, FOLDER_ID_PATIENT_DATA)
+    patient_files = fetch_folder_contents(FOLDER_ID_PATIENT_DATA)
 
     result = []
-    for f in patient_files:
-        content = api_get_file_content(service, f["id"], f["mimeType"])
+    for f, content in patient_files:
         result.append({
             "name": f["name"],
             "content": content
@@ -0,0 +1,166 @@
+"""
+On-disk cache for text extracted from Drive files.
+
+Entries are keyed by Drive file id + a version marker (md5Checksum, or
+modifiedTime for Google Docs which have no checksum), so a changed file
+naturally misses. Every Streamlit session and worker process on the machine
+shares the same directory.
+
+- Writes are atomic (temp file + os.replace), so readers never see partial text.
+- The directory is bounded by CACHE_MAX_BYTES; least recently used entries
+  (by file mtime, bumped on every hit) are evicted first.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+
+CACHE_DIR = os.environ.get("HEALTHBOT_CACHE_DIR", os.path.join(".cache", "extracted"))
+CACHE_MAX_BYTES = int(os.environ.get("HEALTHBOT_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+# Scanning the directory on every write is quadratic, so keep a running size
+# estimate and only rescan when it crosses the limit (or every N writes, to
+# account for entries written by other processes).
+RESCAN_EVERY_WRITES = 256
+
+_stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+_stats_lock = threading.Lock()
+_size_estimate = None
+_writes_since_scan = 0
+
+
+def _bump(counter, amount=1):
+    with _stats_lock:
+        _stats[counter] += amount
+
+
+def file_version(file):
+    """Best available version marker from Drive file metadata."""
+    return file.get("md5Checksum") or file.get("modifiedTime")
+
+
+def cache_key(file_id, version):
+    return hashlib.sha256(f"{file_id}:{version}".encode("utf-8")).hexdigest()
+
+
+def _entry_path(file_id, version):
+    return os.path.join(CACHE_DIR, cache_key(file_id, version) + ".txt")
+
+
+def get(file_id, version):
+    """Returns cached text, or None on a miss (or when there is no version)."""
+    if not version:
+        return None
+
+    path = _entry_path(file_id, version)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+    except FileNotFoundError:
+        _bump("misses")
+        return None
+    except OSError as e:
+        print(f"⚠️ Extraction cache read failed for {file_id}: {e}")
+        _bump("misses")
+        return None
+
+    try:
+        os.utime(path)  # mark as recently used for LRU eviction
+    except OSError:
+        pass
+
+    _bump("hits")
+    return text
+
+
+def put(file_id, version, text):
+    """Stores extracted text atomically, then trims the cache to its size limit."""
+    if not version:
+        return
+
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, _entry_path(file_id, version))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    except OSError as e:
+        print(f"⚠️ Extraction cache write failed for {file_id}: {e}")
+        return
+
+    _bump("writes")
+    if _needs_scan(len(text.encode("utf-8"))):
+        _evict()
+
+
+def _needs_scan(written_bytes):
+    global _size_estimate, _writes_since_scan
+    with _stats_lock:
+        _writes_since_scan += 1
+        if _size_estimate is None or _writes_since_scan >= RESCAN_EVERY_WRITES:
+            return True
+        _size_estimate += written_bytes
+        return _size_estimate > CACHE_MAX_BYTES
+
+
+def _evict():
+    """Deletes least recently used entries until the cache fits in CACHE_MAX_BYTES."""
+    global _size_estimate, _writes_since_scan
+    entries = []
+    total = 0
+    try:
+        with os.scandir(CACHE_DIR) as it:
+            for entry in it:
+                if not entry.name.endswith(".txt"):
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue  # removed by another process
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+    except FileNotFoundError:
+        return
+
+    if total <= CACHE_MAX_BYTES:
+        with _stats_lock:
+            _size_estimate, _writes_since_scan = total, 0
+        return
+
+    entries.sort()
+    for _, size, path in entries:
+        if total <= CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+            _bump("evictions")
+        except FileNotFoundError:
+            pass
+        total -= size
+
+    with _stats_lock:
+        _size_estimate, _writes_since_scan = total, 0
+
+
+def invalidate(file_id, version):
+    """Drops one entry, e.g. when a file is deleted or replaced."""
+    if not version:
+        return
+    try:
+        os.remove(_entry_path(file_id, version))
+    except FileNotFoundError:
+        pass
+
+
+def stats():
+    """Hit/miss counters for this process."""
+    with _stats_lock:
+        counters = dict(_stats)
+    lookups = counters["hits"] + counters["misses"]
+    counters["hit_rate"] = counters["hits"] / lookups if lookups else 0.0
+    return counters
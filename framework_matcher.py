@@ -0,0 +1,124 @@
+"""
+Precompiled framework matcher.
+
+choose_best_framework used to rebuild and lowercase every framework's
+"name + keywords" string on every question and score them one by one with
+fuzz.partial_ratio. FrameworkIndex does that work once per framework list:
+
+- choices: "name keyword keyword ..." lowercased, with a space between the
+  name and the keywords (the old string ran them together)
+- a keyword inverted index: word prefix (PREFIX_CHARS) → framework ids; in
+  libraries of PREFILTER_MIN_FRAMEWORKS or more, a question is only scored
+  against the MAX_CANDIDATES frameworks sharing the most words with it
+  ("hypertensive" still finds "hypertension"), and against all of them when
+  it shares none
+- scoring in one rapidfuzz call (process.extractOne, or process.cdist for a
+  batch of questions) instead of a Python loop
+- an LRU of normalized question → decision, so repeated questions cost a
+  dict lookup
+
+Scores are fuzz.partial_ratio as before, and ties still go to the
+framework listed first. See benchmarks/bench_framework_match.py.
+"""
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+PREFIX_CHARS = 5
+PREFILTER_MIN_FRAMEWORKS = 50   # smaller libraries are scored in full, the prefilter wouldn't pay off
+MAX_CANDIDATES = 64             # frameworks sharing the most word prefixes with the question
+MATCH_CACHE_ENTRIES = 1024
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by do for from has have how i in is it its me my of on or over "
+    "the to was what when which with you your".split()
+)
+
+
+def normalize_query(text):
+    return " ".join(text.lower().split())
+
+
+def match_string(framework):
+    """What a question is matched against: the name and keywords, lowercased."""
+    return " ".join([framework.get("name", "")] + list(framework.get("keywords", []))).lower()
+
+
+def index_terms(text):
+    """Word prefixes used by the inverted index (stopwords and 1-character words skipped)."""
+    return {word[:PREFIX_CHARS] for word in WORD_RE.findall(text.lower())
+            if len(word) > 1 and word not in STOPWORDS}
+
+
+class FrameworkIndex:
+    """Frameworks preprocessed once for matching questions against them."""
+
+    def __init__(self, frameworks, cache_entries=MATCH_CACHE_ENTRIES):
+        self.source = frameworks  # the list this index was built from
+        self.frameworks = list(frameworks)
+        self.choices = [match_string(fw) for fw in self.frameworks]
+        postings = {}
+        for i, choice in enumerate(self.choices):
+            for term in index_terms(choice):
+                postings.setdefault(term, []).append(i)
+        self.postings = {term: np.array(ids, dtype=np.int32) for term, ids in postings.items()}
+
+        self.cache_entries = cache_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.frameworks)
+
+    def candidates(self, query):
+        """
+        Ids (in list order) of the MAX_CANDIDATES frameworks sharing the most
+        word prefixes with the question, ties included; None when it shares none.
+        """
+        lists = [self.postings[term] for term in index_terms(query) if term in self.postings]
+        if not lists:
+            return None
+        overlap = np.bincount(np.concatenate(lists), minlength=len(self.choices))
+        if np.count_nonzero(overlap) > MAX_CANDIDATES:
+            cutoff = np.partition(overlap, -MAX_CANDIDATES)[-MAX_CANDIDATES]
+            return np.flatnonzero(overlap >= cutoff)
+        return np.flatnonzero(overlap)
+
+    def _score(self, query):
+        ids = self.candidates(query) if len(self.choices) >= PREFILTER_MIN_FRAMEWORKS else None
+        if ids is None:
+            ids = range(len(self.choices))
+        choices = [self.choices[i] for i in ids]
+        _, score, position = process.extractOne(query, choices, scorer=fuzz.partial_ratio, processor=None)
+        return int(ids[position]), score
+
+    def match(self, user_query):
+        """(framework, score) of the best match; (None, 0) when the index is empty."""
+        if not self.frameworks:
+            return None, 0
+        query = normalize_query(user_query)
+        with self._lock:
+            if query in self._cache:
+                self._cache.move_to_end(query)
+                position, score = self._cache[query]
+                return self.frameworks[position], score
+
+        position, score = self._score(query)
+        with self._lock:
+            self._cache[query] = (position, score)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        return self.frameworks[position], score
+
+    def match_many(self, user_queries, workers=-1):
+        """Best (framework, score) for each question, scoring all of them against every framework in one cdist call."""
+        if not self.frameworks:
+            return [(None, 0) for _ in user_queries]
+        scores = process.cdist([normalize_query(q) for q in user_queries], self.choices,
+                               scorer=fuzz.partial_ratio, processor=None, workers=workers)
+        best = scores.argmax(axis=1)  # first maximum: ties go to the framework listed first
+        return [(self.frameworks[i], float(row[i])) for i, row in zip(best, scores)]
@@ -0,0 +1,329 @@
+"""
+Hot-reloadable registry of compiled prompt frameworks.
+
+Frameworks come from one source:
+
+- ModuleFileSource: the FRAMEWORK_DATA literal in frameworks.py, read with
+  ast.literal_eval (nothing is executed, so it can be re-read at any time)
+- FolderSource: one text file per framework in a local folder
+- DriveFolderSource: one file per framework in the Drive prompt framework
+  folder, listed through the sync manifest and fetched per file, instead
+  of splitting get_framework_content's concatenated string
+
+Framework files may start with metadata lines before the content:
+
+    name: Summarize health status over the last 30 days
+    keywords: summary, 30-day, health status
+    data_window_days: 30
+
+Every framework is validated and compiled once per version: a content hash
+as its version, the static system prompt rendered up front, and the
+dynamic parts ({{today}}, {{window_days}}, {{patient_id}} placeholders)
+split out so they are filled per request in the uncached end of the
+prompt. The compiled frameworks and their FrameworkIndex form an immutable
+FrameworkSnapshot.
+
+current() returns the live snapshot; a request that keeps the snapshot it
+started with keeps that version throughout. When RELOAD_CHECK_SECONDS have
+passed since the last check ended, current() also starts a background
+check of the source's version (never two at once); if it changed, a new
+snapshot is compiled off the request path and swapped in with one
+assignment. A source that fails to load or yields no valid framework
+leaves the previous snapshot in place. A source version counts as seen
+only once it loaded completely: a Drive file whose fetch failed keeps its
+last good text and is fetched again at the next check.
+"""
+import ast
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from framework_matcher import FrameworkIndex
+
+FRAMEWORK_MODULE_PATH = "frameworks.py"
+FRAMEWORK_VARIABLE = "FRAMEWORK_DATA"
+FRAMEWORK_FOLDER = "prompt_frameworks"
+RELOAD_CHECK_SECONDS = 5
+
+DYNAMIC_FIELDS = ("today", "window_days", "patient_id")
+PLACEHOLDER_RE = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+METADATA_RE = re.compile(r"^(name|keywords|data_window_days)\s*:\s*(.*?)\s*$", re.IGNORECASE)
+FRAMEWORK_FILE_SUFFIXES = (".txt", ".md")
+
+
+class FrameworkError(ValueError):
+    pass
+
+
+class IncompleteLoad(FrameworkError):
+    """Some framework files could not be read; `frameworks` has the rest (and last good copies)."""
+
+    def __init__(self, frameworks, failed):
+        super().__init__(f"could not fetch {', '.join(failed)}")
+        self.frameworks = frameworks
+        self.failed = failed
+
+
+def parse_framework_text(name, text):
+    """Framework dict from a text file: optional metadata lines, then the content."""
+    framework = {"name": name}
+    lines = text.lstrip("\ufeff").split("\n")
+    body_start = 0
+    for i, line in enumerate(lines):
+        match = METADATA_RE.match(line)
+        if not match:
+            body_start = i
+            break
+        key, value = match.group(1).lower(), match.group(2)
+        if key == "keywords":
+            framework["keywords"] = [k.strip() for k in value.split(",") if k.strip()]
+        elif key == "data_window_days":
+            framework["data_window_days"] = int(value) if value.isdigit() else value
+        else:
+            framework["name"] = value
+    else:
+        body_start = len(lines)
+    framework["content"] = "\n".join(lines[body_start:]).strip("\n")
+    return framework
+
+
+def validate_framework(framework):
+    """Problems that keep the framework out of the registry ([] if none)."""
+    problems = []
+    if not isinstance(framework.get("name"), str) or not framework["name"].strip():
+        problems.append("missing name")
+    if not isinstance(framework.get("content"), str) or not framework["content"].strip():
+        problems.append("empty content")
+    keywords = framework.get("keywords", [])
+    if not isinstance(keywords, (list, tuple)) or not all(isinstance(k, str) and k for k in keywords):
+        problems.append("keywords must be a list of strings")
+    window = framework.get("data_window_days")
+    if window is not None and (not isinstance(window, int) or isinstance(window, bool) or window <= 0):
+        problems.append("data_window_days must be a positive integer")
+    unknown = set(PLACEHOLDER_RE.findall(framework.get("content") or "")) - set(DYNAMIC_FIELDS)
+    if unknown:
+        problems.append(f"unknown placeholders: {', '.join(sorted(unknown))}")
+    return problems
+
+
+def framework_version(framework):
+    source = json.dumps({k: framework.get(k) for k in ("name", "keywords", "data_window_days", "content")},
+                        sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()[:12]
+
+
+def compile_framework(framework, render_static):
+    """Validated framework with its version, dynamic fields and pre-rendered static system prompt."""
+    problems = validate_framework(framework)
+    if problems:
+        raise FrameworkError("; ".join(problems))
+
+    content = framework["content"]
+    compiled = dict(framework)
+    compiled["keywords"] = list(framework.get("keywords", []))
+    compiled["version"] = framework_version(framework)
+    compiled["dynamic_fields"] = tuple(dict.fromkeys(PLACEHOLDER_RE.findall(content)))
+    # Placeholders become references to the values given at the end of the user's message
+    compiled["content"] = PLACEHOLDER_RE.sub(lambda m: f"[{m.group(1)}]", content)
+    compiled["system_prompt"] = render_static(compiled)
+    return compiled
+
+
+def render_dynamic(framework, values):
+    """The per-request values the framework refers to ("" if it has no placeholders)."""
+    fields = framework.get("dynamic_fields") or ()
+    if not fields:
+        return ""
+    return "CURRENT VALUES: " + "; ".join(f"[{field}] = {values.get(field, '')}" for field in fields)
+
+
+class FrameworkSnapshot:
+    """One immutable version of the framework library."""
+
+    def __init__(self, frameworks, source_version):
+        self.frameworks = tuple(frameworks)
+        self.source_version = source_version
+        self.version = hashlib.sha1(
+            "|".join(fw["version"] for fw in self.frameworks).encode("utf-8")).hexdigest()[:12]
+        self.index = FrameworkIndex(self.frameworks)
+        self.by_name = {fw["name"]: fw for fw in self.frameworks}
+
+    def __len__(self):
+        return len(self.frameworks)
+
+    def __iter__(self):
+        return iter(self.frameworks)
+
+
+EMPTY_SNAPSHOT = FrameworkSnapshot([], None)
+
+
+# ----------------------------------------------------------------------
+# Sources: version() must be cheap, load() returns framework dicts
+# ----------------------------------------------------------------------
+class ModuleFileSource:
+    def __init__(self, path=FRAMEWORK_MODULE_PATH, variable=FRAMEWORK_VARIABLE):
+        self.path = path
+        self.variable = variable
+
+    def __str__(self):
+        return self.path
+
+    def version(self):
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename=self.path)
+        for node in tree.body:
+            if isinstance(node, ast.Assign) and any(
+                    isinstance(target, ast.Name) and target.id == self.variable for target in node.targets):
+                return ast.literal_eval(node.value)
+        raise FrameworkError(f"{self.variable} not found in {self.path}")
+
+
+class FolderSource:
+    def __init__(self, folder=FRAMEWORK_FOLDER):
+        self.folder = folder
+
+    def __str__(self):
+        return f"{self.folder}/"
+
+    def _entries(self):
+        return sorted((e for e in os.scandir(self.folder)
+                       if e.is_file() and e.name.lower().endswith(FRAMEWORK_FILE_SUFFIXES)),
+                      key=lambda e: e.name)
+
+    def version(self):
+        return tuple((e.name, e.stat().st_mtime_ns, e.stat().st_size) for e in self._entries())
+
+    def load(self):
+        frameworks = []
+        for entry in self._entries():
+            with open(entry.path, "r", encoding="utf-8") as f:
+                frameworks.append(parse_framework_text(os.path.splitext(entry.name)[0], f.read()))
+        return frameworks
+
+
+class DriveFolderSource:
+    """
+    Framework files on Drive. `list_files` returns their metadata (e.g. from
+    the sync manifest), `fetch` turns metadata into (file, text) pairs, ""
+    for a file it could not fetch.
+    """
+
+    def __init__(self, list_files, fetch):
+        self.list_files = list_files
+        self.fetch = fetch
+        self._listed = None
+        self._last_good = {}  # file id → last text fetched
+
+    def __str__(self):
+        return "Drive prompt framework folder"
+
+    def version(self):
+        self._listed = self.list_files()
+        return tuple(sorted((f["id"], f.get("modifiedTime"), f.get("md5Checksum")) for f in self._listed))
+
+    def load(self):
+        listed, self._listed = self._listed, None
+        files = sorted(listed if listed is not None else self.list_files(), key=lambda f: f["name"])
+        frameworks, failed = [], []
+        for file, text in self.fetch(files):
+            if not text.strip():
+                failed.append(file["name"])
+                text = self._last_good.get(file["id"], "")
+                if not text:
+                    continue
+            self._last_good[file["id"]] = text
+            frameworks.append(parse_framework_text(os.path.splitext(file["name"])[0], text))
+        listed_ids = {file["id"] for file in files}
+        self._last_good = {file_id: text for file_id, text in self._last_good.items() if file_id in listed_ids}
+        if failed:
+            raise IncompleteLoad(frameworks, failed)
+        return frameworks
+
+
+# ----------------------------------------------------------------------
+# Registry
+# ----------------------------------------------------------------------
+class FrameworkRegistry:
+    def __init__(self, source, render_static, check_seconds=RELOAD_CHECK_SECONDS):
+        self.source = source
+        self.render_static = render_static
+        self.check_seconds = check_seconds
+        self._snapshot = None
+        self._seen_version = None      # last source version loaded completely
+        self._next_check = 0.0
+        self._load_lock = threading.Lock()
+        self._check_lock = threading.Lock()  # held by the one running background check
+
+    def current(self):
+        """The live snapshot; loads it on first use and schedules a background change check when due."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            self.refresh()
+            return self._snapshot
+        if time.monotonic() >= self._next_check and self._check_lock.acquire(blocking=False):
+            threading.Thread(target=self._background_check, name="framework-reload", daemon=True).start()
+        return snapshot
+
+    def _background_check(self):
+        try:
+            self.refresh()
+        finally:
+            self._next_check = time.monotonic() + self.check_seconds
+            self._check_lock.release()
+
+    def refresh(self):
+        """Reloads and swaps in a new snapshot if the source changed; returns the live snapshot."""
+        with self._load_lock:
+            try:
+                version = self.source.version()
+                if self._snapshot is not None and version == self._seen_version:
+                    return self._snapshot
+                frameworks = self.source.load()
+            except IncompleteLoad as e:
+                print(f"⚠️ Frameworks from {self.source} incomplete, retrying at the next check: {e}")
+                frameworks = e.frameworks
+            except Exception as e:
+                print(f"⚠️ Could not load frameworks from {self.source}: {e}")
+                if self._snapshot is None:
+                    self._snapshot = EMPTY_SNAPSHOT
+                return self._snapshot
+            else:
+                self._seen_version = version
+            self._next_check = time.monotonic() + self.check_seconds
+            self._swap(self._compile(frameworks), version)
+            return self._snapshot
+
+    def _compile(self, frameworks):
+        compiled, names = [], set()
+        for framework in frameworks:
+            name = framework.get("name") if isinstance(framework, dict) else None
+            try:
+                if not isinstance(framework, dict):
+                    raise FrameworkError("not a dict")
+                if name in names:
+                    raise FrameworkError("duplicate name")
+                compiled.append(compile_framework(framework, self.render_static))
+                names.add(name)
+            except FrameworkError as e:
+                print(f"⚠️ Framework {name!r} skipped: {e}")
+        return compiled
+
+    def _swap(self, compiled, version):
+        if not compiled and self._snapshot:
+            print(f"⚠️ No valid frameworks in {self.source}, keeping version {self._snapshot.version}")
+            return
+        previous = self._snapshot
+        snapshot = FrameworkSnapshot(compiled, version)
+        if previous is not None and snapshot.version == previous.version:
+            return  # touched but unchanged
+        self._snapshot = snapshot  # single assignment: requests see the old or the new snapshot, never a mix
+        print(f"📚 Frameworks {snapshot.version} loaded from {self.source}: {len(snapshot)} frameworks"
+              + (f" (was {previous.version})" if previous else ""))
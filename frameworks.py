@@ -2,6 +2,7 @@ FRAMEWORK_DATA = [
     {
         "name": "Summarize health status over the last 30 days", 
         "keywords": ["summary", "30-day", "health status", "review"],
+        "data_window_days": 30,
         "content": """
 Context Setting
 
@@ -13,7 +14,7 @@ appointments. You have the knowledge and competencies of a Nurse Practitioner
 ○ Do not diagnose
 ○ If data is missing in one or more categories, acknowledge respectfully and suggest what
 could be tracked
-● Today is November 24, 2025
+● Today's date is stated at the end of the user's message
 Query Processing Section
 ● Question type: General health summary
 ● Timeframe for user data analysis:
@@ -0,0 +1,142 @@
+"""
+Content-hash deduplication of the guideline corpus.
+
+The guideline folder (locally and on Drive) holds byte-identical copies such
+as "X.pdf" and "Copy of X.pdf". Documents are grouped by MD5 of their bytes
+(the same hash Drive reports as md5Checksum, so local files and Drive
+metadata share one key space). Each group collapses into one canonical
+document that lists the other names as aliases; only the canonical one is
+extracted and indexed.
+
+Retrieved chunks are de-duplicated the same way, by a hash of their
+whitespace-normalized text.
+
+Run `python guideline_dedup.py` for a report on the local folder.
+"""
+import hashlib
+import re
+from pathlib import Path
+
+GUIDELINE_FOLDER = "guidelines"
+COPY_PREFIX_RE = re.compile(r"^(copy of\s+)+", re.IGNORECASE)
+CHARS_PER_TOKEN = 4  # rough estimate, good enough for reporting savings
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN
+
+
+def strip_copy_prefix(name):
+    """'Copy of X.pdf' → 'X.pdf'."""
+    return COPY_PREFIX_RE.sub("", name).strip()
+
+
+def file_md5(path, block_size=1 << 20):
+    md5 = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            md5.update(block)
+    return md5.hexdigest()
+
+
+def _canonical_sort_key(name):
+    # Prefer the original over "Copy of ..." names, then the shortest, then alphabetical
+    return (name != strip_copy_prefix(name), len(name), name)
+
+
+def dedupe_files(files):
+    """
+    Collapses files with the same content into canonical documents.
+
+    `files` are dicts with at least "name" and "md5Checksum" (Drive metadata,
+    or local entries from scan_local_guidelines). Files without a checksum
+    (e.g. Google Docs) are kept as-is. Returns (documents, report): each
+    document is the canonical file dict plus an "aliases" list of the other
+    names, in first-seen order of their content.
+    """
+    groups = {}
+    order = []
+    unique = []
+    for f in files:
+        checksum = f.get("md5Checksum")
+        if not checksum:
+            unique.append(dict(f, aliases=[]))
+            continue
+        if checksum not in groups:
+            groups[checksum] = []
+            order.append(checksum)
+        groups[checksum].append(f)
+
+    documents = []
+    bytes_saved = 0
+    for checksum in order:
+        members = sorted(groups[checksum], key=lambda f: _canonical_sort_key(f["name"]))
+        canonical = dict(members[0])
+        canonical["aliases"] = [m["name"] for m in members[1:]]
+        documents.append(canonical)
+        bytes_saved += sum(int(m.get("size") or 0) for m in members[1:])
+
+    documents.extend(unique)
+    report = {
+        "files": len(files),
+        "documents": len(documents),
+        "duplicates_skipped": len(files) - len(documents),
+        "bytes_saved": bytes_saved,
+    }
+    return documents, report
+
+
+def scan_local_guidelines(folder=GUIDELINE_FOLDER):
+    """Hashes every PDF in the local guideline folder and de-duplicates them."""
+    files = []
+    for path in sorted(Path(folder).glob("*.pdf")):
+        files.append({
+            "name": path.name,
+            "path": str(path),
+            "md5Checksum": file_md5(path),
+            "size": path.stat().st_size,
+        })
+    return dedupe_files(files)
+
+
+def _normalize_chunk_text(text):
+    return " ".join(text.split()).lower()
+
+
+def dedupe_chunks(chunks, text_of=lambda c: c["text"]):
+    """
+    Drops retrieved chunks whose text is already present (typically the same
+    passage returned once from "X.pdf" and once from "Copy of X.pdf").
+    Keeps the first, highest-ranked occurrence. Returns (chunks, report).
+    """
+    seen = set()
+    kept = []
+    chars_saved = 0
+    for chunk in chunks:
+        text = text_of(chunk) or ""
+        key = hashlib.md5(_normalize_chunk_text(text).encode("utf-8")).hexdigest()
+        if key in seen:
+            chars_saved += len(text)
+            continue
+        seen.add(key)
+        kept.append(chunk)
+
+    report = {
+        "chunks": len(chunks),
+        "kept": len(kept),
+        "duplicates_dropped": len(chunks) - len(kept),
+        "bytes_saved": chars_saved,
+        "tokens_saved": chars_saved // CHARS_PER_TOKEN,
+    }
+    return kept, report
+
+
+if __name__ == "__main__":
+    documents, report = scan_local_guidelines()
+    for doc in documents:
+        print(f"📄 {doc['name']}")
+        for alias in doc["aliases"]:
+            print(f"     ↳ duplicate: {alias}")
+    print(f"\n{report['files']} files → {report['documents']} unique documents, "
+          f"{report['duplicates_skipped']} duplicates skipped, "
+          f"{report['bytes_saved'] / 1024 / 1024:.1f} MB not extracted or indexed")
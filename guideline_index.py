@@ -0,0 +1,344 @@
+"""
+Local guideline retrieval: an offline alternative to Gemini FileSearch.
+
+The de-duplicated PDFs in guidelines/ are split into overlapping word
+windows and indexed twice:
+
+- a BM25 inverted index (CSR postings: term → chunk ids + term frequencies)
+- a compact vector index: L2-normalised hashed character 4-gram vectors
+  (512 float32 dims; float16 would halve the size but has no BLAS matmul
+  and searches ~60x slower), which catches morphological variants BM25 misses
+  ("hypertensive" vs "hypertension")
+
+Everything is saved as flat .npy arrays plus one UTF-8 text blob under
+INDEX_DIR/<corpus fingerprint>/ and memory-mapped when loaded, so start-up
+does no parsing and the OS page cache is shared between processes. A
+rebuild writes a new directory instead of overwriting files another process
+may have mapped.
+
+search() returns objects shaped like Gemini grounding chunks
+(chunk.retrieved_context.title / .text / .start_offset / .end_offset), so
+generate_response formats both backends the same way.
+
+The app starts the build in a background thread when the index is missing
+or stale and serves without it (or with the previous version) until it is
+ready. Build ahead of time with `python guideline_index.py [query]`.
+"""
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import zlib
+from collections import Counter, namedtuple
+from pathlib import Path
+
+import numpy as np
+
+from guideline_dedup import GUIDELINE_FOLDER, scan_local_guidelines
+from pdf_extract import iter_pdf_pages
+
+INDEX_DIR = os.path.join(".cache", "guideline_index")
+INDEX_FORMAT_VERSION = 2
+
+CHUNK_WORDS = 180
+CHUNK_OVERLAP_WORDS = 40
+VECTOR_DIM = 512
+NGRAM = 4
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+VECTOR_WEIGHT = 0.3  # share of the hybrid score coming from the vector index
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+WORD_SPAN_RE = re.compile(r"\S+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the to was were "
+    "which with this these those not no can may should will than then there their".split()
+)
+
+RetrievedContext = namedtuple("RetrievedContext", "title text start_offset end_offset")
+GroundingChunk = namedtuple("GroundingChunk", "retrieved_context score")
+
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def _hashed_vector(tokens):
+    """Character 4-gram counts hashed into VECTOR_DIM buckets, log-scaled and L2-normalised."""
+    vec = np.zeros(VECTOR_DIM, dtype=np.float32)
+    for token in tokens:
+        padded = f"#{token}#"
+        for i in range(max(1, len(padded) - NGRAM + 1)):
+            vec[zlib.crc32(padded[i:i + NGRAM].encode("utf-8")) % VECTOR_DIM] += 1.0
+    np.log1p(vec, out=vec)
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+def corpus_fingerprint(folder=GUIDELINE_FOLDER):
+    """Cheap version marker for the guideline folder (names, sizes, mtimes)."""
+    entries = sorted(
+        f"{p.name}:{p.stat().st_size}:{p.stat().st_mtime_ns}" for p in Path(folder).glob("*.pdf")
+    )
+    return f"{INDEX_FORMAT_VERSION}-{zlib.crc32(chr(10).join(entries).encode('utf-8')):08x}"
+
+
+# ----------------------------------------------------------------------
+# Building
+# ----------------------------------------------------------------------
+def chunk_document(text):
+    """Overlapping word windows; yields (start_offset, end_offset) into `text`."""
+    spans = [m.span() for m in WORD_SPAN_RE.finditer(text)]
+    step = CHUNK_WORDS - CHUNK_OVERLAP_WORDS
+    for start in range(0, len(spans), step):
+        window = spans[start:start + CHUNK_WORDS]
+        yield window[0][0], window[-1][1]
+        if start + CHUNK_WORDS >= len(spans):
+            break
+
+
+def _version_dir(index_dir, fingerprint):
+    return os.path.join(index_dir, fingerprint)
+
+
+def build_index(folder=GUIDELINE_FOLDER, index_dir=INDEX_DIR):
+    """Extracts, chunks and indexes every unique guideline PDF; returns the index directory."""
+    started = time.perf_counter()
+    fingerprint = corpus_fingerprint(folder)
+    out_dir = _version_dir(index_dir, fingerprint)
+    documents, report = scan_local_guidelines(folder)
+    print(f"📚 Indexing {report['documents']} guideline documents "
+          f"({report['duplicates_skipped']} duplicates skipped)")
+
+    titles, aliases = [], []
+    chunk_rows = []          # (doc, start_offset, end_offset, text_start, text_end, length)
+    chunk_terms = []
+    vectors = []
+    text_parts = []
+    text_pos = 0
+
+    for doc_idx, doc in enumerate(documents):
+        titles.append(doc["name"])
+        aliases.append(doc["aliases"])
+        doc_text = "\n".join(text for _, text in iter_pdf_pages(doc["path"]) if text)
+
+        for start, end in chunk_document(doc_text):
+            chunk_text = doc_text[start:end]
+            tokens = tokenize(chunk_text)
+            if not tokens:
+                continue
+            encoded = chunk_text.encode("utf-8")
+            chunk_rows.append((doc_idx, start, end, text_pos, text_pos + len(encoded), len(tokens)))
+            text_parts.append(encoded)
+            text_pos += len(encoded)
+            chunk_terms.append(Counter(tokens))
+            vectors.append(_hashed_vector(tokens))
+
+    vocab = {}
+    for terms in chunk_terms:
+        for term in terms:
+            vocab.setdefault(term, len(vocab))
+
+    postings = [[] for _ in vocab]
+    for chunk_id, terms in enumerate(chunk_terms):
+        for term, tf in terms.items():
+            postings[vocab[term]].append((chunk_id, tf))
+
+    term_ptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+    term_ptr[1:] = np.cumsum([len(p) for p in postings])
+    post_chunk = np.fromiter((c for p in postings for c, _ in p), dtype=np.int32, count=int(term_ptr[-1]))
+    post_tf = np.fromiter((tf for p in postings for _, tf in p), dtype=np.float32, count=int(term_ptr[-1]))
+
+    n_chunks = len(chunk_rows)
+    doc_freq = np.diff(term_ptr).astype(np.float64)
+    idf = np.log(1 + (n_chunks - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+    chunk_table = np.array(chunk_rows, dtype=np.int64).reshape(-1, 6)
+
+    os.makedirs(out_dir, exist_ok=True)
+    arrays = {
+        "chunk_table": chunk_table,
+        "term_ptr": term_ptr,
+        "post_chunk": post_chunk,
+        "post_tf": post_tf,
+        "idf": idf,
+        "vectors": np.array(vectors, dtype=np.float32).reshape(-1, VECTOR_DIM),
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(out_dir, f"{name}.npy"), array)
+    with open(os.path.join(out_dir, "text.bin"), "wb") as f:
+        f.write(b"".join(text_parts))
+
+    meta = {
+        "fingerprint": fingerprint,
+        "titles": titles,
+        "aliases": aliases,
+        "vocab": vocab,
+        "avg_chunk_len": float(chunk_table[:, 5].mean()) if n_chunks else 0.0,
+    }
+    # meta.json goes last: its presence marks a complete index
+    tmp_path = os.path.join(out_dir, "meta.json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(out_dir, "meta.json"))
+
+    # Older versions can go: processes still mapping them keep their inodes
+    for entry in os.scandir(index_dir):
+        if entry.is_dir() and entry.name != fingerprint:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+    print(f"✅ Indexed {n_chunks} chunks, {len(vocab)} terms in {time.perf_counter() - started:.1f}s")
+    return out_dir
+
+
+# ----------------------------------------------------------------------
+# Loading & searching
+# ----------------------------------------------------------------------
+class GuidelineIndex:
+    """A built index, memory-mapped from one version directory."""
+
+    def __init__(self, index_dir):
+        with open(os.path.join(index_dir, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.fingerprint = meta["fingerprint"]
+        self.titles = meta["titles"]
+        self.aliases = meta["aliases"]
+        self.vocab = meta["vocab"]
+        self.avg_chunk_len = meta["avg_chunk_len"] or 1.0
+
+        def load(name):
+            return np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode="r")
+
+        self.chunk_table = load("chunk_table")
+        self.term_ptr = load("term_ptr")
+        self.post_chunk = load("post_chunk")
+        self.post_tf = load("post_tf")
+        self.idf = load("idf")
+        self.vectors = load("vectors")
+        self.text = np.memmap(os.path.join(index_dir, "text.bin"), dtype=np.uint8, mode="r") \
+            if os.path.getsize(os.path.join(index_dir, "text.bin")) else np.zeros(0, dtype=np.uint8)
+
+        # Per-chunk BM25 length normalisation, computed once
+        lengths = self.chunk_table[:, 5].astype(np.float32)
+        self._length_norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / self.avg_chunk_len)
+
+    def __len__(self):
+        return len(self.chunk_table)
+
+    def _bm25(self, tokens):
+        scores = np.zeros(len(self), dtype=np.float32)
+        for term, qtf in Counter(tokens).items():
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            lo, hi = self.term_ptr[term_id], self.term_ptr[term_id + 1]
+            chunk_ids = self.post_chunk[lo:hi]
+            tf = self.post_tf[lo:hi]
+            scores[chunk_ids] += qtf * self.idf[term_id] * tf * (BM25_K1 + 1) / (tf + self._length_norm[chunk_ids])
+        return scores
+
+    def chunk(self, chunk_id, score=0.0):
+        doc, start, end, text_start, text_end, _ = self.chunk_table[chunk_id]
+        text = bytes(self.text[text_start:text_end]).decode("utf-8")
+        return GroundingChunk(RetrievedContext(self.titles[doc], text, int(start), int(end)), float(score))
+
+    def search(self, query, top_k=10):
+        """Hybrid BM25 + vector search; returns up to top_k grounding-chunk-shaped results."""
+        tokens = tokenize(query)
+        if not tokens or not len(self):
+            return []
+
+        bm25 = self._bm25(tokens)
+        if bm25.max() > 0:
+            bm25 /= bm25.max()
+        cosine = self.vectors @ _hashed_vector(tokens)
+        scores = (1 - VECTOR_WEIGHT) * bm25 + VECTOR_WEIGHT * cosine
+
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [self.chunk(int(i), scores[i]) for i in top if scores[i] > 0]
+
+
+_index = None
+_index_lock = threading.Lock()
+_build_thread = None
+_build_lock = threading.Lock()
+
+
+def _build_and_swap(folder, index_dir):
+    global _index
+    try:
+        index = GuidelineIndex(build_index(folder, index_dir))
+    except Exception as e:
+        print(f"⚠️ Guideline index build failed: {e}")
+        return
+    with _index_lock:
+        _index = index
+
+
+def start_index_build(folder=GUIDELINE_FOLDER, index_dir=INDEX_DIR):
+    """Builds the index in a background thread (one build at a time); returns the thread."""
+    global _build_thread
+    with _build_lock:
+        if _build_thread is None or not _build_thread.is_alive():
+            print("📚 Guideline index missing or stale, building in the background...")
+            _build_thread = threading.Thread(target=_build_and_swap, args=(folder, index_dir),
+                                             name="guideline-index-build", daemon=True)
+            _build_thread.start()
+        return _build_thread
+
+
+def get_index(folder=GUIDELINE_FOLDER, index_dir=INDEX_DIR, wait=False):
+    """
+    Process-wide index for the current guideline folder. A missing or stale
+    index is built in the background; until it's ready this returns the
+    previous index (None on the first build), so requests never wait for
+    PDF extraction. wait=True builds in the calling thread (CLI).
+    """
+    global _index
+    fingerprint = corpus_fingerprint(folder)
+    with _index_lock:
+        if _index is not None and _index.fingerprint == fingerprint:
+            return _index
+        version_dir = _version_dir(index_dir, fingerprint)
+        if os.path.exists(os.path.join(version_dir, "meta.json")):
+            _index = GuidelineIndex(version_dir)  # built earlier or by another process: only mapped
+            return _index
+        current = _index
+
+    if wait:
+        _build_and_swap(folder, index_dir)
+        return _index
+    start_index_build(folder, index_dir)
+    return current
+
+
+def index_version():
+    """Fingerprint of the index search() uses right now ("building" while there is none)."""
+    index = get_index()
+    return index.fingerprint if index is not None else "building"
+
+
+def search(query, top_k=10):
+    index = get_index()
+    if index is None:
+        print("⏳ Guideline index is still being built, no local results yet")
+        return []
+    return index.search(query, top_k=top_k)
+
+
+if __name__ == "__main__":
+    import sys
+
+    index = get_index(wait=True)
+    query = " ".join(sys.argv[1:]) or "blood pressure targets for older adults with diabetes"
+    start = time.perf_counter()
+    results = index.search(query)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(f"\n🔍 {query!r}: {len(results)} chunks in {elapsed_ms:.1f} ms")
+    for c in results:
+        print(f"  [{c.score:.3f}] {c.retrieved_context.title} "
+              f"@{c.retrieved_context.start_offset}-{c.retrieved_context.end_offset}")
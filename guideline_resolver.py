@@ -0,0 +1,193 @@
+"""
+Retrieved guideline title → GUIDELINE_MAP abbreviation.
+
+Retrieved chunks carry the file name of their document as title ("Copy of
+ADA ChronicKidneyDiseaseAndRiskMgmt Diabetes 2025 dc25s011.pdf"). The
+GuidelineResolver is built once from GUIDELINE_MAP and resolves a title in
+three steps:
+
+- normalize: "Copy of" prefixes and the extension dropped, CamelCase split,
+  lowercased, punctuation removed and abbreviations expanded ("Mgmt" →
+  "management"): "ada chronic kidney disease and risk management diabetes
+  2025 dc25s011"
+- patterns: one precompiled alternation of phrases that name exactly one
+  document: document codes, GUIDELINE_ALIASES and the topic of each full
+  name when it has at least MIN_TOPIC_WORDS distinctive words ("older
+  adults" alone could be anyone's guideline); the abbreviation itself
+  counts when it appears as written ("ADA_CKDRM.pdf"). Longest phrase
+  first; the abbreviation with the most matched characters wins, its
+  share of all matched characters is the confidence
+- fuzzy fallback: rapidfuzz token_sort_ratio (the whole title is compared,
+  so sharing a topic or publisher isn't enough) against the same phrases,
+  with words common to most titles ("guidelines", "diabetes", "2025",
+  ...) left out on both sides; accepted from FUZZY_MIN_SCORE, and only if
+  the title also shares a word no other guideline's phrases use
+
+A publisher or a topic on its own ("AHA", "NICE", "chronic kidney
+disease") never resolves: a wrong source in Source Citations is worse
+than an unknown title.
+
+Results are cached per title, so each chunk costs a dict lookup after the
+first time its document comes back. Titles that resolve to nothing are
+logged once with the closest candidate and kept in `unknown` so the map or
+the aliases can be extended.
+"""
+import os
+import re
+from collections import namedtuple
+
+from rapidfuzz import fuzz, process
+
+from guideline_dedup import strip_copy_prefix
+
+FUZZY_MIN_SCORE = 80
+MIN_TOPIC_WORDS = 3
+RESOLVE_CACHE_ENTRIES = 4096
+
+EXTENSION_RE = re.compile(r"\.(pdf|txt|md|docx?|html?)$", re.IGNORECASE)
+CAMEL_RE = re.compile(r"(?<=[a-z])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])")
+WORD_RE = re.compile(r"[a-z0-9]+")
+NUMBERED_RE = re.compile(r"^\s*\d+\.\s*")
+WORD_EXPANSIONS = {
+    "mgmt": "management",
+    "std": "standards",
+    "htn": "hypertension",
+    "ckd": "chronic kidney disease",
+    "cvd": "cardiovascular disease",
+}
+
+# Phrases found in file names but not in the full names (document codes,
+# short titles); matched after normalization, so "OlderAdults" is "older
+# adults". Each must name one document, never just a publisher or a topic.
+GUIDELINE_ALIASES = {
+    "AHA_HBP": ["acc aha high blood pressure", "aha acc high blood pressure", "aha high blood pressure"],
+    "ADA_CDRM": ["dc25s010"],
+    "ADA_CKDRM": ["dc25s011"],
+    "ADA_IHO": ["dc25s005", "facilitating positive health behaviors"],
+    "ADA_PREV": ["dc25s003", "prevention or delay of diabetes"],
+    "ADA_REV": ["dc25srev", "diabetes summary of revisions"],
+    "JNC8": ["jnc8", "jnc 8"],
+    "NICE_HTN": ["ng136", "nice hypertension in adults"],
+    "PRANA": ["prana"],
+    "SSATHI": ["ssathi"],
+    "ADA_GG": ["dc25s006"],
+    "ADA_OA": ["dc25s013", "ada older adults"],
+    "ADA_IMPR": ["dc25s001", "improving care promoting health"],
+}
+
+# Words that say nothing about which document it is; left out of fuzzy scores
+GENERIC_WORDS = frozenset(
+    "a and copy diabetes for guideline guidelines in of on standards summary the to 2024 2025".split()
+)
+
+Resolution = namedtuple("Resolution", "abbreviation confidence method")
+
+
+def normalize_title(title):
+    """'Copy of ADA OlderAdults Diabetes 2025.pdf' → 'ada older adults diabetes 2025'."""
+    name = EXTENSION_RE.sub("", strip_copy_prefix(os.path.basename(title.strip())))
+    words = WORD_RE.findall(CAMEL_RE.sub(" ", name).lower())
+    return " ".join(WORD_EXPANSIONS.get(word, word) for word in words)
+
+
+def distinctive_words(normalized):
+    return " ".join(word for word in normalized.split() if word not in GENERIC_WORDS)
+
+
+def _raw_tokens(title):
+    return set(re.findall(r"[a-z0-9_]+", title.lower()))
+
+
+def full_name_topic(full_name):
+    """'10. Cardiovascular Disease and Risk Management - Standards of Care ...' → its normalized first part."""
+    return normalize_title(NUMBERED_RE.sub("", full_name.split(" - ")[0]))
+
+
+class GuidelineResolver:
+    def __init__(self, guideline_map, aliases=GUIDELINE_ALIASES, min_score=FUZZY_MIN_SCORE):
+        self.min_score = min_score
+        self.abbreviations = {abbreviation.lower(): abbreviation for abbreviation in guideline_map}
+        self.phrases = {}  # normalized phrase → abbreviation
+        self.choices = {}  # fuzzy choice → abbreviation
+        for abbreviation, data in guideline_map.items():
+            topic = full_name_topic(data.get("full", ""))
+            specific = [topic] if len(distinctive_words(topic).split()) >= MIN_TOPIC_WORDS else []
+            for phrase in map(normalize_title, specific + list(aliases.get(abbreviation, []))):
+                if phrase and self.phrases.setdefault(phrase, abbreviation) != abbreviation:
+                    print(f"⚠️ Guideline phrase {phrase!r} is used by {self.phrases[phrase]} and {abbreviation}")
+                self.choices.setdefault(distinctive_words(phrase), abbreviation)
+        self.choices.pop("", None)
+        ordered = sorted(self.phrases, key=len, reverse=True)  # longest phrase wins at a position
+        self.pattern = re.compile(r"\b(?:" + "|".join(map(re.escape, ordered)) + r")\b") if ordered else None
+        self._choice_list = list(self.choices)
+
+        # Words a fuzzy match must share with the title: words that appear in
+        # one guideline's choices only (a publisher name alone doesn't count)
+        owners = {}
+        for choice, abbreviation in self.choices.items():
+            for word in choice.split():
+                owners.setdefault(word, set()).add(abbreviation)
+        self.anchor_words = {abbreviation: set() for abbreviation in guideline_map}
+        for word, abbreviations in owners.items():
+            if len(abbreviations) == 1:
+                self.anchor_words[next(iter(abbreviations))].add(word)
+        self.unknown = {}  # title → (closest abbreviation, score)
+        self._cache = {}
+
+    def _match_patterns(self, title, normalized):
+        written = [self.abbreviations[t] for t in _raw_tokens(title) if t in self.abbreviations]
+        if len(written) == 1:
+            return Resolution(written[0], 100, "pattern")
+        matched = {}
+        for match in self.pattern.finditer(normalized):
+            abbreviation = self.phrases[match.group(0)]
+            matched[abbreviation] = matched.get(abbreviation, 0) + len(match.group(0))
+        if not matched:
+            return None
+        abbreviation = max(matched, key=matched.get)  # first seen wins ties
+        return Resolution(abbreviation, round(100 * matched[abbreviation] / sum(matched.values())), "pattern")
+
+    def _match_fuzzy(self, normalized):
+        best = process.extractOne(distinctive_words(normalized), self._choice_list,
+                                  scorer=fuzz.token_sort_ratio, processor=None)
+        if best is None or not best[1]:
+            return Resolution(None, 0, "unknown"), None
+        choice, score, _ = best
+        abbreviation = self.choices[choice]
+        if score >= self.min_score and self.anchor_words[abbreviation] & set(normalized.split()):
+            return Resolution(abbreviation, round(score), "fuzzy"), None
+        return Resolution(None, round(score), "unknown"), abbreviation
+
+    def resolve(self, title):
+        """Resolution(abbreviation or None, confidence 0-100, 'pattern' | 'fuzzy' | 'unknown')."""
+        cached = self._cache.get(title)
+        if cached is not None:
+            return cached
+
+        normalized = normalize_title(title or "")
+        closest = None
+        resolution = self._match_patterns(title, normalized) if self.pattern and normalized else None
+        if resolution is None and self.choices and normalized:
+            resolution, closest = self._match_fuzzy(normalized)
+        if resolution is None:
+            resolution = Resolution(None, 0, "unknown")
+
+        if resolution.abbreviation is None:
+            self.unknown[title] = (closest, resolution.confidence)
+            print(f"⚠️ Guideline title not in GUIDELINE_MAP: {title!r}"
+                  + (f" (closest: {closest}, score {resolution.confidence})" if closest else ""))
+        elif resolution.method == "fuzzy":
+            print(f"🔎 Guideline title {title!r} → {resolution.abbreviation} (fuzzy, score {resolution.confidence})")
+
+        if len(self._cache) >= RESOLVE_CACHE_ENTRIES:
+            self._cache.clear()
+        self._cache[title] = resolution
+        return resolution
+
+    def abbreviation(self, title):
+        return self.resolve(title).abbreviation
+
+    def unknown_report(self):
+        """One line per unresolved title, for extending GUIDELINE_MAP or GUIDELINE_ALIASES."""
+        return [f"{title} (closest: {closest or '-'}, score {score})"
+                for title, (closest, score) in sorted(self.unknown.items())]
@@ -0,0 +1,459 @@
+"""
+Date-indexed patient data.
+
+Every CSV in the patient folder is parsed once into a DatedTable: rows
+sorted by their date column, with a parallel list of date ordinals so a
+window query is two bisects. JSON and plain-text files are kept as they are.
+
+render_patient_data() turns the records into prompt text for a time window
+(30/60/90 days, or whatever the framework declares): rows inside the window
+are listed verbatim, older rows are collapsed into per-column aggregates
+(count, range, mean, first → last) so the prompt stays roughly the same
+size however many years of readings a patient has. Tables and JSON are
+written in a compact form (header once, constant columns hoisted, repeated
+text folded, empty fields pruned); see benchmarks/bench_patient_format.py.
+
+Parsed files are kept in a process-wide cache (shared by every Streamlit
+session) keyed by folder and path and validated by mtime + size, so an unchanged file
+costs one stat per question; only new or modified files are re-parsed.
+
+CSV exports of STREAMING_THRESHOLD_BYTES or more (minute-level wearables,
+CGM) are not loaded row by row: wearable_rollups streams them into
+daily/weekly/monthly rollups, and the prompt shows daily rollups for the
+window, weekly ones for the weeks before it and monthly ones before that.
+
+The window ends at the patient's most recent reading (never after today),
+so a stale export still shows its latest month verbatim. When that is
+before today, the text opens with a "DATA ENDS ... days before today" line
+so the model doesn't present old readings as current.
+"""
+import csv
+import json
+import os
+import threading
+from bisect import bisect_left
+from collections import Counter, namedtuple
+from datetime import date, timedelta
+from io import StringIO
+
+from wearable_rollups import ingest_csv
+
+DEFAULT_WINDOW_DAYS = 30
+GROUP_COLUMNS = ("test_name", "metric", "measurement", "test")  # per-group aggregates for lab-style tables
+MAX_CATEGORY_VALUES = 5
+STREAMING_THRESHOLD_BYTES = 5 * 1024 * 1024   # larger CSVs are streamed into rollups
+WEEKLY_HISTORY_WEEKS = 12                      # weekly rollups before the window, monthly before that
+
+NO_PATIENT_DATA_TEXT = "\n--- PATIENT DATA: NONE FOUND ---\n"
+
+PatientFile = namedtuple("PatientFile", "name suffix table data text version path rollup", defaults=(None,))
+
+_file_cache = {}        # folder → {path: ((mtime_ns, size), PatientFile or None)}
+_file_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "parses": 0}
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value.strip()[:10])
+    except (AttributeError, ValueError):
+        return None
+
+
+def _find_date_column(fieldnames):
+    for name in fieldnames:
+        if name.strip().lower() == "date":
+            return name
+    for name in fieldnames:
+        if name.strip().lower().endswith("date"):
+            return name
+    return None
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class DatedTable:
+    """CSV rows sorted by date, with the dates parsed once."""
+
+    def __init__(self, fieldnames, rows):
+        self.fieldnames = [name.strip() for name in fieldnames]
+        self.date_column = _find_date_column(self.fieldnames)
+        rows = [{k.strip(): (v or "").strip() for k, v in row.items() if k} for row in rows]
+
+        dated, self.undated = [], []
+        for row in rows:
+            day = _parse_date(row.get(self.date_column)) if self.date_column else None
+            (dated if day else self.undated).append((day, row))
+        dated.sort(key=lambda pair: pair[0])  # stable: keeps file order within a day
+
+        self.rows = [row for _, row in dated]
+        self.ordinals = [day.toordinal() for day, _ in dated]
+
+    def __len__(self):
+        return len(self.rows) + len(self.undated)
+
+    @property
+    def first_date(self):
+        return date.fromordinal(self.ordinals[0]) if self.ordinals else None
+
+    @property
+    def last_date(self):
+        return date.fromordinal(self.ordinals[-1]) if self.ordinals else None
+
+    def split(self, start):
+        """(rows before `start`, rows from `start` on), both in date order."""
+        i = bisect_left(self.ordinals, start.toordinal())
+        return self.rows[:i], self.rows[i:]
+
+
+def load_csv_table(csv_text):
+    reader = csv.DictReader(StringIO(csv_text))
+    return DatedTable(reader.fieldnames or [], list(reader))
+
+
+def load_patient_file(path, version=None):
+    """Parses one patient file; returns a PatientFile or None for empty files."""
+    name = os.path.basename(path)
+    suffix = os.path.splitext(name)[1].lower()
+    if suffix == ".csv" and os.path.getsize(path) >= STREAMING_THRESHOLD_BYTES:
+        return PatientFile(name, suffix, None, None, None, version, path, ingest_csv(path))
+
+    with open(path, "r", encoding="utf-8") as f:
+        raw_content = f.read()
+
+    if suffix == ".json":
+        return PatientFile(name, suffix, None, json.loads(raw_content), None, version, path)
+    if suffix == ".csv":
+        return PatientFile(name, suffix, load_csv_table(raw_content), None, None, version, path)
+    if raw_content:
+        # Treat other file types as raw text (e.g., .txt)
+        return PatientFile(name, suffix, None, None, raw_content, version, path)
+    return None
+
+
+def _cached_patient_file(folder_cache, entry):
+    """The parsed file from the cache if its mtime and size are unchanged, else a fresh parse."""
+    st = entry.stat()
+    version = (st.st_mtime_ns, st.st_size)
+    with _file_cache_lock:
+        cached = folder_cache.get(entry.path)
+        if cached and cached[0] == version:
+            _cache_stats["hits"] += 1
+            return cached[1]
+
+    try:
+        record = load_patient_file(entry.path, version)
+    except Exception as e:
+        # Remembered for this version too, so a broken file is reported once, not on every question
+        print(f"⚠️ Could not process file {entry.name}: {e}")
+        record = None
+
+    with _file_cache_lock:
+        folder_cache[entry.path] = (version, record)
+        _cache_stats["parses"] += 1
+    return record
+
+
+def load_patient_records(folder_path):
+    """Every (non-hidden) file in the folder as a PatientFile, re-parsing only changed files."""
+    try:
+        entries = [e for e in os.scandir(folder_path) if e.is_file() and not e.name.startswith('.')]
+    except (FileNotFoundError, NotADirectoryError):
+        print(f"⚠️ ERROR: Directory not found: {folder_path}")
+        return []
+
+    with _file_cache_lock:
+        folder_cache = _file_cache.setdefault(os.path.normpath(folder_path), {})
+    records = [record for entry in entries if (record := _cached_patient_file(folder_cache, entry))]
+
+    # Forget files that were deleted from this folder
+    seen = {entry.path for entry in entries}
+    with _file_cache_lock:
+        for path in [p for p in folder_cache if p not in seen]:
+            del folder_cache[path]
+    return records
+
+
+def records_signature(records):
+    """Identifies a set of parsed files (paths + versions), e.g. for caching rendered text."""
+    return tuple((record.path, record.version) for record in records)
+
+
+def cache_stats():
+    with _file_cache_lock:
+        return dict(_cache_stats, files=sum(len(files) for files in _file_cache.values()))
+
+
+# ----------------------------------------------------------------------
+# Rendering
+# ----------------------------------------------------------------------
+def rows_to_llm_text(fieldnames, rows):
+    """Readable, line-by-line rows for the LLM (empty values omitted)."""
+    output = []
+    if fieldnames:
+        output.append("HEADERS: " + " | ".join(fieldnames))
+        output.append("-" * 50)
+
+    for i, row in enumerate(rows):
+        row_details = [f"{key}={value}" for key, value in row.items() if value]
+        output.append(f"ROW {i+1}: " + ", ".join(row_details))
+
+    return "\n".join(output)
+
+
+def csv_to_llm_text(csv_data):
+    """Converts a CSV string into a readable, line-by-line text format for the LLM."""
+    reader = csv.DictReader(StringIO(csv_data))
+    rows = [{k.strip(): (v or "").strip() for k, v in row.items() if k} for row in reader]
+    return rows_to_llm_text([name.strip() for name in reader.fieldnames or []], rows)
+
+
+# ----------------------------------------------------------------------
+# Compact serialization: header once, constant columns hoisted, repeated
+# text folded into a ditto mark, nulls and empty containers pruned
+# ----------------------------------------------------------------------
+DITTO = '"'
+CELL_SEPARATOR = " | "
+
+
+def _is_number(value):
+    return _to_float(value) is not None
+
+
+def _cell(value):
+    if value == DITTO:
+        return "\\" + DITTO
+    return value.replace("|", "\\|")
+
+
+def rows_to_compact_text(fieldnames, rows, date_column=None):
+    """
+    Header-once table: columns with one value across all rows are stated once,
+    the date column comes first, and a non-numeric value equal to the one in
+    the row above is written as a ditto mark. Nothing is dropped except the
+    repetition.
+    """
+    if not rows:
+        return "(no rows)"
+
+    columns = list(fieldnames)
+    if date_column in columns:
+        columns.remove(date_column)
+        columns.insert(0, date_column)
+
+    output = []
+    if len(rows) > 1:
+        constant = [c for c in columns if c != date_column and len({row.get(c, "") for row in rows}) == 1]
+        same = [f"{c}={_cell(rows[0][c])}" for c in constant if rows[0].get(c)]
+        if same:
+            output.append("SAME FOR ALL ROWS: " + CELL_SEPARATOR.join(same))
+        columns = [c for c in columns if c not in constant]
+
+    output.append("COLUMNS: " + CELL_SEPARATOR.join(columns))
+    previous = {}
+    folded = False
+    for row in rows:
+        cells = []
+        for c in columns:
+            value = row.get(c, "")
+            if value and c != date_column and value == previous.get(c) and not _is_number(value):
+                cells.append(DITTO)
+                folded = True
+            else:
+                cells.append(_cell(value))
+        while cells and not cells[-1]:
+            cells.pop()  # trailing empty cells
+        output.append(CELL_SEPARATOR.join(cells))
+        previous = row
+
+    if folded:
+        output.insert(len(output) - len(rows), f'({DITTO} = same as the row above)')
+    return "\n".join(output)
+
+
+def prune_empty(value):
+    """Drops None, empty strings and empty lists/dicts, recursively."""
+    if isinstance(value, dict):
+        pruned = {k: prune_empty(v) for k, v in value.items()}
+        return {k: v for k, v in pruned.items() if v not in (None, "", [], {})}
+    if isinstance(value, list):
+        pruned = [prune_empty(v) for v in value]
+        return [v for v in pruned if v not in (None, "", [], {})]
+    return value
+
+
+def _scalar(value):
+    if isinstance(value, str) and "\n" not in value:
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _outline(value, indent, output):
+    pad = "  " * indent
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if isinstance(item, (dict, list)):
+                output.append(f"{pad}{key}:")
+                _outline(item, indent + 1, output)
+            else:
+                output.append(f"{pad}{key}: {_scalar(item)}")
+    elif isinstance(value, list):
+        for item in value:
+            if isinstance(item, dict) and not any(isinstance(v, (dict, list)) for v in item.values()):
+                output.append(f"{pad}- " + CELL_SEPARATOR.join(f"{k}: {_scalar(v)}" for k, v in item.items()))
+            elif isinstance(item, (dict, list)):
+                output.append(f"{pad}-")
+                _outline(item, indent + 1, output)
+            else:
+                output.append(f"{pad}- {_scalar(item)}")
+    else:
+        output.append(f"{pad}{_scalar(value)}")
+
+
+def json_to_compact_text(data):
+    """Indented key: value outline of the JSON with empty fields pruned."""
+    output = []
+    _outline(prune_empty(data), 0, output)
+    return "\n".join(output)
+
+
+def _format_number(value):
+    return f"{round(value, 2):g}"
+
+
+def _aggregate_column(column, rows, date_column):
+    values = [row.get(column, "") for row in rows]
+    present = [(row.get(date_column, ""), v) for row, v in zip(rows, values) if v]
+    if not present:
+        return None
+
+    counts = Counter(v for _, v in present)
+    if len(counts) == 1:
+        return f"{column}: {present[0][1]} (all {len(present)})" if len(present) > 1 \
+            else f"{column}: {present[0][1]} ({present[0][0]})"
+
+    numbers = [_to_float(v) for _, v in present]
+    if all(n is not None for n in numbers):
+        return (f"{column}: n={len(numbers)}, min {_format_number(min(numbers))}, "
+                f"max {_format_number(max(numbers))}, mean {_format_number(sum(numbers) / len(numbers))}, "
+                f"first {present[0][1]} ({present[0][0]}) → last {present[-1][1]} ({present[-1][0]})")
+
+    top = ", ".join(f"{value} ×{n}" for value, n in counts.most_common(MAX_CATEGORY_VALUES))
+    more = f", +{len(counts) - MAX_CATEGORY_VALUES} other values" if len(counts) > MAX_CATEGORY_VALUES else ""
+    return f"{column}: {top}{more}"
+
+
+def aggregate_rows(table, rows):
+    """Summary lines for `rows`: table-wide constants once, then per column (or per test for lab-style tables)."""
+    group_column = next((c for c in table.fieldnames if c.lower() in GROUP_COLUMNS), None)
+    columns = [c for c in table.fieldnames if c not in (table.date_column, group_column)]
+
+    constant = [c for c in columns if len({row.get(c, "") for row in rows}) == 1]
+    lines = [f"{c}: {rows[0][c]} (all {len(rows)})" for c in constant if rows[0].get(c)]
+    columns = [c for c in columns if c not in constant]
+
+    if group_column is None:
+        return lines + [line for c in columns if (line := _aggregate_column(c, rows, table.date_column))]
+
+    groups = {}
+    for row in rows:
+        groups.setdefault(row.get(group_column, ""), []).append(row)
+
+    for name, group_rows in groups.items():
+        if len(group_rows) == 1:
+            row = group_rows[0]
+            details = ", ".join(f"{c}={row[c]}" for c in columns if row.get(c))
+            lines.append(f"{name} ({row.get(table.date_column, '')}): {details}")
+            continue
+        parts = [part for c in columns if (part := _aggregate_column(c, group_rows, table.date_column))]
+        lines.append(f"{name}: " + "; ".join(parts))
+    return lines
+
+
+def window_bounds(records, window_days, today=None):
+    """(start, end) of the window: `window_days` ending at the latest reading, capped at today."""
+    today = today or date.today()
+    latest = [r.table.last_date for r in records if r.table is not None and r.table.last_date]
+    latest += [r.rollup.last_date for r in records if r.rollup is not None and r.rollup.last_date]
+    end = min(max(latest), today) if latest else today
+    return end - timedelta(days=window_days - 1), end
+
+
+def data_age_line(end, today=None):
+    """'DATA ENDS ...' line when the window ends before today, else ""."""
+    today = today or date.today()
+    days = (today - end).days
+    if days <= 0:
+        return ""
+    return (f"DATA ENDS {end}, {days} day{'s' if days != 1 else ''} before today ({today}): "
+            "the window below ends there, so its readings are not current.")
+
+
+def render_table(table, start, end):
+    older, recent = table.split(start)
+    recent = recent + table.undated
+
+    output = [f"WINDOW: {start} to {end} ({len(recent)} rows, listed below)",
+              rows_to_compact_text(table.fieldnames, recent, table.date_column)]
+    if older:
+        first, last = older[0][table.date_column], older[-1][table.date_column]
+        output.append(f"OLDER HISTORY: {first} to {last} ({len(older)} rows, aggregated)")
+        output.extend(aggregate_rows(table, older))
+    return "\n".join(output)
+
+
+ROLLUP_FIELDS = ["date", "metric", "n", "min", "max", "mean", "last"]
+
+
+def render_rollup(rollup, start, end):
+    """Daily rollups inside the window, weekly ones for the weeks before it, monthly ones before that."""
+    history_start = start - timedelta(weeks=WEEKLY_HISTORY_WEEKS)
+    first_week = history_start - timedelta(days=history_start.weekday())
+    output = [f"STREAMED EXPORT: {rollup.readings:,} timestamped readings of {', '.join(rollup.metrics)}, "
+              f"{rollup.first_date} to {rollup.last_date}; rolled up per period "
+              f"(n = readings, last = last reading of the period)"]
+
+    sections = [
+        (f"DAILY: {start} to {end}", rollup.rows("daily", start, end)),
+        (f"WEEKLY (date = week start): {first_week} to {start - timedelta(days=1)}",
+         rollup.rows("weekly", first_week, start - timedelta(days=1))),
+        (f"MONTHLY (date = month start): before {first_week}",
+         rollup.rows("monthly", None, first_week - timedelta(days=1))),
+    ]
+    for title, rows in sections:
+        if rows:
+            output.append(title)
+            output.append(rows_to_compact_text(ROLLUP_FIELDS, rows, "date"))
+    return "\n".join(output)
+
+
+def render_patient_data(records, window_days=DEFAULT_WINDOW_DAYS, today=None):
+    """Prompt text for the patient: in-window rows verbatim, older rows aggregated."""
+    if not records:
+        return NO_PATIENT_DATA_TEXT
+
+    start, end = window_bounds(records, window_days, today)
+    patient_text = []
+    for record in records:
+        if record.rollup is not None:
+            content_for_llm = render_rollup(record.rollup, start, end)
+        elif record.table is not None:
+            content_for_llm = render_table(record.table, start, end) if record.table.date_column \
+                else rows_to_compact_text(record.table.fieldnames, record.table.rows + record.table.undated)
+        elif record.data is not None:
+            content_for_llm = json_to_compact_text(record.data)
+        else:
+            content_for_llm = record.text
+
+        if content_for_llm:
+            patient_text.append(f"\n\n--- PATIENT FILE: {record.name} (Format: {record.suffix.upper()})\n{content_for_llm}")
+
+    if not patient_text:
+        return NO_PATIENT_DATA_TEXT
+    age_line = data_age_line(end, today)
+    return "\n".join(([age_line] if age_line else []) + patient_text)
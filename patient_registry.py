@@ -0,0 +1,245 @@
+"""
+Multi-patient registry with per-patient partitions.
+
+Each patient's files live in their own folder, user_data/<patient_id>/, and
+user_data/patients.json indexes them:
+
+    {"patients": {"M_001": {"name": ..., "folder": "M_001",
+                            "first_date": ..., "last_date": ...,
+                            "files": {"meera_vitals_tracking.csv":
+                                      {"rows": 78, "first_date": ..., "last_date": ...}}}}}
+
+Looking a patient up is a dict lookup in the (mtime-validated) index, and
+loading their data only touches their own folder, so the cost doesn't grow
+with the number of patients and one patient's files never reach another
+patient's prompt. Index entries are refreshed when a partition's files
+change; all index writes are atomic.
+
+    python patient_registry.py list
+    python patient_registry.py rebuild     # re-scan every partition
+    python patient_registry.py migrate     # move flat files in user_data/ into partitions
+    python patient_registry.py add <patient_id> <file> [<name>]
+"""
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+
+from patient_data import load_patient_records, records_signature
+
+PATIENT_DATA_FOLDER = "user_data"
+INDEX_FILE = "patients.json"
+PATIENT_ID_RE = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def _file_summary(record):
+    if record.rollup is not None and record.rollup.last_date:
+        return {
+            "readings": record.rollup.readings,
+            "first_date": record.rollup.first_date.isoformat(),
+            "last_date": record.rollup.last_date.isoformat(),
+        }
+    if record.table is None or not record.table.ordinals:
+        return {}
+    return {
+        "rows": len(record.table),
+        "first_date": record.table.first_date.isoformat(),
+        "last_date": record.table.last_date.isoformat(),
+    }
+
+
+def _patient_name(records):
+    for record in records:
+        if record.data is not None and isinstance(record.data, dict) and record.data.get("name"):
+            return record.data["name"]
+    for record in records:
+        if record.table is not None and record.table.rows:
+            name = record.table.rows[-1].get("patient_name")
+            if name:
+                return name
+    return None
+
+
+def _patient_id_of(record):
+    """patient_id stated inside a legacy flat file, if any."""
+    if record.data is not None and isinstance(record.data, dict):
+        return record.data.get("patient_id")
+    if record.table is not None and record.table.rows:
+        return record.table.rows[0].get("patient_id")
+    return None
+
+
+class PatientRegistry:
+    """patient_id → partition folder + file/date-range index."""
+
+    def __init__(self, root=PATIENT_DATA_FOLDER, index_file=INDEX_FILE):
+        self.root = root
+        self.index_path = os.path.join(root, index_file)
+        self._lock = threading.Lock()
+        self._index = None
+        self._index_version = None
+        self._signatures = {}   # patient_id → records_signature the index entry was built from
+
+    # --- index -----------------------------------------------------------
+    def _read_index(self):
+        """The index, re-read only when the file changed on disk."""
+        try:
+            st = os.stat(self.index_path)
+        except FileNotFoundError:
+            if self._index is None:
+                self._index, self._index_version = {"patients": {}}, None
+            return self._index
+
+        version = (st.st_mtime_ns, st.st_size)
+        if version != self._index_version:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self._index = json.load(f)
+            self._index_version = version
+            self._signatures = {}
+        return self._index
+
+    def _write_index(self):
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self._index, f, indent=2, sort_keys=True)
+                f.write("\n")
+            os.replace(tmp_path, self.index_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        st = os.stat(self.index_path)
+        self._index_version = (st.st_mtime_ns, st.st_size)
+
+    def _entry_from_records(self, patient_id, folder, records, name=None):
+        files = {record.name: _file_summary(record) for record in sorted(records, key=lambda r: r.name)}
+        firsts = [f["first_date"] for f in files.values() if f]
+        lasts = [f["last_date"] for f in files.values() if f]
+        return {
+            "name": name or _patient_name(records) or patient_id,
+            "folder": folder,
+            "first_date": min(firsts) if firsts else None,
+            "last_date": max(lasts) if lasts else None,
+            "files": files,
+        }
+
+    # --- lookups ---------------------------------------------------------
+    def patients(self):
+        with self._lock:
+            return dict(self._read_index()["patients"])
+
+    def get(self, patient_id):
+        with self._lock:
+            return self._read_index()["patients"].get(patient_id)
+
+    def folder(self, patient_id):
+        entry = self.get(patient_id)
+        return os.path.join(self.root, entry["folder"]) if entry else None
+
+    def records(self, patient_id):
+        """Parsed files of one patient (only their partition is read); [] for unknown patients."""
+        with self._lock:
+            entry = self._read_index()["patients"].get(patient_id)
+        if entry is None:
+            print(f"⚠️ Unknown patient_id: {patient_id}")
+            return []
+
+        records = load_patient_records(os.path.join(self.root, entry["folder"]))
+        signature = records_signature(records)
+        with self._lock:
+            if self._signatures.get(patient_id) != signature:
+                # Files were added or changed since the entry was built: refresh its date ranges
+                fresh = self._entry_from_records(patient_id, entry["folder"], records, entry.get("name"))
+                if fresh != entry:
+                    self._index["patients"][patient_id] = fresh
+                    self._write_index()
+                self._signatures[patient_id] = signature
+        return records
+
+    # --- updates ---------------------------------------------------------
+    def register(self, patient_id, name=None):
+        if not PATIENT_ID_RE.match(patient_id or ""):
+            raise ValueError(f"Invalid patient_id: {patient_id!r}")
+        with self._lock:
+            index = self._read_index()
+            entry = index["patients"].get(patient_id)
+            if entry is None:
+                entry = {"name": name, "folder": patient_id,
+                         "first_date": None, "last_date": None, "files": {}}
+                index["patients"][patient_id] = entry
+                self._write_index()
+            elif name and entry.get("name") != name:
+                entry["name"] = name
+                self._write_index()
+        os.makedirs(os.path.join(self.root, entry["folder"]), exist_ok=True)
+        return entry
+
+    def add_file(self, patient_id, source_path, name=None, move=False):
+        """Copies (or moves) a file into the patient's partition atomically and re-indexes the patient."""
+        entry = self.register(patient_id, name)
+        folder = os.path.join(self.root, entry["folder"])
+        target = os.path.join(folder, os.path.basename(source_path))
+        if move:
+            shutil.move(source_path, target)
+        else:
+            fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=".", suffix=".tmp")
+            os.close(fd)
+            shutil.copyfile(source_path, tmp_path)
+            os.replace(tmp_path, target)
+        return self.records(patient_id)
+
+    def rebuild(self):
+        """Re-scans every partition folder and rewrites the index (names are kept)."""
+        with self._lock:
+            old = self._read_index()["patients"]
+            patients = {}
+            for entry in sorted(os.scandir(self.root), key=lambda e: e.name):
+                if not entry.is_dir() or entry.name.startswith("."):
+                    continue
+                patient_id = next((pid for pid, e in old.items() if e["folder"] == entry.name), entry.name)
+                records = load_patient_records(entry.path)
+                name = old.get(patient_id, {}).get("name")
+                patients[patient_id] = self._entry_from_records(patient_id, entry.name, records, name)
+            self._index = {"patients": patients}
+            self._signatures = {}
+            self._write_index()
+        return patients
+
+    def migrate_flat_files(self):
+        """Moves files sitting directly in the root into partitions by the patient_id they contain."""
+        moved, skipped = [], []
+        for record in load_patient_records(self.root):
+            if record.name == os.path.basename(self.index_path):
+                continue
+            patient_id = _patient_id_of(record)
+            if not patient_id:
+                skipped.append(record.name)
+                continue
+            self.add_file(patient_id, os.path.join(self.root, record.name), move=True)
+            moved.append((record.name, patient_id))
+        return moved, skipped
+
+
+if __name__ == "__main__":
+    import sys
+
+    registry = PatientRegistry()
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+    if command == "rebuild":
+        registry.rebuild()
+    elif command == "migrate":
+        moved, skipped = registry.migrate_flat_files()
+        for name, patient_id in moved:
+            print(f"📦 {name} → {patient_id}/")
+        for name in skipped:
+            print(f"⚠️ {name}: no patient_id inside, add it with `add <patient_id> <file>`")
+    elif command == "add":
+        registry.add_file(sys.argv[2], sys.argv[3], sys.argv[4] if len(sys.argv) > 4 else None)
+
+    for patient_id, entry in registry.patients().items():
+        print(f"👤 {patient_id} {entry['name']}: {len(entry['files'])} files, "
+              f"{entry['first_date']} → {entry['last_date']}")
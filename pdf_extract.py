@@ -0,0 +1,127 @@
+"""
+PDF text extraction with pdfplumber.
+
+- extract_pdf_text(): splits the page range across a process pool and joins
+  the page texts once at the end.
+- iter_pdf_pages(): lazy mode, yields (page_number, text) in page order as
+  soon as each page is parsed, so indexing can start on the first pages of a
+  large guideline while the rest is still being extracted.
+- get_pool(): the one process pool of the app, also used by the Drive fetch
+  engine for other CPU-bound extraction (DOCX), so no second pool is forked.
+
+`source` is either a path or the raw PDF bytes.
+"""
+import io
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+PDF_WORKERS = os.cpu_count() or 2
+PARALLEL_MIN_PAGES = 16      # below this, process start-up costs more than it saves
+RANGES_PER_WORKER = 2        # smaller ranges balance uneven pages better
+LAZY_RANGE_PAGES = 4         # pages per task in parallel lazy mode
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _open(source):
+    import pdfplumber
+
+    if isinstance(source, (bytes, bytearray)):
+        return pdfplumber.open(io.BytesIO(source))
+    return pdfplumber.open(source)
+
+
+def get_pool():
+    """One shared process pool; pdfplumber is pure Python, so threads don't help."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+        return _pool
+
+
+def _in_worker_process():
+    # Already inside a pool worker: don't nest pools
+    return multiprocessing.parent_process() is not None
+
+
+def _extract_range(source, start, stop):
+    """Extracts pages [start, stop) and returns their texts in order."""
+    texts = []
+    with _open(source) as pdf:
+        for page in pdf.pages[start:stop]:
+            texts.append(page.extract_text() or "")
+            page.close()  # drop the parsed layout objects right away
+    return texts
+
+
+def count_pages(source):
+    with _open(source) as pdf:
+        return len(pdf.pages)
+
+
+def _page_ranges(page_count, range_size):
+    return [(start, min(start + range_size, page_count)) for start in range(0, page_count, range_size)]
+
+
+def _join(texts):
+    return "\n".join(t for t in texts if t).strip()
+
+
+def extract_pdf_text(source, workers=None):
+    """
+    Returns the text of every page, one page per line block.
+    Large PDFs are split into page ranges extracted in parallel processes.
+    """
+    workers = workers or PDF_WORKERS
+    page_count = count_pages(source)
+
+    if workers <= 1 or page_count < PARALLEL_MIN_PAGES or _in_worker_process():
+        return _join(_extract_range(source, 0, page_count))
+
+    range_size = math.ceil(page_count / (workers * RANGES_PER_WORKER))
+    pool = get_pool()
+    futures = [
+        pool.submit(_extract_range, source, start, stop)
+        for start, stop in _page_ranges(page_count, range_size)
+    ]
+
+    texts = []
+    for future in futures:
+        texts.extend(future.result())
+    return _join(texts)
+
+
+def iter_pdf_pages(source, parallel=False):
+    """
+    Yields (page_number, text) in page order, starting with page 1.
+
+    By default pages are parsed one at a time in this process, only as the
+    caller asks for them. With parallel=True small page ranges are submitted
+    to the process pool up front and yielded in order as they finish.
+    """
+    if not parallel or _in_worker_process():
+        with _open(source) as pdf:
+            for number, page in enumerate(pdf.pages, start=1):
+                text = page.extract_text() or ""
+                page.close()
+                yield number, text
+        return
+
+    page_count = count_pages(source)
+    pool = get_pool()
+    futures = [
+        (start, pool.submit(_extract_range, source, start, stop))
+        for start, stop in _page_ranges(page_count, LAZY_RANGE_PAGES)
+    ]
+    try:
+        for start, future in futures:
+            for offset, text in enumerate(future.result()):
+                yield start + offset + 1, text
+    finally:
+        for _, future in futures:
+            future.cancel()
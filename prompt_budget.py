@@ -0,0 +1,143 @@
+"""
+Token budget for the Claude prompt.
+
+The prompt has three sizeable parts: the framework system prompt, the
+patient data and the retrieved guideline chunks. The framework and the
+user question are never trimmed; whatever the budget has left is split
+between patient data and guidelines (PATIENT_SHARE), and a part that needs
+less than its share hands the rest to the other one.
+
+When a part doesn't fit, it is trimmed by priority:
+
+- patient data: the oldest dated table rows go first (lines starting with a
+  YYYY-MM-DD date, or "ROW n: ..." lines carrying one; headers, aggregates
+  and JSON are kept), then the text is cut at the budget as a last resort
+- guideline chunks: the lowest-ranked chunks go first; the top chunk is
+  truncated rather than dropped
+
+Trimming only depends on the input text, so the same inputs always give the
+same prompt. Token counts are estimates (CHARS_PER_TOKEN), which is what a
+budget needs: cheap, monotonic and stable.
+"""
+import re
+
+from guideline_dedup import CHARS_PER_TOKEN, estimate_tokens
+
+PROMPT_TOKEN_BUDGET = 24000
+PATIENT_SHARE = 0.4            # of what is left after the framework and question
+PROMPT_OVERHEAD_TOKENS = 100   # section headers and separators around the parts
+
+DATED_LINE_RE = re.compile(r"^(?:ROW \d+: .*?\b)?(\d{4}-\d{2}-\d{2})\b")
+TRUNCATED_MARKER = "\n[... truncated to fit the prompt budget]"
+
+
+def _allocate(available, patient_tokens, guideline_tokens):
+    """Splits `available` tokens; unused share from one side goes to the other."""
+    patient_budget = int(available * PATIENT_SHARE)
+    guideline_budget = available - patient_budget
+    if patient_tokens < patient_budget:
+        guideline_budget += patient_budget - patient_tokens
+        patient_budget = patient_tokens
+    elif guideline_tokens < guideline_budget:
+        patient_budget += guideline_budget - guideline_tokens
+        guideline_budget = guideline_tokens
+    return patient_budget, guideline_budget
+
+
+def _truncate(text, max_tokens):
+    max_chars = max(0, max_tokens * CHARS_PER_TOKEN - len(TRUNCATED_MARKER))
+    if len(text) <= max_tokens * CHARS_PER_TOKEN:
+        return text
+    return text[:max_chars] + TRUNCATED_MARKER
+
+
+def _omission_note(rows_dropped, oldest_kept):
+    note = f"[{rows_dropped} older dated rows omitted to fit the prompt budget"
+    return note + (f"; rows from {oldest_kept} onward are included]" if oldest_kept else "]")
+
+
+def trim_patient_text(text, max_tokens):
+    """Drops the oldest dated rows until the text fits; returns (text, rows_dropped, oldest_kept)."""
+    if estimate_tokens(text) <= max_tokens:
+        return text, 0, None
+
+    lines = text.split("\n")
+    dated = sorted(
+        (match.group(1), i) for i, line in enumerate(lines)
+        if (match := DATED_LINE_RE.match(line))
+    )
+
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    # Room for the note added below (its longest form), so the newest rows and
+    # the digest at the end are never what gets cut
+    note_chars = len(_omission_note(len(dated), "0000-00-00")) + 1
+    excess = len(text) - max_chars + note_chars
+    dropped = set()
+    for date, i in dated:
+        if excess <= 0:
+            break
+        dropped.add(i)
+        excess -= len(lines[i]) + 1
+
+    kept = [line for i, line in enumerate(lines) if i not in dropped]
+    oldest_kept = next((date for date, i in dated if i not in dropped), None)
+    if dropped:
+        kept.insert(0, _omission_note(len(dropped), oldest_kept))
+
+    return _truncate("\n".join(kept), max_tokens), len(dropped), oldest_kept
+
+
+def trim_guideline_chunks(chunks, max_tokens, separator_tokens=2):
+    """Keeps the highest-ranked chunks that fit (chunks are in rank order)."""
+    kept = []
+    used = 0
+    for chunk in chunks:
+        cost = estimate_tokens(chunk) + (separator_tokens if kept else 0)
+        if used + cost > max_tokens:
+            break
+        kept.append(chunk)
+        used += cost
+
+    if not kept and chunks:
+        kept = [_truncate(chunks[0], max_tokens)]
+    return kept
+
+
+def fit_prompt(system_prompt, patient_text, guideline_chunks, user_query, budget=PROMPT_TOKEN_BUDGET):
+    """
+    Trims patient data and guideline chunks so the whole prompt fits `budget`
+    estimated tokens. Returns (patient_text, guideline_chunks, report).
+    """
+    fixed_tokens = estimate_tokens(system_prompt) + estimate_tokens(user_query) + PROMPT_OVERHEAD_TOKENS
+    patient_tokens = estimate_tokens(patient_text)
+    guideline_tokens = sum(estimate_tokens(c) for c in guideline_chunks)
+    available = max(0, budget - fixed_tokens)
+
+    patient_budget, guideline_budget = _allocate(available, patient_tokens, guideline_tokens)
+    patient_out, rows_dropped, oldest_kept = trim_patient_text(patient_text, patient_budget)
+    chunks_out = trim_guideline_chunks(guideline_chunks, guideline_budget)
+
+    report = {
+        "budget": budget,
+        "framework": fixed_tokens,
+        "patient": (patient_tokens, estimate_tokens(patient_out)),
+        "guidelines": (guideline_tokens, sum(estimate_tokens(c) for c in chunks_out)),
+        "rows_dropped": rows_dropped,
+        "oldest_kept": oldest_kept,
+        "chunks_dropped": len(guideline_chunks) - len(chunks_out),
+    }
+    report["total"] = fixed_tokens + report["patient"][1] + report["guidelines"][1]
+    return patient_out, chunks_out, report
+
+
+def format_report(report):
+    patient_in, patient_out = report["patient"]
+    guidelines_in, guidelines_out = report["guidelines"]
+    line = (f"📏 Prompt budget: ~{report['total']}/{report['budget']} tokens | "
+            f"framework+question {report['framework']} | "
+            f"patient {patient_in}→{patient_out} | guidelines {guidelines_in}→{guidelines_out}")
+    if report["rows_dropped"]:
+        line += f" | dropped {report['rows_dropped']} oldest rows"
+    if report["chunks_dropped"]:
+        line += f" | dropped {report['chunks_dropped']} lowest-ranked chunks"
+    return line
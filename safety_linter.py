@@ -0,0 +1,248 @@
+"""
+Streaming check of the framework's safety language rules.
+
+The framework's Safety Constraints forbid alarm language ("concerning,
+worrisome, alarming, troubling") and value judgments ("good/bad",
+"normal/abnormal"), cap the answer at 150 words outside the exempt
+sections, and require the educational disclaimer verbatim. SafetyRules
+reads those lists, the word limit and the disclaimer out of the framework
+text (compiled once per framework version, defaults when a framework
+doesn't state them) into one precompiled alternation of every term.
+
+SafetyLinter sits after the CitationFormatter in the stream:
+
+- feed(text) scans only the new text, in one pass, and holds back just the
+  last, possibly unfinished word (and a word that may start a two-word
+  term) until the next delta shows where it ends
+- only phrases that can't be misread are rewritten in "fix" mode ("normal
+  range" → "reference range"); single words are reported, not swapped:
+  "worrying" may be a verb ("avoid worrying about"), "not alarming" would
+  flip meaning with a neutral word. Nothing is checked in the Source
+  Citations list or the disclaimer
+- words are counted per finished line, leaving out headings, citation
+  tags, the follow-up questions ("Would You Like"), Source Citations and
+  the disclaimer
+- finish() checks the disclaimer and, in "fix" mode, appends it when the
+  answer has none, then logs a one-line report
+
+"flag" mode reports without changing the text. See
+benchmarks/bench_safety_linter.py for the per-delta cost.
+"""
+import hashlib
+import re
+from collections import Counter
+
+from citations import disclaimer_opening, disclaimer_start
+
+WORD_LIMIT = 150
+DEFAULT_ALARM_WORDS = ("concerning", "worrisome", "alarming", "troubling")
+DEFAULT_VALUE_JUDGMENTS = ("good", "bad", "normal", "abnormal")
+EXTRA_ALARM_WORDS = ("worrying", "alarmingly")
+# Phrase rewrites that read the same in any sentence; other terms are only flagged
+NEUTRAL_REPLACEMENTS = {
+    "normal range": "reference range",
+    "normal ranges": "reference ranges",
+}
+DISCLAIMER_LABEL = "Important Note:"
+RULES_CACHE_ENTRIES = 64
+
+ALARM_RE = re.compile(r"alarm language\s*\(([^)]*)\)", re.IGNORECASE)
+VALUE_JUDGMENT_RE = re.compile(r"value judgments\s*\(([^)]*)\)", re.IGNORECASE)
+WORD_LIMIT_RE = re.compile(r"maximum:\s*(\d+)\s*words|(\d+)[- ]word limit", re.IGNORECASE)
+DISCLAIMER_RE = re.compile(r"required text[^\"“]*[\"“](.+?)[\"”]", re.IGNORECASE | re.DOTALL)
+LIST_SPLIT_RE = re.compile(r"[,/]|\betc\b\.?")
+
+# Section headings (matched at the start of a line, markdown markers stripped);
+# the disclaimer is recognized by its own first words (citations.disclaimer_start)
+SECTION_MARKERS = (
+    ("citations", ("source citation",)),
+    ("follow_up", ("would you like", "follow-up question", "follow up question")),
+)
+WORD_EXEMPT_SECTIONS = ("citations", "follow_up", "disclaimer")
+TERM_EXEMPT_SECTIONS = ("citations", "disclaimer")
+HEADING_PREFIX_RE = re.compile(r"^[\s#*_>•●○■-]+")
+HEADING_LINE_RE = re.compile(r"^\s*(#{1,6}\s+\S.*|\*\*[^*]+\*\*:?|__[^_]+__:?)\s*$")
+COUNTED_WORD_RE = re.compile(r"[A-Za-z0-9][\w'’.,/%-]*")
+CITATION_TAG_RE = re.compile(r"\[[^\[\]\n]{1,60}\]")
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _normalize(text):
+    return WHITESPACE_RE.sub(" ", text.replace("*", "").replace("’", "'")).strip().lower()
+
+
+def _terms(match):
+    if not match:
+        return ()
+    items = (item.strip(" \t\n\"'“”‘’.") for item in LIST_SPLIT_RE.split(match.group(1)))
+    return tuple(item.lower() for item in items if item)
+
+
+class SafetyRules:
+    """Forbidden terms, word limit and disclaimer of one framework, compiled once."""
+
+    def __init__(self, framework_text=""):
+        alarm = _terms(ALARM_RE.search(framework_text)) or DEFAULT_ALARM_WORDS
+        judgments = _terms(VALUE_JUDGMENT_RE.search(framework_text)) or DEFAULT_VALUE_JUDGMENTS
+        self.categories = {}  # term → "alarm" | "value judgment"
+        for category, terms in (("alarm", alarm + EXTRA_ALARM_WORDS), ("value judgment", judgments)):
+            for term in terms:
+                self.categories.setdefault(term, category)
+        for phrase in NEUTRAL_REPLACEMENTS:
+            first = phrase.split()[0]
+            if first in self.categories:
+                self.categories.setdefault(phrase, self.categories[first])
+        ordered = sorted(self.categories, key=len, reverse=True)  # "normal range" before "normal"
+        self.pattern = re.compile(r"\b(?:" + "|".join(re.escape(t).replace(r"\ ", r"\s+") for t in ordered) + r")\b",
+                                  re.IGNORECASE)
+        # First words of multi-word terms: held back until the next word is known
+        self.phrase_starts = frozenset(term.split()[0] for term in self.categories if " " in term)
+
+        limit = WORD_LIMIT_RE.search(framework_text)
+        self.word_limit = int(limit.group(1) or limit.group(2)) if limit else WORD_LIMIT
+        disclaimer = DISCLAIMER_RE.search(framework_text)
+        self.disclaimer = WHITESPACE_RE.sub(" ", disclaimer.group(1)).strip() if disclaimer else None
+        body = self.disclaimer.split(":", 1)[1] if self.disclaimer and ":" in self.disclaimer[:20] else self.disclaimer
+        self.disclaimer_body = _normalize(body) if body else None
+        self.disclaimer_opening = disclaimer_opening(body)
+
+
+_rules_cache = {}
+
+
+def rules_for(framework):
+    """SafetyRules for a framework dict, compiled once per framework version."""
+    content = framework.get("content", "")
+    key = framework.get("version") or hashlib.sha1(content.encode("utf-8")).hexdigest()[:12]
+    rules = _rules_cache.get(key)
+    if rules is None:
+        if len(_rules_cache) >= RULES_CACHE_ENTRIES:
+            _rules_cache.clear()
+        rules = _rules_cache[key] = SafetyRules(content)
+    return rules
+
+
+def _section_of(line, opening):
+    """Section a line starts, or None if it doesn't (or doesn't yet) start one of the known sections."""
+    head = HEADING_PREFIX_RE.sub("", line).lower()
+    for section, markers in SECTION_MARKERS:
+        if any(head.startswith(marker) for marker in markers):
+            return section
+    return "disclaimer" if disclaimer_start(line, opening=opening) else None
+
+
+def _match_case(replacement, original):
+    return replacement[:1].upper() + replacement[1:] if original[:1].isupper() else replacement
+
+
+class SafetyLinter:
+    """Checks (and in "fix" mode rewrites) a streamed answer against one framework's SafetyRules."""
+
+    def __init__(self, rules, mode="fix"):
+        self.rules = rules
+        self.fix = mode == "fix"
+        self.findings = []         # (term as written, category, replacement or None)
+        self.words = 0
+        self._buffer = ""
+        self._line = ""            # current line, as passed on
+        self._line_section = None  # section started by the current line, once known
+        self._section = "body"
+        self._text_tail = ""       # the end of the answer, for the disclaimer check
+
+    def _replace(self, match):
+        term = match.group(0)
+        key = WHITESPACE_RE.sub(" ", term.lower())
+        category = self.rules.categories.get(key, "alarm")
+        replacement = NEUTRAL_REPLACEMENTS.get(key) if self.fix else None
+        self.findings.append((term, category, replacement))
+        return _match_case(replacement, term) if replacement else term
+
+    def _end_line(self):
+        line, self._line, self._line_section = self._line, "", None
+        if self._section in WORD_EXEMPT_SECTIONS or HEADING_LINE_RE.match(line):
+            if HEADING_LINE_RE.match(line) and not _section_of(line, self.rules.disclaimer_opening):
+                self._section = "body"  # any other heading ends the exempt section
+            return
+        self.words += len(COUNTED_WORD_RE.findall(CITATION_TAG_RE.sub(" ", line)))
+
+    def _check(self, text):
+        out = []
+        for piece in text.splitlines(keepends=True):
+            if self._line_section is None:
+                self._line_section = _section_of(self._line + piece, self.rules.disclaimer_opening)
+                if self._line_section:
+                    self._section = self._line_section
+            if self._section not in TERM_EXEMPT_SECTIONS:
+                piece = self.rules.pattern.sub(self._replace, piece)
+            out.append(piece)
+            self._line += piece
+            if piece.endswith("\n"):
+                self._end_line()
+        checked = "".join(out)
+        self._text_tail = (self._text_tail + checked)[-4096:]
+        return checked
+
+    def _safe_end(self, text):
+        """Where the text can be cut without splitting a word or a multi-word term."""
+        end = len(text)
+        while end and (text[end - 1].isalnum() or text[end - 1] in "'’-"):
+            end -= 1
+        if not self.rules.phrase_starts:
+            return end
+        start = end  # a term's first word stays held while only whitespace follows it
+        while start and text[start - 1].isspace():
+            start -= 1
+        word_start = start
+        while word_start and text[word_start - 1].isalnum():
+            word_start -= 1
+        if text[word_start:start].lower() in self.rules.phrase_starts:
+            return word_start
+        return end
+
+    def feed(self, text):
+        """Checked text that is safe to show now."""
+        self._buffer += text
+        end = self._safe_end(self._buffer)
+        ready, self._buffer = self._buffer[:end], self._buffer[end:]
+        return self._check(ready) if ready else ""
+
+    def disclaimer_present(self):
+        return self.rules.disclaimer_body is None or self.rules.disclaimer_body in _normalize(self._text_tail)
+
+    def finish(self):
+        """The held back text, plus the disclaimer if it's missing (in "fix" mode)."""
+        out = self._check(self._buffer) if self._buffer else ""
+        self._buffer = ""
+        if self._line:
+            self._end_line()
+        added_disclaimer = False
+        if not self.disclaimer_present() and self.fix:
+            label, _, body = self.rules.disclaimer.partition(":") if ":" in self.rules.disclaimer[:20] \
+                else (DISCLAIMER_LABEL.rstrip(":"), "", self.rules.disclaimer)
+            trailing = len(out or self._text_tail) - len((out or self._text_tail).rstrip("\n"))
+            out += "\n" * max(0, 2 - trailing) + f"**{label}:** {body.strip()}"
+            added_disclaimer = True
+        self._report(added_disclaimer)
+        return out
+
+    def _report(self, added_disclaimer):
+        fixed = Counter(f"{term.lower()}→{replacement}" for term, _, replacement in self.findings if replacement)
+        flagged = Counter(f"{term.lower()} ({category})" for term, category, replacement in self.findings
+                          if not replacement)
+        over = self.words > self.rules.word_limit
+        disclaimer = "added" if added_disclaimer else ("✅" if self.disclaimer_present() else "missing")
+        icon = "⚠️" if flagged or over or disclaimer == "missing" else "🛡️"
+        print(f"{icon} Safety lint: {self.words} words (limit {self.rules.word_limit}{', OVER' if over else ''}), "
+              f"disclaimer {disclaimer}"
+              + (f", fixed: {_counted(fixed)}" if fixed else "")
+              + (f", flagged: {_counted(flagged)}" if flagged else ""))
+
+
+def _counted(counter):
+    return ", ".join(f"{item} ×{n}" if n > 1 else item for item, n in counter.items())
+
+
+def lint_text(text, rules, mode="fix"):
+    """Whole-text version of SafetyLinter."""
+    linter = SafetyLinter(rules, mode)
+    return linter.feed(text) + linter.finish()
@@ -0,0 +1,54 @@
+"""Run from the repo root: python -m pytest tests"""
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from citations import CitationFormatter, disclaimer_start, format_citations  # noqa: E402
+
+GUIDELINE_MAP = {"AHA_HBP": {"full": "2025 AHA/ACC High Blood Pressure Guideline"}}
+DISCLAIMER = ("Important Note: This information is educational and intended to help you organize and "
+              "understand your tracked health data.")
+BODY_NOTE = "Important note: take readings at the same time each day [AHA_HBP]."
+
+ANSWER = ("Your evening readings were higher than your morning ones [AHA_HBP].\n\n"
+          + BODY_NOTE + "\n\n"
+          "**Would You Like**\n\n1. A look at your sleep data?\n\n"
+          "**" + DISCLAIMER.replace(":", ":**", 1))
+
+
+def stream(parts):
+    formatter = CitationFormatter(GUIDELINE_MAP, DISCLAIMER)
+    return "".join(formatter.feed(part) for part in parts) + formatter.finish()
+
+
+def test_body_note_stays_in_place():
+    text = format_citations(ANSWER, GUIDELINE_MAP, DISCLAIMER)
+    note = text.index("Important note: take readings")
+    assert note < text.index("**Would You Like**") < text.index("**Source Citations**")
+    assert text.index("**Source Citations**") < text.index("This information is educational")
+    assert text.rstrip().endswith("tracked health data.")
+
+
+def test_body_note_is_not_held():
+    formatter = CitationFormatter(GUIDELINE_MAP, DISCLAIMER)
+    shown = formatter.feed(BODY_NOTE + "\n\nMore text")
+    assert "take readings at the same time" in shown
+
+
+def test_label_on_its_own_line():
+    answer = "Body.\n\n**Reminder:**\n\nThis information is educational and intended to help you.\n"
+    text = format_citations("See [AHA_HBP]. " + answer, GUIDELINE_MAP, DISCLAIMER)
+    assert text.index("**Source Citations**") < text.index("**Reminder:**")
+    assert disclaimer_start("**Important note**\ntake readings daily\n") is False
+
+
+def test_random_splits_match_whole_text():
+    whole = format_citations(ANSWER, GUIDELINE_MAP, DISCLAIMER)
+    rng = random.Random(7)
+    for _ in range(300):
+        cuts = sorted(rng.sample(range(1, len(ANSWER)), rng.randint(1, 25)))
+        parts = [ANSWER[a:b] for a, b in zip([0] + cuts, cuts + [len(ANSWER)])]
+        assert stream(parts) == whole
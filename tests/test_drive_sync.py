@@ -0,0 +1,72 @@
+"""Run from the repo root: python -m pytest tests"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+drive_manager = pytest.importorskip("drive_manager")
+
+FOLDER = "folder-1"
+
+
+def drive_file(file_id, modified):
+    return {"id": file_id, "name": f"{file_id}.txt", "mimeType": "text/plain",
+            "modifiedTime": modified, "parents": [FOLDER]}
+
+
+class FakeChanges:
+    """changes().list(...).execute() over fixed pages; raises on a page set to an exception."""
+
+    def __init__(self, pages):
+        self.pages = pages
+
+    def changes(self):
+        return self
+
+    def list(self, pageToken, **kwargs):
+        self.token = pageToken
+        return self
+
+    def execute(self):
+        page = self.pages[self.token]
+        if isinstance(page, Exception):
+            raise page
+        return page
+
+
+def synced(tmp_path):
+    sync = drive_manager.DriveSync({FOLDER: "guidelines"}, str(tmp_path / "manifest.json"))
+    sync._files = {"a": dict(drive_file("a", "1"), source="guidelines")}
+    sync._page_token = "t1"
+    sync.files()  # fills the sorted view
+    return sync
+
+
+def test_failed_delta_sync_changes_nothing(tmp_path):
+    sync = synced(tmp_path)
+    service = FakeChanges({
+        "t1": {"changes": [{"fileId": "a", "removed": True},
+                           {"fileId": "b", "file": drive_file("b", "2")}], "nextPageToken": "t2"},
+        "t2": RuntimeError("Drive unavailable"),
+    })
+    with pytest.raises(RuntimeError):
+        sync.sync(service)
+    assert sync._page_token == "t1"
+    assert list(sync._files) == ["a"]
+    assert [f["id"] for f in sync.files()] == ["a"]
+    assert not os.path.exists(tmp_path / "manifest.json")
+
+
+def test_delta_sync_commits_files_token_and_order(tmp_path):
+    sync = synced(tmp_path)
+    service = FakeChanges({
+        "t1": {"changes": [{"fileId": "b", "file": drive_file("b", "2")}], "nextPageToken": "t2"},
+        "t2": {"changes": [], "newStartPageToken": "t3"},
+    })
+    result = sync.sync(service)
+    assert [f["id"] for f in result["changed"]] == ["b"]
+    assert sync._page_token == "t3"
+    assert [f["id"] for f in sync.files()] == ["b", "a"]
@@ -0,0 +1,76 @@
+"""Run from the repo root: python -m pytest tests"""
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from framework_registry import DriveFolderSource, FrameworkRegistry  # noqa: E402
+
+
+class FakeDrive:
+    def __init__(self):
+        self.files = [{"id": "a", "name": "Summary.txt", "modifiedTime": "1"},
+                      {"id": "b", "name": "Trends.txt", "modifiedTime": "1"}]
+        self.texts = {"a": "Summary framework v1", "b": "Trends framework v1"}
+        self.failing = set()
+
+    def list_files(self):
+        return [dict(f) for f in self.files]
+
+    def fetch(self, files):
+        return [(f, "" if f["id"] in self.failing else self.texts[f["id"]]) for f in files]
+
+    def edit(self, file_id, text):
+        self.texts[file_id] = text
+        for f in self.files:
+            if f["id"] == file_id:
+                f["modifiedTime"] = str(int(f["modifiedTime"]) + 1)
+
+
+def registry(drive):
+    return FrameworkRegistry(DriveFolderSource(drive.list_files, drive.fetch), lambda fw: fw["content"])
+
+
+def contents(snapshot):
+    return {fw["name"]: fw["content"] for fw in snapshot}
+
+
+def test_failed_fetch_keeps_last_good_copy_and_retries():
+    drive = FakeDrive()
+    frameworks = registry(drive)
+    assert contents(frameworks.refresh())["Trends"] == "Trends framework v1"
+
+    drive.edit("a", "Summary framework v2")
+    drive.edit("b", "Trends framework v2")
+    drive.failing = {"b"}
+    snapshot = frameworks.refresh()
+    assert contents(snapshot) == {"Summary": "Summary framework v2", "Trends": "Trends framework v1"}
+
+    drive.failing = set()  # same Drive version, but it wasn't loaded completely
+    assert contents(frameworks.refresh())["Trends"] == "Trends framework v2"
+
+
+def test_one_background_check_at_a_time():
+    drive = FakeDrive()
+    frameworks = FrameworkRegistry(DriveFolderSource(drive.list_files, drive.fetch), lambda fw: fw["content"],
+                                   check_seconds=0)
+    frameworks.current()
+    release = threading.Event()
+    checks = []
+
+    def slow_list():
+        checks.append(1)
+        release.wait(5)
+        return drive.list_files()
+
+    frameworks.source.list_files = slow_list
+    for _ in range(20):
+        frameworks.current()
+    time.sleep(0.1)
+    running = [t for t in threading.enumerate() if t.name == "framework-reload"]
+    release.set()
+    assert len(checks) == 1
+    assert len(running) == 1
@@ -0,0 +1,63 @@
+"""Run from the repo root: python -m pytest tests"""
+import ast
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from guideline_resolver import GuidelineResolver  # noqa: E402
+
+# Every document in guidelines/, by a word or code in its file name
+EXPECTED = {
+    "dc25s001": "ADA_IMPR", "dc25s003": "ADA_PREV", "dc25s005": "ADA_IHO", "dc25s006": "ADA_GG",
+    "dc25s010": "ADA_CDRM", "dc25s011": "ADA_CKDRM", "dc25s013": "ADA_OA", "dc25srev": "ADA_REV",
+    "Older Adults": "ADA_OA",
+}
+
+
+@pytest.fixture(scope="module")
+def resolver():
+    with open(os.path.join(ROOT, "workflow.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    guideline_map = next(ast.literal_eval(node.value) for node in tree.body if isinstance(node, ast.Assign)
+                         and getattr(node.targets[0], "id", None) == "GUIDELINE_MAP")
+    return GuidelineResolver(guideline_map)
+
+
+@pytest.mark.parametrize("title", sorted(os.listdir(os.path.join(ROOT, "guidelines"))))
+def test_corpus_titles_resolve_by_pattern(resolver, title):
+    expected = next(abbreviation for key, abbreviation in EXPECTED.items() if key in title)
+    assert resolver.resolve(title) == (expected, 100, "pattern")
+
+
+@pytest.mark.parametrize("title, expected", [
+    ("2017 ACC/AHA High Blood Pressure Guideline.pdf", "AHA_HBP"),
+    ("2014 Evidence-Based Guideline for the Management of High Blood Pressure in Adults (JNC8).pdf", "JNC8"),
+    ("NICE hypertension NG136.pdf", "NICE_HTN"),
+    ("SSATHI south asian heart.pdf", "SSATHI"),
+    ("ADA OlderAdult Diabetes.pdf", "ADA_OA"),
+    ("ADA_CKDRM.pdf", "ADA_CKDRM"),
+])
+def test_named_titles(resolver, title, expected):
+    assert resolver.abbreviation(title) == expected
+
+
+@pytest.mark.parametrize("title", [
+    "ADA Hypertension Diabetes 2025.pdf",
+    "Standards of Care in Diabetes 2025 Hypertension",
+    "Hypertension in Pregnancy.pdf",
+    # Same publisher or same topic as a mapped guideline, but another document
+    "2018 AHA ACC Cholesterol Guideline.pdf",
+    "NICE Type 2 Diabetes in Adults NG28.pdf",
+    "KDIGO Chronic Kidney Disease 2024.pdf",
+    "2019 ACC AHA Primary Prevention of Cardiovascular Disease.pdf",
+    "AGS Older Adults Falls.pdf",
+    "Dietary Guidelines for Americans 2020.pdf",
+    "",
+])
+def test_other_titles_are_reported_not_guessed(resolver, title):
+    assert resolver.abbreviation(title) is None
+    assert title in resolver.unknown
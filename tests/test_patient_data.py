@@ -0,0 +1,25 @@
+"""Run from the repo root: python -m pytest tests"""
+import os
+import sys
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from patient_data import PatientFile, load_csv_table, render_patient_data  # noqa: E402
+
+CSV = "date,systolic\n" + "\n".join(f"2025-11-{day:02d},{120 + day}" for day in range(1, 26))
+
+
+def records():
+    return [PatientFile("vitals.csv", ".csv", load_csv_table(CSV), None, None, None, None)]
+
+
+def test_stale_data_states_its_age():
+    text = render_patient_data(records(), 30, today=date(2026, 10, 18))
+    assert text.startswith("DATA ENDS 2025-11-25, 327 days before today (2026-10-18)")
+    assert "WINDOW: 2025-10-27 to 2025-11-25" in text
+
+
+def test_current_data_has_no_age_line():
+    assert "DATA ENDS" not in render_patient_data(records(), 30, today=date(2025, 11, 25))
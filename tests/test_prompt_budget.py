@@ -0,0 +1,34 @@
+"""Run from the repo root: python -m pytest tests"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from guideline_dedup import estimate_tokens  # noqa: E402
+from prompt_budget import TRUNCATED_MARKER, trim_patient_text  # noqa: E402
+
+DIGEST = "--- TREND DIGEST (computed from the patient files)\nsystolic: mean 132, trend +0.4/day"
+
+
+def patient_text(days=30):
+    rows = [f"2025-01-{day:02d},{120 + day},{80 + day % 5}" for day in range(1, days + 1)]
+    return "=== FILE: vitals.csv ===\ndate,systolic,diastolic\n" + "\n".join(rows) + "\n\n" + DIGEST
+
+
+@pytest.mark.parametrize("budget", [150, 120, 100])
+def test_trim_drops_oldest_rows_and_keeps_digest(budget):
+    text, dropped, oldest_kept = trim_patient_text(patient_text(), budget)
+    assert dropped > 0
+    assert estimate_tokens(text) <= budget
+    assert TRUNCATED_MARKER not in text
+    assert text.endswith(DIGEST)
+    assert "2025-01-30" in text
+    assert oldest_kept == f"2025-01-{dropped + 1:02d}"
+    assert f"2025-01-{dropped:02d}," not in text
+
+
+def test_text_within_budget_is_unchanged():
+    text = patient_text(3)
+    assert trim_patient_text(text, estimate_tokens(text)) == (text, 0, None)
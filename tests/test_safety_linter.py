@@ -0,0 +1,82 @@
+"""Run from the repo root: python -m pytest tests"""
+import ast
+import os
+import random
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from safety_linter import SafetyLinter, SafetyRules, lint_text  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def rules():
+    with open(os.path.join(ROOT, "frameworks.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    frameworks = next(ast.literal_eval(node.value) for node in tree.body if isinstance(node, ast.Assign))
+    return SafetyRules(frameworks[0]["content"])
+
+
+def answer(rules):
+    return ("Over the last 30 days your readings stayed in the normal range on most days [1 AHA_HBP].\n\n"
+            "**What Needs Attention**\n\n"
+            "- A worrisome rise in evening readings, normal ranges otherwise. Good job, normal \n"
+            "  range at night; nothing alarming.\n\n"
+            "**Would You Like**\n\n1. An explanation of any of the trends I listed?\n\n"
+            "**Source Citations**\n\n- [1 AHA_HBP] High Blood Pressure Guideline\n\n" + rules.disclaimer)
+
+
+def stream(rules, parts, mode="fix"):
+    linter = SafetyLinter(rules, mode)
+    return "".join(linter.feed(part) for part in parts) + linter.finish()
+
+
+def test_fixes_and_flags(rules):
+    text = lint_text(answer(rules), rules)
+    assert "reference range on most days" in text
+    assert "reference ranges otherwise" in text
+    assert "A worrisome rise" in text and "nothing alarming" in text
+    assert "Good job" in text
+    assert text.endswith(rules.disclaimer)
+
+
+@pytest.mark.parametrize("sentence", [
+    "Try to avoid worrying about a single reading.",  # verb
+    "Your BP is not alarming.",                        # negated
+    "Nothing here is troubling or worrisome.",
+])
+def test_single_words_are_flagged_not_rewritten(rules, sentence):
+    linter = SafetyLinter(rules)
+    assert linter.feed(sentence) + linter.finish().split("\n")[0] == sentence
+    assert linter.findings and all(replacement is None for _, _, replacement in linter.findings)
+
+
+def test_phrase_start_held_across_whitespace(rules):
+    assert stream(rules, ["in the normal ", "range."]) == lint_text("in the normal range.", rules)
+
+
+@pytest.mark.parametrize("mode", ["fix", "flag"])
+def test_random_splits_match_whole_text(rules, mode):
+    text = answer(rules)
+    whole = lint_text(text, rules, mode)
+    rng = random.Random(7)
+    for _ in range(500):
+        cuts = sorted(rng.sample(range(1, len(text)), rng.randint(1, 120)))
+        parts = [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+        assert stream(rules, parts, mode) == whole
+
+
+def test_missing_disclaimer_is_added(rules):
+    assert lint_text("Short answer.", rules).endswith(rules.disclaimer.split(":", 1)[1].strip())
+    assert lint_text("Short answer.", rules, mode="flag") == "Short answer."
+
+
+def test_body_important_note_is_checked(rules):
+    linter = SafetyLinter(rules, "flag")
+    linter.feed("Important note: the rise is worrisome and stays outside the normal range.\n\n")
+    linter.finish()
+    assert {term for term, _, _ in linter.findings} == {"worrisome", "normal range"}
+    assert linter.words == 12
@@ -0,0 +1,24 @@
+"""Run from the repo root: python -m pytest tests"""
+import os
+import sys
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from patient_data import PatientFile, load_csv_table  # noqa: E402
+from vitals_digest import digest_records  # noqa: E402
+
+CSV = "date,systolic\n" + "\n".join(f"2025-11-{day:02d},{120 + day}" for day in range(1, 26))
+RECORDS = [PatientFile("vitals.csv", ".csv", load_csv_table(CSV), None, None, None, None)]
+END = date(2025, 11, 25)
+
+
+def test_old_window_is_labelled_with_its_end_date():
+    digest = digest_records(RECORDS, END, windows=(30,), today=date(2026, 10, 18))
+    assert "30 DAYS ENDING 2025-11-25 (2025-10-27 to 2025-11-25, 327 days before today):" in digest
+    assert "LAST 30 DAYS" not in digest
+
+
+def test_window_ending_today_is_the_last_days():
+    assert "LAST 30 DAYS (2025-10-27 to 2025-11-25):" in digest_records(RECORDS, END, windows=(30,), today=END)
@@ -0,0 +1,294 @@
+"""
+Vectorized trend digest for vitals and lab tables.
+
+Each numeric column of a dated patient table (or each test of a lab-style
+table) becomes a MetricSeries: sorted day ordinals + float values + an
+optional out-of-range mask taken from the `flag` / `reference_range`
+columns. For every requested window the digest computes, with NumPy only:
+
+- n, min, max, mean
+- slope per week (least squares over the day offsets)
+- readings per week, and how many whole weeks (counted back from the end
+  of the window) reached TRACKING_TARGET_PER_WEEK readings (the framework's
+  "at least three times per week")
+- out-of-reference-range count, where the data carries a range or flag
+
+A window that ends before today is titled with its end date and age
+("30 DAYS ENDING 2025-11-25 (..., 327 days before today)"), not as the
+last 30 days.
+
+The digest is a small table the model can read instead of recomputing
+ranges and trends from raw rows. The math is O(n) array work, so a
+multi-million-reading wearable export is digested in milliseconds once its
+columns are arrays (see benchmarks/bench_vitals_digest.py).
+
+Streamed wearable exports (wearable_rollups) come in as RollupSeries of
+per-day aggregates instead of readings; the same stats are computed from
+them exactly, except that the slope uses day resolution, as it does for
+readings too.
+"""
+import re
+from collections import namedtuple
+from datetime import date, timedelta
+
+import numpy as np
+
+from patient_data import GROUP_COLUMNS
+
+TRACKING_TARGET_PER_WEEK = 3
+DIGEST_WINDOWS = (30, 90)
+RESULT_COLUMNS = ("result", "value")
+NORMAL_FLAGS = frozenset({"", "normal", "n"})
+
+RANGE_RE = re.compile(r"^\s*(?:([<>]=?)\s*(-?\d+(?:\.\d+)?)|(-?\d+(?:\.\d+)?)\s*-\s*(-?\d+(?:\.\d+)?))\s*$")
+
+MetricSeries = namedtuple("MetricSeries", "name unit kind ordinals values out_of_range")
+RollupSeries = namedtuple("RollupSeries", "name unit kind ordinals n sum min max first last")
+
+
+def _float_or_nan(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def out_of_range_mask(values, reference_ranges):
+    """Boolean mask from reference range strings ("<200", ">40", "70-100"); unparseable ranges count as in range."""
+    mask = np.zeros(len(values), dtype=bool)
+    reference_ranges = np.asarray(reference_ranges, dtype=object)
+    for reference in set(reference_ranges.tolist()):
+        match = RANGE_RE.match(reference or "")
+        if not match:
+            continue
+        rows = reference_ranges == reference
+        op, bound, low, high = match.groups()
+        v = values[rows]
+        if op:
+            bound = float(bound)
+            outside = {"<": v >= bound, "<=": v > bound, ">": v <= bound, ">=": v < bound}[op]
+        else:
+            outside = (v < float(low)) | (v > float(high))
+        mask[rows] = outside
+    return mask
+
+
+def _column(rows, column):
+    return [row.get(column, "") for row in rows]
+
+
+def _values(cells):
+    return np.fromiter(map(_float_or_nan, cells), dtype=np.float64, count=len(cells))
+
+
+def _series(name, unit, kind, ordinals, rows, value_column, flag_column, range_column):
+    values = _values(_column(rows, value_column))
+    keep = ~np.isnan(values)
+
+    out_of_range = None
+    if flag_column:
+        flags = np.array([flag.lower() for flag in _column(rows, flag_column)], dtype=object)
+        out_of_range = ~np.isin(flags, list(NORMAL_FLAGS))
+    elif range_column:
+        out_of_range = out_of_range_mask(values, _column(rows, range_column))
+
+    return MetricSeries(name, unit, kind, ordinals[keep], values[keep],
+                        out_of_range[keep] if out_of_range is not None else None)
+
+
+def series_from_table(table):
+    """MetricSeries for every numeric, non-constant column (or every test of a lab-style table)."""
+    if not table.date_column or not table.rows:
+        return []
+
+    lower = {c.lower(): c for c in table.fieldnames}
+    flag_column = lower.get("flag")
+    range_column = lower.get("reference_range")
+    unit_column = lower.get("unit")
+    group_column = next((lower[c] for c in GROUP_COLUMNS if c in lower), None)
+    result_column = next((lower[c] for c in RESULT_COLUMNS if c in lower), None)
+    ordinals = np.asarray(table.ordinals, dtype=np.int64)  # parsed once by DatedTable
+
+    if group_column and result_column:
+        groups = {}
+        for i, row in enumerate(table.rows):
+            groups.setdefault(row.get(group_column, ""), []).append(i)
+        return [
+            _series(name, table.rows[idx[-1]].get(unit_column, "") if unit_column else "", "lab",
+                    ordinals[idx], [table.rows[i] for i in idx], result_column, flag_column, range_column)
+            for name, idx in groups.items()
+        ]
+
+    series = []
+    for column in table.fieldnames:
+        if column == table.date_column:
+            continue
+        cells = _column(table.rows, column)
+        values = _values(cells)
+        numeric = ~np.isnan(values)
+        if numeric.sum() != sum(1 for cell in cells if cell) or np.unique(values[numeric]).size < 2:
+            continue  # text, ids or a constant like height
+        series.append(MetricSeries(column, "", "vital", ordinals[numeric], values[numeric], None))
+    return series
+
+
+def series_from_rollup(rollup):
+    """RollupSeries for every metric of a streamed export, from its daily rollups."""
+    return [RollupSeries(metric, "", "vital", *rollup.daily[metric])
+            for metric in rollup.metrics if metric in rollup.daily]
+
+
+def summarize_rollup(series, start, end):
+    """summarize() over per-day aggregates: counts and sums are weighted by the readings of each day."""
+    lo, hi = np.searchsorted(series.ordinals, [start.toordinal(), end.toordinal() + 1])
+    if hi <= lo:
+        return None
+
+    days = series.ordinals[lo:hi]
+    counts = series.n[lo:hi]
+    sums = series.sum[lo:hi]
+    n = int(counts.sum())
+    mean = float(sums.sum() / n)
+    window_days = end.toordinal() - start.toordinal() + 1
+
+    # Least squares over the readings, with x constant within a day
+    x = (days - (counts @ days) / n).astype(np.float64)
+    denominator = float(counts @ (x * x))
+    slope_per_week = float(x @ (sums - counts * mean)) / denominator * 7 if denominator else 0.0
+
+    full_weeks = max(1, window_days // 7)
+    weeks_back = (end.toordinal() - days) // 7
+    in_weeks = weeks_back < full_weeks
+    weekly_counts = np.bincount(weeks_back[in_weeks], weights=counts[in_weeks], minlength=full_weeks)
+
+    return {
+        "n": n,
+        "min": float(series.min[lo:hi].min()),
+        "max": float(series.max[lo:hi].max()),
+        "mean": mean,
+        "slope_per_week": slope_per_week if n > 1 else None,
+        "readings_per_week": n / (window_days / 7),
+        "weeks_on_target": int((weekly_counts >= TRACKING_TARGET_PER_WEEK).sum()),
+        "weeks": len(weekly_counts),
+        "out_of_range": None,
+        "first": float(series.first[lo]),
+        "first_date": date.fromordinal(int(days[0])),
+        "last": float(series.last[hi - 1]),
+        "last_date": date.fromordinal(int(days[-1])),
+    }
+
+
+def summarize(series, start, end):
+    """Stats for the readings in [start, end]; None if there are none."""
+    if isinstance(series, RollupSeries):
+        return summarize_rollup(series, start, end)
+    lo, hi = np.searchsorted(series.ordinals, [start.toordinal(), end.toordinal() + 1])
+    if hi <= lo:
+        return None
+
+    days = series.ordinals[lo:hi]
+    values = series.values[lo:hi]
+    window_days = end.toordinal() - start.toordinal() + 1
+
+    x = (days - days.mean()).astype(np.float64)
+    denominator = float(x @ x)
+    slope_per_week = float(x @ (values - values.mean())) / denominator * 7 if denominator else 0.0
+
+    # Whole weeks counted back from the end of the window; a partial week at the start is ignored
+    full_weeks = max(1, window_days // 7)
+    weeks_back = (end.toordinal() - days) // 7
+    weekly_counts = np.bincount(weeks_back[weeks_back < full_weeks], minlength=full_weeks)
+
+    return {
+        "n": int(hi - lo),
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "mean": float(values.mean()),
+        "slope_per_week": slope_per_week if hi - lo > 1 else None,
+        "readings_per_week": (hi - lo) / (window_days / 7),
+        "weeks_on_target": int((weekly_counts >= TRACKING_TARGET_PER_WEEK).sum()),
+        "weeks": len(weekly_counts),
+        "out_of_range": int(series.out_of_range[lo:hi].sum()) if series.out_of_range is not None else None,
+        "first": float(values[0]),
+        "first_date": date.fromordinal(int(days[0])),
+        "last": float(values[-1]),
+        "last_date": date.fromordinal(int(days[-1])),
+    }
+
+
+def _fmt(value):
+    return f"{round(value, 2):g}"
+
+
+VITALS_HEADER = ("metric | n | min | max | mean | slope/wk | readings/wk | "
+                 f"weeks ≥{TRACKING_TARGET_PER_WEEK} | last")
+LABS_HEADER = "test | n | min | max | mean | out of range | first → last"
+
+
+def _vital_line(series, stats):
+    return " | ".join([
+        series.name, str(stats["n"]), _fmt(stats["min"]), _fmt(stats["max"]), _fmt(stats["mean"]),
+        "" if stats["slope_per_week"] is None else f"{stats['slope_per_week']:+.2f}",
+        _fmt(stats["readings_per_week"]), f"{stats['weeks_on_target']}/{stats['weeks']}",
+        f"{_fmt(stats['last'])} ({stats['last_date']})",
+    ])
+
+
+def _lab_line(series, stats):
+    unit = f" {series.unit}" if series.unit else ""
+    first = "" if stats["n"] == 1 else f"{_fmt(stats['first'])} ({stats['first_date']}) → "
+    return " | ".join([
+        series.name + unit, str(stats["n"]), _fmt(stats["min"]), _fmt(stats["max"]), _fmt(stats["mean"]),
+        "" if stats["out_of_range"] is None else str(stats["out_of_range"]),
+        f"{first}{_fmt(stats['last'])} ({stats['last_date']})",
+    ])
+
+
+def _window_title(window_days, start, end, today):
+    """'LAST 30 DAYS (...)' only when the window ends today; otherwise its end date and age."""
+    days_before = (today - end).days
+    if days_before <= 0:
+        return f"LAST {window_days} DAYS ({start} to {end}):"
+    return (f"{window_days} DAYS ENDING {end} ({start} to {end}, "
+            f"{days_before} day{'s' if days_before != 1 else ''} before today):")
+
+
+def digest_text(series_list, end, windows=DIGEST_WINDOWS, today=None):
+    """Compact digest: a vitals table and a labs table per window."""
+    today = today or date.today()
+    output = [f"LEGEND: slope/wk = least-squares change per week; weeks ≥{TRACKING_TARGET_PER_WEEK} = "
+              f"whole weeks with at least {TRACKING_TARGET_PER_WEEK} readings; "
+              f"out of range = outside the lab's reference range"]
+    for window_days in sorted(set(windows)):
+        start = end - timedelta(days=window_days - 1)
+        vitals, labs = [], []
+        for series in series_list:
+            stats = summarize(series, start, end)
+            if stats is None:
+                continue
+            if series.kind == "lab":
+                labs.append(_lab_line(series, stats))
+            else:
+                vitals.append(_vital_line(series, stats))
+
+        output.append(_window_title(window_days, start, end, today))
+        if vitals:
+            output.extend([VITALS_HEADER] + vitals)
+        if labs:
+            output.extend([LABS_HEADER] + labs)
+        if not vitals and not labs:
+            output.append("(no readings)")
+    return "\n".join(output)
+
+
+def digest_records(records, end, windows=DIGEST_WINDOWS, today=None):
+    """Digest over every dated table in the patient records ("" if there are none)."""
+    series_list = []
+    for record in records:
+        if record.rollup is not None:
+            series_list.extend(series_from_rollup(record.rollup))
+        elif record.table is not None:
+            series_list.extend(series_from_table(record.table))
+    if not series_list:
+        return ""
+    return digest_text(series_list, end, windows, today)
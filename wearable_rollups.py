@@ -0,0 +1,401 @@
+"""
+Streaming ingestion of high-frequency wearable exports (minute-level vitals,
+CGM readings) into daily, weekly and monthly rollups.
+
+A large CSV is never read into memory as a whole: it is read in blocks of
+CHUNK_BYTES (cut at the last complete line), each block becomes NumPy
+arrays, and only per-period aggregates survive it. Every rollup row holds
+mergeable stats for one (period, metric):
+
+    period,metric,n,sum,min,max,first,last
+
+so the mean, extremes, reading counts and first/last values of any window
+can be recomputed from them exactly (first/last are in file order).
+
+Rollups are stored next to the export, in <folder>/.rollups/<file name>/
+(hidden, so the patient loader skips it), as append-only CSVs plus a
+state.json recording how many bytes of the export were ingested and how
+long each rollup file was at that point. When the export grows, only the
+new bytes are read and the new partial rows are appended; rows with the
+same (period, metric) are merged when the rollups are loaded. If the
+export was rewritten rather than appended to (its header or the bytes
+before the recorded offset changed, or it shrank), the rollups are rebuilt.
+A crash between appending rows and writing the state is repaired by
+truncating the rollup files back to their committed length.
+
+Only "wide" exports are supported: one timestamp/date column and one
+column per metric. Quoted fields spanning several lines are not.
+
+    python wearable_rollups.py <export.csv>
+"""
+import csv
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import namedtuple
+from datetime import date
+from io import StringIO
+
+import numpy as np
+
+ROLLUP_FOLDER = ".rollups"
+STATE_FILE = "state.json"
+CHUNK_BYTES = 1024 * 1024
+PERIODS = ("daily", "weekly", "monthly")
+ROLLUP_COLUMNS = ["period", "metric", "n", "sum", "min", "max", "first", "last"]
+TIME_COLUMNS = ("timestamp", "datetime", "date", "time")
+FINGERPRINT_BYTES = 4096
+METRIC_MIN_NUMERIC = 0.9   # share of numeric cells for a column to count as a metric ("NA" gaps are fine)
+
+RollupTable = namedtuple("RollupTable", "ordinals n sum min max first last")
+
+_ingest_locks = {}
+_ingest_locks_guard = threading.Lock()
+
+
+def _float_or_nan(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def find_time_column(fieldnames):
+    lower = [name.strip().lower() for name in fieldnames]
+    for candidate in TIME_COLUMNS:
+        if candidate in lower:
+            return fieldnames[lower.index(candidate)]
+    for i, name in enumerate(lower):
+        if name.endswith(("timestamp", "date", "time")):
+            return fieldnames[i]
+    return None
+
+
+def _period_start(ordinal, period):
+    """Ordinal of the first day of the day/week (Monday)/month containing `ordinal`."""
+    if period == "daily":
+        return ordinal
+    if period == "weekly":
+        return ordinal - (ordinal - 1) % 7  # date.fromordinal(1) is a Monday
+    return date.fromordinal(ordinal).replace(day=1).toordinal()
+
+
+def _merge(acc, key, n, total, low, high, first, last):
+    """Merges one partial (period, metric) aggregate into `acc`; later partials come later in the file."""
+    current = acc.get(key)
+    if current is None:
+        acc[key] = [n, total, low, high, first, last]
+    else:
+        current[0] += n
+        current[1] += total
+        current[2] = min(current[2], low)
+        current[3] = max(current[3], high)
+        current[5] = last
+
+
+# ----------------------------------------------------------------------
+# Chunk aggregation
+# ----------------------------------------------------------------------
+def _column_values(cells):
+    try:
+        return np.fromiter(map(float, cells), dtype=np.float64, count=len(cells))
+    except ValueError:
+        return np.fromiter(map(_float_or_nan, cells), dtype=np.float64, count=len(cells))
+
+
+def _day_ordinals(cells):
+    """Day ordinal of every timestamp cell (0 where it doesn't start with a YYYY-MM-DD date)."""
+    days, inverse = np.unique(np.array(cells, dtype="U10"), return_inverse=True)
+    ordinals = np.zeros(len(days), dtype=np.int64)
+    for i, day in enumerate(days):
+        try:
+            ordinals[i] = date.fromisoformat(day).toordinal()
+        except ValueError:
+            pass
+    return ordinals[inverse.ravel()]
+
+
+def aggregate_chunk(ordinals, values_by_metric, acc):
+    """Adds per-day aggregates of one chunk (arrays in file order) to `acc` {(day, metric): stats}."""
+    order = np.argsort(ordinals, kind="stable")  # stable: keeps file order within a day
+    ordinals = ordinals[order]
+    for metric, values in values_by_metric.items():
+        values = values[order]
+        keep = ~np.isnan(values) & (ordinals > 0)
+        days, values = ordinals[keep], values[keep]
+        if not len(days):
+            continue
+        starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+        ends = np.r_[starts[1:], len(days)]
+        stats = zip(days[starts].tolist(), (ends - starts).tolist(),
+                    np.add.reduceat(values, starts).tolist(),
+                    np.minimum.reduceat(values, starts).tolist(),
+                    np.maximum.reduceat(values, starts).tolist(),
+                    values[starts].tolist(), values[ends - 1].tolist())
+        for day, n, total, low, high, first, last in stats:
+            _merge(acc, (day, metric), n, total, low, high, first, last)
+
+
+def _rollup_periods(daily):
+    """{period: {(period_start, metric): stats}} from the per-day aggregates."""
+    periods = {"daily": daily}
+    for period in PERIODS[1:]:
+        acc = {}
+        for (day, metric), stats in sorted(daily.items()):
+            _merge(acc, (_period_start(day, period), metric), *stats)
+        periods[period] = acc
+    return periods
+
+
+# ----------------------------------------------------------------------
+# Rollup store
+# ----------------------------------------------------------------------
+class Rollups:
+    """Merged daily/weekly/monthly rollups of one export: {metric: RollupTable} per period."""
+
+    def __init__(self, name, readings, metrics, tables):
+        self.name = name
+        self.readings = readings
+        self.metrics = metrics
+        self.daily, self.weekly, self.monthly = (tables[p] for p in PERIODS)
+
+    @property
+    def first_date(self):
+        firsts = [int(t.ordinals[0]) for t in self.daily.values() if len(t.ordinals)]
+        return date.fromordinal(min(firsts)) if firsts else None
+
+    @property
+    def last_date(self):
+        lasts = [int(t.ordinals[-1]) for t in self.daily.values() if len(t.ordinals)]
+        return date.fromordinal(max(lasts)) if lasts else None
+
+    def rows(self, period, start=None, end=None):
+        """Rollup rows (period start, metric, n, min, max, mean, last) with start <= period start <= end."""
+        lo = start.toordinal() if start else 0
+        hi = end.toordinal() if end else date.max.toordinal()
+        rows = []
+        for metric in self.metrics:
+            table = getattr(self, period).get(metric)
+            if table is None:
+                continue
+            for i in range(*np.searchsorted(table.ordinals, [lo, hi + 1])):
+                rows.append({
+                    "date": date.fromordinal(int(table.ordinals[i])).isoformat(), "metric": metric,
+                    "n": str(int(table.n[i])), "min": _fmt(table.min[i]), "max": _fmt(table.max[i]),
+                    "mean": _fmt(table.sum[i] / table.n[i]), "last": _fmt(table.last[i]),
+                })
+        rows.sort(key=lambda row: row["date"])  # stable: metrics stay in column order within a period
+        return rows
+
+
+def _fmt(value):
+    return f"{round(float(value), 2):g}"
+
+
+def _tables(acc, metrics):
+    """{metric: RollupTable} sorted by period start."""
+    tables = {}
+    for metric in metrics:
+        items = sorted((key[0], stats) for key, stats in acc.items() if key[1] == metric)
+        if not items:
+            continue
+        columns = list(zip(*(stats for _, stats in items)))
+        tables[metric] = RollupTable(np.array([k for k, _ in items], dtype=np.int64),
+                                     *(np.array(c, dtype=np.float64) for c in columns))
+    return tables
+
+
+def _read_rollup_file(path, committed):
+    """Merged {(period_start, metric): stats} from the first `committed` bytes of a rollup file."""
+    acc = {}
+    if not committed:
+        return acc
+    with open(path, "rb") as f:
+        text = f.read(committed).decode("utf-8")
+    for row in csv.DictReader(StringIO(text)):
+        _merge(acc, (date.fromisoformat(row["period"]).toordinal(), row["metric"]),
+               int(row["n"]), float(row["sum"]), float(row["min"]), float(row["max"]),
+               float(row["first"]), float(row["last"]))
+    return acc
+
+
+def _append_rollup_rows(path, periods_acc, committed):
+    """Appends partial rows after the committed length (dropping anything an interrupted run left); returns the new length."""
+    with open(path, "ab") as f:
+        f.truncate(committed)
+        f.seek(committed)
+        lines = [] if committed else [",".join(ROLLUP_COLUMNS)]
+        for (ordinal, metric), (n, total, low, high, first, last) in sorted(periods_acc.items()):
+            lines.append(",".join([date.fromordinal(ordinal).isoformat(), metric, str(n),
+                                   repr(total), repr(low), repr(high), repr(first), repr(last)]))
+        if lines:
+            f.write(("\n".join(lines) + "\n").encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
+        return f.tell()
+
+
+def _write_state(folder, state):
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, os.path.join(folder, STATE_FILE))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _read_state(folder):
+    try:
+        with open(os.path.join(folder, STATE_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _fingerprint(f, offset):
+    """Hash of the export's bytes just before `offset`, to tell an append from a rewrite."""
+    start = max(0, offset - FINGERPRINT_BYTES)
+    f.seek(start)
+    return hashlib.sha1(f.read(offset - start)).hexdigest()
+
+
+def rollup_folder(path):
+    folder, name = os.path.split(path)
+    return os.path.join(folder, ROLLUP_FOLDER, name)
+
+
+def _ingest_lock(folder):
+    with _ingest_locks_guard:
+        return _ingest_locks.setdefault(folder, threading.Lock())
+
+
+# ----------------------------------------------------------------------
+# Ingestion
+# ----------------------------------------------------------------------
+def _usable_state(state, f, size):
+    if not state or state.get("offset", 0) > size:
+        return False
+    if state["offset"] < size and not state.get("tail_complete", True):
+        return False  # the last ingested line had no newline and may have been continued
+    return _fingerprint(f, state["offset"]) == state.get("fingerprint")
+
+
+def _new_state(f):
+    header_line = f.readline()
+    fieldnames = next(csv.reader([header_line.decode("utf-8-sig")]), [])
+    fieldnames = [name.strip() for name in fieldnames]
+    return {"offset": f.tell(), "fieldnames": fieldnames, "time_column": find_time_column(fieldnames),
+            "metrics": None, "readings": 0, "rows_skipped": 0, "tail_complete": True,
+            "committed": {period: 0 for period in PERIODS}}
+
+
+def _detect_metrics(fieldnames, columns, time_column):
+    """Numeric columns of the first chunk: at least METRIC_MIN_NUMERIC of the non-empty cells parse as numbers."""
+    metrics = []
+    for name, cells in zip(fieldnames, columns):
+        if name == time_column:
+            continue
+        present = [cell for cell in cells if cell]
+        if present and (~np.isnan(_column_values(present))).mean() >= METRIC_MIN_NUMERIC:
+            metrics.append(name)
+    return metrics
+
+
+def _ingest_block(text, state, daily):
+    rows = [row for row in csv.reader(StringIO(text)) if row]
+    width = len(state["fieldnames"])
+    well_formed = [row for row in rows if len(row) == width]
+    state["rows_skipped"] += len(rows) - len(well_formed)
+    if not well_formed:
+        return
+
+    columns = list(zip(*well_formed))
+    if state["metrics"] is None:
+        state["metrics"] = _detect_metrics(state["fieldnames"], columns, state["time_column"])
+    index = {name: i for i, name in enumerate(state["fieldnames"])}
+    ordinals = _day_ordinals(columns[index[state["time_column"]]])
+    values = {metric: _column_values(columns[index[metric]]) for metric in state["metrics"]}
+    aggregate_chunk(ordinals, values, daily)
+    state["readings"] += int((ordinals > 0).sum())
+
+
+def ingest_csv(path, chunk_bytes=CHUNK_BYTES):
+    """
+    Brings the rollups of `path` up to date (reading only bytes not ingested
+    yet) and returns them as Rollups. Raises ValueError for exports without
+    a timestamp/date column.
+    """
+    folder = rollup_folder(path)
+    with _ingest_lock(folder):
+        os.makedirs(folder, exist_ok=True)
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            state = _read_state(folder)
+            if not _usable_state(state, f, size):
+                if state:
+                    print(f"♻️ {os.path.basename(path)} was rewritten, rebuilding its rollups")
+                shutil.rmtree(folder)
+                os.makedirs(folder)
+                f.seek(0)
+                state = _new_state(f)
+            if not state["time_column"]:
+                raise ValueError(f"no timestamp or date column in {os.path.basename(path)}")
+
+            daily = {}
+            f.seek(state["offset"])
+            remaining = size - state["offset"]  # rows appended while this runs wait for the next call
+            pending = b""
+            while remaining > 0:
+                block = f.read(min(chunk_bytes, remaining))
+                if not block:
+                    break
+                remaining -= len(block)
+                block = pending + block
+                cut = block.rfind(b"\n") + 1
+                pending = block[cut:]
+                if cut:
+                    _ingest_block(block[:cut].decode("utf-8"), state, daily)
+            if pending:
+                _ingest_block(pending.decode("utf-8"), state, daily)
+            state["tail_complete"] = not pending
+            state["offset"] = size
+            state["fingerprint"] = _fingerprint(f, size)
+
+        if daily:
+            for period, acc in _rollup_periods(daily).items():
+                state["committed"][period] = _append_rollup_rows(
+                    os.path.join(folder, f"{period}.csv"), acc, state["committed"][period])
+        _write_state(folder, state)
+        return load_rollups(path, state)
+
+
+def load_rollups(path, state=None):
+    """The merged rollups of `path` as last committed (None if it was never ingested)."""
+    folder = rollup_folder(path)
+    state = state or _read_state(folder)
+    if state is None:
+        return None
+    metrics = state["metrics"] or []
+    tables = {
+        period: _tables(_read_rollup_file(os.path.join(folder, f"{period}.csv"), state["committed"][period]), metrics)
+        for period in PERIODS
+    }
+    return Rollups(os.path.basename(path), state["readings"], metrics, tables)
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    started = time.perf_counter()
+    rollups = ingest_csv(sys.argv[1])
+    print(f"📈 {rollups.name}: {rollups.readings:,} readings of {', '.join(rollups.metrics)}, "
+          f"{rollups.first_date} → {rollups.last_date} ({time.perf_counter() - started:.2f}s)")
+    for row in rollups.rows("monthly"):
+        print(" | ".join(row.values()))
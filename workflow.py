@@ -387,22 +387,48 @@
 import os
 import io
 import streamlit as st
-from rapidfuzz import fuzz
 from google import genai
 from google.genai import types
-from pathlib import Path
 import json  # To read JSON files
-import csv   # To read CSV files
-from io import StringIO # To handle CSV reading from string data
+import hashlib
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeout
+from types import SimpleNamespace
 # import anthropic
 from anthropic import Anthropic
 
+from citations import CitationFormatter, format_citations
+from guideline_dedup import dedupe_chunks
+from guideline_resolver import GuidelineResolver
+from framework_registry import (
+    RELOAD_CHECK_SECONDS, DriveFolderSource, FolderSource, FrameworkRegistry, ModuleFileSource, render_dynamic
+)
+from patient_data import (
+    DEFAULT_WINDOW_DAYS, records_signature, render_patient_data, window_bounds
+)
+from patient_registry import PatientRegistry
+from prompt_budget import fit_prompt, format_report
+from safety_linter import SafetyLinter, lint_text, rules_for
+from vitals_digest import DIGEST_WINDOWS, digest_records
+
 # --- Configuration & Secrets ---
 # WARNING: Embed your actual key here. Using a placeholder for safety.
 
 GEMINI_API_KEY = st.secrets["GEMINI_API_KEY"]
 CLAUDE_API_KEY = st.secrets["ANTHROPIC_API_KEY"]
 GUIDELINE_STORE_NAME = st.secrets["GUIDELINE_STORE_NAME"]
+# "gemini" (FileSearch) or "local" (guideline_index over guidelines/)
+RETRIEVAL_BACKEND = st.secrets.get("RETRIEVAL_BACKEND", "gemini")
+# FileSearch is only used for grounding_metadata; the generated text is thrown
+# away, so ask for as little of it as possible (and no thinking tokens).
+RETRIEVAL_ONLY = True
+RETRIEVAL_ONLY_MAX_OUTPUT_TOKENS = 64
 
 genai_client = genai.Client(api_key=GEMINI_API_KEY)
 claude = Anthropic(api_key=CLAUDE_API_KEY)
@@ -411,6 +437,14 @@ claude = Anthropic(api_key=CLAUDE_API_KEY)
 # Define your File Search Store name (The ID you got from the indexing script)
 
 PATIENT_DATA_FOLDER = "user_data" 
+# One partition per patient under PATIENT_DATA_FOLDER, see patient_registry.py
+PATIENT_REGISTRY = PatientRegistry(PATIENT_DATA_FOLDER)
+DEFAULT_PATIENT_ID = st.secrets.get("DEFAULT_PATIENT_ID", "M_001")
+# Safety language in answers: "fix" rewrites what can be rewritten neutrally
+# and adds a missing disclaimer, "flag" only logs, "off" skips the check
+SAFETY_LINT_MODE = st.secrets.get("SAFETY_LINT_MODE", "fix")
+# Precomputed min/max/mean, trends and tracking frequency next to the raw rows
+INCLUDE_TREND_DIGEST = True
 GUIDELINE_MAP = {
     "AHA_HBP": {
         "short": "AHA_HBP",
@@ -463,127 +497,418 @@ GUIDELINE_MAP = {
     },
     "ADA_IMPR": {
         "short": "ADA_IMPR",
-        "full": " 3. Prevention or Delay of Diabetes and Associated Comorbidities - Standards of Care in Diabetes - 2025"
+        "full": " 1. Improving Care and Promoting Health in Populations - Standards of Care in Diabetes - 2025"
     }
    
 }
+# Retrieved chunk titles (file names) → GUIDELINE_MAP abbreviations, built once
+GUIDELINE_RESOLVER = GuidelineResolver(GUIDELINE_MAP)
+
+# Frameworks are compiled once per version and hot-reloaded when their source
+# changes: "file" (frameworks.py), "folder" (prompt_frameworks/) or "drive"
+FRAMEWORK_SOURCE = st.secrets.get("FRAMEWORK_SOURCE", "file")
+# Each Drive check is a Drive delta sync, so Drive is checked less often than local files
+DRIVE_FRAMEWORK_CHECK_SECONDS = 60
+
+
+def _framework_source():
+    if FRAMEWORK_SOURCE == "drive":
+        import drive_manager
+
+        def list_framework_files():
+            return [f for f in drive_manager.list_data_files() if f.get("source") == "prompt_framework"]
+        return DriveFolderSource(list_framework_files, drive_manager.fetch_files_with_content)
+    if FRAMEWORK_SOURCE == "folder":
+        return FolderSource()
+    return ModuleFileSource()
+
+
+FRAMEWORK_REGISTRY = FrameworkRegistry(
+    _framework_source(), lambda fw: build_system_prompt(fw),
+    check_seconds=DRIVE_FRAMEWORK_CHECK_SECONDS if FRAMEWORK_SOURCE == "drive" else RELOAD_CHECK_SECONDS)
 
-# NOTE: The frameworks.py file must be in the same directory
-try:
-    from frameworks import FRAMEWORK_DATA as frameworks_list
-    print("Frameworks loaded successfully from frameworks.py")
-except ImportError:
-    print("⚠️ ERROR: Could not import FRAMEWORK_DATA from frameworks.py. Ensure file exists.")
-    frameworks_list = []
-    
 # --- Helper Functions (Frameworks) ---
 
 def load_frameworks():
-    """Returns the imported list of frameworks."""
-    return frameworks_list
+    """The live framework snapshot; keep it for the whole request so it sees a single version."""
+    return FRAMEWORK_REGISTRY.current()
+
+DEFAULT_FRAMEWORK = {"name": "Default", "content": "You are a helpful assistant."}
+
 
 def choose_best_framework(user_query, frameworks):
     """Pick the closest matching framework using fuzzy matching."""
     if not frameworks:
-        return {"name": "Default", "content": "You are a helpful assistant."}
-        
-    best_score = -1
-    best_framework = frameworks[0]
-
-    for fw in frameworks:
-        # Use name and potential keywords for matching
-        match_string = fw.get("name", "") + " ".join(fw.get("keywords", []))
-        score = fuzz.partial_ratio(user_query.lower(), match_string.lower())
-        
-        if score > best_score:
-            best_score = score
-            best_framework = fw
+        return DEFAULT_FRAMEWORK
 
+    best_framework, best_score = frameworks.index.match(user_query)
     print(f"🔍 Fuzzy Score: {best_score} for {best_framework['name']}")
     return best_framework
 
 # --- Helper Functions (Patient Data Handling) ---
 
-def csv_to_llm_text(csv_data):
-    """Converts a CSV string into a readable, line-by-line text format for the LLM."""
-    output = []
-    # Use StringIO to treat the string data as a file
-    csvfile = StringIO(csv_data) 
-    reader = csv.DictReader(csvfile)
+# Formatted patient text, shared by every session: keyed by the files' versions,
+# the window and today's date (the window is capped at today)
+PATIENT_TEXT_CACHE_ENTRIES = 64
+_patient_text_cache = OrderedDict()
+_patient_text_cache_lock = threading.Lock()
 
-    if reader.fieldnames:
-        output.append("HEADERS: " + " | ".join(reader.fieldnames))
-        output.append("-" * 50)
-        
-    for i, row in enumerate(reader):
-        row_str = f"ROW {i+1}: "
-        row_details = []
-        for key, value in row.items():
-            if value and str(value).strip(): 
-                row_details.append(f"{key.strip()}={str(value).strip()}")
-        
-        output.append(row_str + ", ".join(row_details))
 
-    return "\n".join(output)
+def patient_data_with_digest(records, window_days):
+    """Windowed patient text plus trend digest, formatted once per version of the files."""
+    key = (records_signature(records), window_days, INCLUDE_TREND_DIGEST, date.today())
+    with _patient_text_cache_lock:
+        if key in _patient_text_cache:
+            _patient_text_cache.move_to_end(key)
+            return _patient_text_cache[key]
 
+    patient_text = _format_patient_data(records, window_days)
+    with _patient_text_cache_lock:
+        _patient_text_cache[key] = patient_text
+        while len(_patient_text_cache) > PATIENT_TEXT_CACHE_ENTRIES:
+            _patient_text_cache.popitem(last=False)
+    return patient_text
 
-def load_local_patient_data(folder_path=PATIENT_DATA_FOLDER):
-    """Reads and concatenates content from all files (JSON/CSV) in the local folder."""
-    print(f"📂 Loading patient data from: {folder_path}")
-    patient_text = []
-    path = Path(folder_path)
-    
-    if not path.is_dir():
-        print(f"⚠️ ERROR: Directory not found: {folder_path}")
-        return "\n--- PATIENT DATA: NONE FOUND ---\n"
-        
-    for file_path in path.iterdir():
-        if file_path.is_file() and not file_path.name.startswith('.'):
-            
-            try:
-                raw_content = file_path.read_text(encoding='utf-8')
-                content_for_llm = ""
-
-                if file_path.suffix.lower() == '.json':
-                    # Parse and format JSON data
-                    data = json.loads(raw_content)
-                    content_for_llm = json.dumps(data, indent=2) 
-                    
-                elif file_path.suffix.lower() == '.csv':
-                    # Convert CSV data to readable text format
-                    content_for_llm = csv_to_llm_text(raw_content)
-
-                else:
-                    # Treat other file types as raw text (e.g., .txt)
-                    content_for_llm = raw_content
-
-                if content_for_llm:
-                    patient_text.append(f"\n\n--- PATIENT FILE: {file_path.name} (Format: {file_path.suffix.upper()})\n{content_for_llm}")
-
-            except Exception as e:
-                print(f"⚠️ Could not process file {file_path.name}: {e}")
-                
-    if not patient_text:
-        return "\n--- PATIENT DATA: NONE FOUND ---\n"
-        
-    return "\n".join(patient_text)
 
-def generate_response(user_query):
-    print("\n🔍 Starting generate_response (Gemini File Search + Claude)")
+def _format_patient_data(records, window_days):
+    """Windowed patient text, followed by the precomputed trend digest (when enabled)."""
+    patient_text = render_patient_data(records, window_days)
+    if not INCLUDE_TREND_DIGEST or not records:
+        return patient_text
+
+    try:
+        _, end = window_bounds(records, window_days)
+        digest = digest_records(records, end, windows=(window_days,) + DIGEST_WINDOWS)
+    except Exception as e:
+        print(f"⚠️ Could not compute trend digest: {e}")
+        return patient_text
+    return f"{patient_text}\n\n--- TREND DIGEST (computed from the patient files)\n{digest}" if digest else patient_text
+
+
+def framework_window_days(framework):
+    """Data window the framework asks for, in days."""
+    return framework.get("data_window_days") or DEFAULT_WINDOW_DAYS
+
+
+def _gemini_retrieval_config(retrieval_only):
+    file_search = [{
+        "fileSearch": {
+            "fileSearchStoreNames": [GUIDELINE_STORE_NAME]
+        }
+    }]
+    if retrieval_only:
+        return types.GenerateContentConfig(
+            tools=file_search,
+            max_output_tokens=RETRIEVAL_ONLY_MAX_OUTPUT_TOKENS,
+            thinking_config=types.ThinkingConfig(thinking_budget=0),
+            temperature=0.0
+        )
+    return types.GenerateContentConfig(
+        tools=file_search,
+        max_output_tokens=2000,
+        temperature=0.2
+    )
+
+
+def _log_gemini_usage(rag_resp):
+    usage = getattr(rag_resp, "usage_metadata", None)
+    if usage is None:
+        return
+    print(f"🪙 Gemini tokens: prompt={usage.prompt_token_count}, "
+          f"output={usage.candidates_token_count}, thinking={getattr(usage, 'thoughts_token_count', None)}")
+
+
+def retrieve_guideline_chunks_gemini(user_query, patient_text, retrieval_only=RETRIEVAL_ONLY):
+    """
+    Gemini FileSearch retrieval; returns the grounding chunks (possibly empty).
+    In retrieval-only mode a full generation is only requested as a fallback
+    when the minimal call comes back without grounding.
+    """
+    chunks = _gemini_file_search(user_query, patient_text, retrieval_only)
+    if retrieval_only and not chunks:
+        print("↩️ Retrieval-only call returned no grounding, retrying with full generation")
+        chunks = _gemini_file_search(user_query, patient_text, retrieval_only=False)
+    return chunks
+
+
+def _gemini_file_search(user_query, patient_text, retrieval_only):
+    print("📄 Calling Gemini FileSearch to retrieve relevant guideline chunks...")
+
+    if retrieval_only:
+        answer_instruction = "After searching, reply with the single word DONE. The excerpts are read from the search results."
+    else:
+        answer_instruction = "Search the guidelines and return relevant excerpts with source information."
+
+    # Create a more detailed retrieval prompt
+    retrieval_prompt = f"""
+        USE THE FILE SEARCH TOOL to find information from clinical practice guidelines.
+        Search the clinical practice guidelines for information relevant to:
+
+
+Query: {user_query}
+
+Patient context: {patient_text[:600]}
+
+{answer_instruction}
+DO NOT answer from general knowledge - ONLY from the guideline documents.
+Find specific recommendations, target values, and evidence-based protocols.
+"""
+
+    # Use raw REST API format - most compatible across SDK versions
+    rag_resp = genai_client.models.generate_content(
+        model="gemini-2.5-flash",  # More stable, better free tier limits
+        contents=retrieval_prompt,
+        config=_gemini_retrieval_config(retrieval_only)
+    )
+
+    print("\n===== DEBUG: GEMINI FILESEARCH OUTPUT =====")
+    _log_gemini_usage(rag_resp)
+
+    # Check if we have candidates
+    if not rag_resp.candidates:
+        print("❌ No candidates returned by Gemini")
+        print("Response object:", rag_resp)
+        print("Prompt was:", retrieval_prompt[:300], "...")
+
+        # Check for safety ratings or blocks
+        if hasattr(rag_resp, 'prompt_feedback'):
+            print("Prompt feedback:", rag_resp.prompt_feedback)
+        return []
+
+    grounding = rag_resp.candidates[0].grounding_metadata
+    if grounding is None:
+        print("❌ No grounding metadata returned.")
+        # Check if there's any response text at all
+        try:
+            response_text = rag_resp.text if rag_resp.text else "No response text"
+            print("Response text:", response_text[:500])
+        except (AttributeError, TypeError) as e:
+            print(f"⚠️ Could not access response text: {e}")
+            print("Response object:", rag_resp)
+        return []
+
+    return grounding.grounding_chunks or []
+
+
+def retrieve_guideline_chunks_local(user_query, patient_text, top_k=20):
+    """Local BM25 + vector retrieval over guidelines/; same chunk shape as Gemini."""
+    import guideline_index
+
+    print("📄 Searching local guideline index...")
+    return guideline_index.search(f"{user_query}\n{patient_text[:600]}", top_k=top_k)
+
+
+if RETRIEVAL_BACKEND == "local":
+    import guideline_index
+    guideline_index.get_index()  # starts building a missing or stale index in the background
+
+
+def retrieve_guideline_chunks(user_query, patient_text):
+    """Dispatches to the configured retrieval backend (RETRIEVAL_BACKEND)."""
+    if RETRIEVAL_BACKEND == "local":
+        return retrieve_guideline_chunks_local(user_query, patient_text)
+    return retrieve_guideline_chunks_gemini(user_query, patient_text)
+
+
+# ----------------------------------------------------------------------
+# Retrieval result cache (memory LRU → disk), keyed by normalized query +
+# patient-data fingerprint + guideline-corpus version
+# ----------------------------------------------------------------------
+RETRIEVAL_CACHE_DIR = os.path.join(".cache", "retrieval")
+RETRIEVAL_CACHE_MEMORY_ENTRIES = 256
+RETRIEVAL_CACHE_MEMORY_TTL = 10 * 60         # seconds
+RETRIEVAL_CACHE_DISK_TTL = 24 * 60 * 60      # seconds
+RETRIEVAL_CACHE_DISK_MAX_ENTRIES = 2000      # oldest entries beyond this are deleted
+RETRIEVAL_CACHE_PRUNE_EVERY = 50             # disk writes between prunes
+CORPUS_VERSION_TTL = 5 * 60                  # how often to re-check the FileSearch store
+
+_retrieval_memory = OrderedDict()
+_retrieval_lock = threading.Lock()
+_retrieval_stats = {"hits": 0, "misses": 0, "saved_seconds": 0.0}
+_corpus_version = {"value": None, "checked": 0.0}
+_disk_writes = {"since_prune": RETRIEVAL_CACHE_PRUNE_EVERY}  # first write prunes
 
-    # 1. Load & match framework
-    frameworks = load_frameworks()
-    best_fw = choose_best_framework(user_query, frameworks)
 
+def normalize_query(query):
+    """Case, punctuation and spacing don't change what retrieval returns."""
+    return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+
+def guideline_corpus_version():
+    """Version of whatever the active backend searches; changes when guidelines are re-indexed."""
+    if RETRIEVAL_BACKEND == "local":
+        import guideline_index
+        # The index being served, which lags the folder while a rebuild runs
+        return guideline_index.index_version()
+
+    now = time.monotonic()
+    if _corpus_version["value"] is None or now - _corpus_version["checked"] > CORPUS_VERSION_TTL:
+        try:
+            store = genai_client.file_search_stores.get(name=GUIDELINE_STORE_NAME)
+            _corpus_version["value"] = f"{store.update_time}:{store.active_documents_count}"
+        except Exception as e:
+            print(f"⚠️ Could not read FileSearch store version: {e}")
+            _corpus_version["value"] = _corpus_version["value"] or "unknown"
+        _corpus_version["checked"] = now
+    return f"{GUIDELINE_STORE_NAME}:{_corpus_version['value']}"
+
+
+def _retrieval_cache_key(user_query, patient_text):
+    parts = [
+        RETRIEVAL_BACKEND,
+        str(RETRIEVAL_ONLY),
+        normalize_query(user_query),
+        hashlib.sha256(patient_text.encode("utf-8")).hexdigest(),
+        guideline_corpus_version(),
+    ]
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def _chunks_to_json(chunks):
+    return [
+        {
+            "title": c.retrieved_context.title,
+            "text": c.retrieved_context.text,
+            "start_offset": getattr(c.retrieved_context, "start_offset", None),
+            "end_offset": getattr(c.retrieved_context, "end_offset", None),
+        }
+        for c in chunks
+    ]
+
+
+def _chunks_from_json(items):
+    return [SimpleNamespace(retrieved_context=SimpleNamespace(**item)) for item in items]
+
+
+def _unlink_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _read_disk_entry(key):
+    """A fresh, well-formed entry or None; expired and corrupt files are deleted."""
+    path = os.path.join(RETRIEVAL_CACHE_DIR, f"{key}.json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+        expired = time.time() - float(entry["created"]) > RETRIEVAL_CACHE_DISK_TTL
+        entry["latency"] = float(entry["latency"])
+        _chunks_from_json(entry["chunks"])
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"⚠️ Dropping unreadable retrieval cache entry {key[:12]}: {e!r}")
+        _unlink_quietly(path)
+        return None
+    if expired:
+        _unlink_quietly(path)
+        return None
+    return entry
+
+
+def _prune_disk_cache():
+    """Deletes expired entries, then the oldest ones beyond RETRIEVAL_CACHE_DISK_MAX_ENTRIES."""
+    try:
+        entries = sorted(((e.stat().st_mtime, e.path) for e in os.scandir(RETRIEVAL_CACHE_DIR)
+                          if e.is_file() and e.name.endswith((".json", ".tmp"))), reverse=True)
+    except OSError:
+        return
+    cutoff = time.time() - RETRIEVAL_CACHE_DISK_TTL
+    removed = 0
+    for i, (mtime, path) in enumerate(entries):
+        if mtime < cutoff or i >= RETRIEVAL_CACHE_DISK_MAX_ENTRIES:
+            _unlink_quietly(path)
+            removed += 1
+    if removed:
+        print(f"🧹 Removed {removed} old retrieval cache entries")
+
+
+def _write_disk_entry(key, entry):
+    try:
+        os.makedirs(RETRIEVAL_CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=RETRIEVAL_CACHE_DIR, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, os.path.join(RETRIEVAL_CACHE_DIR, f"{key}.json"))
+    except OSError as e:
+        print(f"⚠️ Could not write retrieval cache entry: {e}")
+        return
+    with _retrieval_lock:
+        _disk_writes["since_prune"] += 1
+        prune = _disk_writes["since_prune"] >= RETRIEVAL_CACHE_PRUNE_EVERY
+        if prune:
+            _disk_writes["since_prune"] = 0
+    if prune:
+        _prune_disk_cache()
+
+
+def _remember(key, entry):
+    with _retrieval_lock:
+        _retrieval_memory[key] = (time.monotonic(), entry)
+        _retrieval_memory.move_to_end(key)
+        while len(_retrieval_memory) > RETRIEVAL_CACHE_MEMORY_ENTRIES:
+            _retrieval_memory.popitem(last=False)
+
+
+def _log_retrieval_hit(tier, entry):
+    with _retrieval_lock:
+        _retrieval_stats["hits"] += 1
+        _retrieval_stats["saved_seconds"] += entry["latency"]
+        stats = dict(_retrieval_stats)
+    lookups = stats["hits"] + stats["misses"]
+    print(f"♻️ Retrieval cache hit ({tier}): saved {entry['latency']:.2f}s | "
+          f"hit rate {stats['hits']}/{lookups} ({stats['hits'] / lookups:.0%}), "
+          f"{stats['saved_seconds']:.1f}s saved total")
+
+
+def cached_retrieve_guideline_chunks(user_query, patient_text):
+    """retrieve_guideline_chunks behind the two-level retrieval cache."""
+    key = _retrieval_cache_key(user_query, patient_text)
+
+    with _retrieval_lock:
+        cached = _retrieval_memory.get(key)
+        if cached and time.monotonic() - cached[0] > RETRIEVAL_CACHE_MEMORY_TTL:
+            del _retrieval_memory[key]
+            cached = None
+        if cached:
+            _retrieval_memory.move_to_end(key)
+    if cached:
+        _log_retrieval_hit("memory", cached[1])
+        return _chunks_from_json(cached[1]["chunks"])
+
+    entry = _read_disk_entry(key)
+    if entry is not None:
+        _remember(key, entry)
+        _log_retrieval_hit("disk", entry)
+        return _chunks_from_json(entry["chunks"])
+
+    with _retrieval_lock:
+        _retrieval_stats["misses"] += 1
+
+    start = time.perf_counter()
+    chunks = retrieve_guideline_chunks(user_query, patient_text)
+    latency = time.perf_counter() - start
+
+    if chunks:  # an empty result usually means a failed call; don't pin it
+        entry = {"created": time.time(), "latency": latency, "chunks": _chunks_to_json(chunks)}
+        _remember(key, entry)
+        _write_disk_entry(key, entry)
+    print(f"🗂️ Retrieval cache miss: retrieved in {latency:.2f}s")
+    return chunks
+
+
+CLAUDE_MODEL = "claude-sonnet-4-20250514"
+CLAUDE_MAX_TOKENS = 3000
+
+
+def build_system_prompt(best_fw):
+    """Framework + citation rules for the chosen framework."""
     chosen_framework_name = best_fw["name"]
     framework_text = best_fw["content"]
 
-    print(f"🧠 Chosen Framework: {chosen_framework_name}")
-    citation_guide = "\n".join([
-    f"  - {data['short']}: {data['full']}" 
-    for key, data in GUIDELINE_MAP.items()
-])
-
+    # Numbering and the Source Citations list are done by citations.py after the answer
     system_prompt = f"""
 You MUST strictly follow everything defined in the framework. 
 Do NOT override format, tone, or safety rules.
@@ -591,213 +916,327 @@ Do NOT override format, tone, or safety rules.
 === FRAMEWORK START: {chosen_framework_name} ===
 {framework_text}
 === FRAMEWORK END ===
-The framework above contains example citations.
-DO NOT use those example names.
-
-You MUST cite ONLY from the "RETRIEVED GUIDELINE TEXT" section.
-
-1. Use ONLY these abbreviations for citations:
-{citation_guide}
 
-2. SERIALIZATION IS MANDATORY:
-   - Number citations sequentially: [1 abbreviation], [2 abbreviation], [3 abbreviation], etc.
-   - Each unique source gets a NEW number in order of first appearance
-   - NEVER reuse the same number for different sources
-   - Example: [1 AHA_HBP], [2 ADA_CDRM], [3 ADA_CKDRM] - NOT [1 AHA_HBP], [1 ADA_CDRM]
-
-3. Citation format:
-   - Inline: [number abbreviation] (e.g., [1 AHA_HBP], [2 ADA_CDRM])
-   - In Source Citations section: [number abbreviation] Full Document Name
-   - NEVER use "per [citation]" or "according to [citation]" 
-   
-4. Match the retrieved guideline filenames to these abbreviations:
-   - Look for key terms in the filename to identify the correct abbreviation
-   - Use the exact filenames from the "RETRIEVED GUIDELINE TEXT" section
-   - Examples of matching:
-     * "High Blood Pressure" in filename → AHA_HBP
-     * "Cardiovascular Disease and Risk" in filename → ADA_CDRM
-     * "Chronic Kidney Disease" in filename → ADA_CKDRM
-     * "Prevention or Delay" in filename → ADA_PREV
-     * "JNC" or "2014 Evidence" in filename → JNC8
-     * "NICE" in filename → NICE_HTN
-     * "SSATHI" in filename → SSATHI
-
-5. Source Citations section MUST:
-   - List all citations in numerical order (1, 2, 3...)
-   - Use format: [number abbreviation] Full Document Name
-   - Example:
-     [1 SSATHI] SSATHI Guidelines - South Asian Health
-     [2 AHA_HBP] Guideline for the Prevention, Detection, Evaluation and Management of High Blood Pressure in Adults...
-
-6. Rules for citing:
-   - Do NOT rename, clean, summarize, or normalize filenames
-   - Use the exact filenames from the retrieved guideline text to match to abbreviations
-   
-
-7. DO NOT use the example citation names from the framework (like "ADA", "AHA/ACC" alone). 
-   Use ONLY the abbreviations listed above (like ADA_CDRM, ADA_CKDRM, AHA_HBP).
-
-VERIFICATION BEFORE RESPONDING:
-- Check that each unique source has a different number
-- Verify numbers are sequential (1, 2, 3... no gaps or repeats)
-- Confirm Source Citations section lists all sources in numerical order
-- Verify all citations reference actual content from RETRIEVED GUIDELINE TEXT section
+CITATIONS (these replace the framework's citation numbering, abbreviation guide and Source Citations list):
+- Cite ONLY from the "RETRIEVED GUIDELINE TEXT" section. Each chunk there is labelled "cite as: ABBREVIATION".
+- Cite with that label in square brackets at the end of the statement, without a number: [AHA_HBP]
+- Several sources for one statement: [AHA_HBP] [ADA_CDRM]
+- Never use the framework's example names (like "ADA" or "AHA/ACC" alone).
+- Do NOT write a Source Citations section; it is numbered and added automatically before the educational disclaimer.
 """
+    return system_prompt
 
-    # 2. Load patient data
-    patient_text = load_local_patient_data()
 
-    # 3. USE GEMINI FILE SEARCH FOR RETRIEVAL
-    print("📄 Calling Gemini FileSearch to retrieve relevant guideline chunks...")
+NO_GUIDELINES_TEXT = "No guideline chunks retrieved."
+GUIDELINE_ERROR_TEXT = "Error retrieving guidelines."
 
+
+def retrieve_guideline_text(user_query, patient_text):
+    """Retrieval stage: returns the formatted guideline chunks for the prompt, best first."""
     # Initialize variables BEFORE try block
-    guideline_text = "No guideline chunks retrieved."
-    sources_set = set()
-    cleaned_sources = []
+    retrieved_chunks = []
 
     try:
-        # Create a more detailed retrieval prompt
-        retrieval_prompt = f"""
-        USE THE FILE SEARCH TOOL to find information from clinical practice guidelines.
-        Search the clinical practice guidelines for information relevant to:
+        chunks = cached_retrieve_guideline_chunks(user_query, patient_text)
+        print(f"✅ Total Chunks Retrieved: {len(chunks)}")
+
+        # Drop the same passage returned from "X.pdf" and "Copy of X.pdf"
+        chunks, dedup_report = dedupe_chunks(chunks, text_of=lambda c: c.retrieved_context.text)
+        if dedup_report["duplicates_dropped"]:
+            print(f"🧬 Dropped {dedup_report['duplicates_dropped']} duplicate chunks "
+                  f"({dedup_report['bytes_saved']} chars, ~{dedup_report['tokens_saved']} tokens saved)")
+
+        # OPTIONAL: Limit to top N chunks if you want control
+        MAX_CHUNKS = 10  # Set to None to use all chunks
+        if MAX_CHUNKS and len(chunks) > MAX_CHUNKS:
+            print(f"⚠️ Limiting to top {MAX_CHUNKS} chunks (out of {len(chunks)})")
+            chunks = chunks[:MAX_CHUNKS]
+
+        if len(chunks) == 0:
+            print("❌ No chunks returned by retrieval.")
+        else:
+            for idx, c in enumerate(chunks):
+                print(f"\n--- Chunk {idx+1} ---")
+                print("Source File:", c.retrieved_context.title)
 
+                # Try to access offset attributes if they exist
+                try:
+                    print("Start Offset:", c.retrieved_context.start_offset)
+                    print("End Offset:", c.retrieved_context.end_offset)
+                except AttributeError:
+                    pass  # These attributes may not exist in all SDK versions
 
-Query: {user_query}
+                CHUNK_PREVIEW_LEN = 1000  # or bigger
+                chunk_text = c.retrieved_context.text
 
-Patient context: {patient_text[:600]}
+                print(f"Text Snippet ({min(len(chunk_text), CHUNK_PREVIEW_LEN)} chars):")
+                print(chunk_text[:CHUNK_PREVIEW_LEN], "...")
 
-Search the guidelines and return relevant excerpts with source information.
-DO NOT answer from general knowledge - ONLY from the guideline documents.
-Find specific recommendations, target values, and evidence-based protocols.
-"""
+                print("----------------------------------------")
 
-        # Use raw REST API format - most compatible across SDK versions
-        rag_resp = genai_client.models.generate_content(
-            model="gemini-2.5-flash",  # More stable, better free tier limits
-            contents=retrieval_prompt,
-            config=types.GenerateContentConfig(
-                tools=[{
-                    "fileSearch": {
-                        "fileSearchStoreNames": [GUIDELINE_STORE_NAME]
-                    }
-                }],
-                max_output_tokens=2000,
-                temperature=0.2
-            )
-        )
+                abbreviation = GUIDELINE_RESOLVER.abbreviation(c.retrieved_context.title)
+                label = f" | cite as: {abbreviation}" if abbreviation else ""
+                retrieved_chunks.append(f"[From: {c.retrieved_context.title}{label}]\n{c.retrieved_context.text}")
 
-        print("\n===== DEBUG: GEMINI FILESEARCH OUTPUT =====")
-        
-        # Check if we have candidates
-        if not rag_resp.candidates:
-            print("❌ No candidates returned by Gemini")
-            print("Response object:", rag_resp)
-            print("Prompt was:", retrieval_prompt[:300], "...")
-            
-            # Check for safety ratings or blocks
-            if hasattr(rag_resp, 'prompt_feedback'):
-                print("Prompt feedback:", rag_resp.prompt_feedback)
-            
-            guideline_text = "No guideline chunks retrieved."
-            sources_set = set()
-        else:
-            grounding = rag_resp.candidates[0].grounding_metadata
-            
-            if grounding is None:
-                print("❌ No grounding metadata returned.")
-                # Check if there's any response text at all
-                try:
-                    response_text = rag_resp.text if rag_resp.text else "No response text"
-                    print("Response text:", response_text[:500])
-                except (AttributeError, TypeError) as e:
-                    print(f"⚠️ Could not access response text: {e}")
-                    print("Response object:", rag_resp)
-            else:
-                chunks = grounding.grounding_chunks
-                print(f"✅ Total Chunks Retrieved: {len(chunks)}")
-
-                # OPTIONAL: Limit to top N chunks if you want control
-                MAX_CHUNKS = 10  # Set to None to use all chunks
-                if MAX_CHUNKS and len(chunks) > MAX_CHUNKS:
-                    print(f"⚠️ Limiting to top {MAX_CHUNKS} chunks (out of {len(chunks)})")
-                    chunks = chunks[:MAX_CHUNKS]
-
-                retrieved_chunks = []
-
-                if len(chunks) == 0:
-                    print("❌ No chunks returned by FileSearch.")
-                else:
-                    for idx, c in enumerate(chunks):
-                        print(f"\n--- Chunk {idx+1} ---")
-                        print("Source File:", c.retrieved_context.title)
-                        
-                        # Try to access offset attributes if they exist
-                        try:
-                            print("Start Offset:", c.retrieved_context.start_offset)
-                            print("End Offset:", c.retrieved_context.end_offset)
-                        except AttributeError:
-                            pass  # These attributes may not exist in all SDK versions
-                        
-                        CHUNK_PREVIEW_LEN = 1000  # or bigger
-                        chunk_text = c.retrieved_context.text
-
-                        print(f"Text Snippet ({min(len(chunk_text), CHUNK_PREVIEW_LEN)} chars):")
-                        print(chunk_text[:CHUNK_PREVIEW_LEN], "...")
-
-                        print("----------------------------------------")
-                        
-                        retrieved_chunks.append(f"[From: {c.retrieved_context.title}]\n{c.retrieved_context.text}")
-                        sources_set.add(c.retrieved_context.title)
-
-                    guideline_text = "\n\n---\n\n".join(retrieved_chunks)
-        
-        # Clean up source names for better citation formatting (always run this)
-       
     except Exception as e:
-        print("⚠️ FileSearch error:", e)
+        print("⚠️ Retrieval error:", e)
         import traceback
         traceback.print_exc()
         # Additional debugging
         print("\n=== DEBUGGING INFO ===")
-        print("Model:", "gemini-2.5-pro")
+        print("Backend:", RETRIEVAL_BACKEND)
         print("File store:", GUIDELINE_STORE_NAME)
         print("Query:", user_query)
         print("Patient data length:", len(patient_text) if patient_text else 0)
-        
-        guideline_text = "Error retrieving guidelines."
-        sources_set = set()
-    
-    # 4. SEND EVERYTHING TO CLAUDE FOR FINAL ANSWER
+
+        retrieved_chunks = [GUIDELINE_ERROR_TEXT]
+
+    return retrieved_chunks
+
+
+# ----------------------------------------------------------------------
+# Pipeline: framework selection runs alongside patient loading → retrieval
+# ----------------------------------------------------------------------
+PIPELINE_STAGE_DEADLINES = {   # seconds, from when the stage is awaited
+    "framework": 5,
+    "patient_data": 15,
+    "retrieval": 60,
+}
+_pipeline_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="pipeline")
+
+# Stages an answer can't do without: with no patient data Claude would answer
+# "no data on file", so the user gets one of these messages (timed out, failed)
+REQUIRED_STAGE_MESSAGES = {
+    "patient_data": (
+        "⏳ Your health data is still loading (the first import of a large file can take a few minutes). "
+        "Please ask again in a moment.",
+        "⚠️ Your health data could not be loaded, so I can't answer from it right now. Please try again.",
+    ),
+}
+_patient_loads = {}   # patient_id → latest patient_data future, reused while it is still running
+_patient_loads_lock = threading.Lock()
+
+
+class StageUnavailable(Exception):
+    """A required pipeline stage timed out or failed; the message is shown to the user."""
+
+
+def _run_stage(timings, name, fn, *args):
+    start = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        timings[name] = time.perf_counter() - start
+
+
+def _await_stage(name, future, fallback=None):
+    """
+    Result of a pipeline stage, or `fallback` if it fails or misses its
+    deadline; raises StageUnavailable instead for REQUIRED_STAGE_MESSAGES stages.
+    """
+    deadline = PIPELINE_STAGE_DEADLINES[name]
+    required = REQUIRED_STAGE_MESSAGES.get(name)
+    try:
+        return future.result(timeout=deadline)
+    except FuturesTimeout:
+        if required:
+            print(f"⏱️ Stage '{name}' missed its {deadline}s deadline, still running; not answering without it")
+            raise StageUnavailable(required[0])
+        print(f"⏱️ Stage '{name}' missed its {deadline}s deadline, continuing without it")
+        return fallback
+    except Exception as e:
+        print(f"⚠️ Stage '{name}' failed{'' if required else ', continuing without it'}: {e}")
+        import traceback
+        traceback.print_exc()
+        if required:
+            raise StageUnavailable(required[1]) from e
+        return fallback
+
+
+def _load_patient_records(timings, patient_id):
+    """Future of the patient's records; a load still running (e.g. a large first ingest) is joined, not repeated."""
+    with _patient_loads_lock:
+        future = _patient_loads.get(patient_id)
+        if future is None or future.done():
+            future = _patient_loads[patient_id] = _pipeline_pool.submit(
+                _run_stage, timings, "patient_data", PATIENT_REGISTRY.records, patient_id)
+        return future
+
+
+def build_prompts(user_query, patient_id=DEFAULT_PATIENT_ID):
+    """
+    Runs framework selection, patient loading and retrieval; returns
+    (system blocks, user content blocks, chosen framework). Raises
+    StageUnavailable when the patient data isn't ready.
+
+    Framework selection and patient parsing don't depend on each other, so
+    they run side by side; the framework's data window then shapes the
+    patient text, and the system prompt is built while retrieval (which needs
+    the patient text) is in flight. Output is identical to running the
+    stages in order.
+    """
+    print("\n🔍 Starting generate_response (Gemini File Search + Claude)")
+    started = time.perf_counter()
+    timings = {}
+
+    # 1. Match framework and parse patient data in parallel
+    frameworks = load_frameworks()
+    framework_future = _pipeline_pool.submit(
+        _run_stage, timings, "framework", choose_best_framework, user_query, frameworks)
+    print(f"📂 Loading patient data for: {patient_id}")
+    patient_future = _load_patient_records(timings, patient_id)
+
+    # 2. The framework decides the data window; retrieval starts once the patient text is ready
+    best_fw = _await_stage("framework", framework_future, DEFAULT_FRAMEWORK)
+    print(f"🧠 Chosen Framework: {best_fw['name']} (version {best_fw.get('version', 'default')})")
+    window_days = framework_window_days(best_fw)
+    patient_records = _await_stage("patient_data", patient_future)
+    patient_text = patient_data_with_digest(patient_records, window_days)
+    print(f"🗓️ Patient data window: last {window_days} days")
+    retrieval_future = _pipeline_pool.submit(
+        _run_stage, timings, "retrieval", retrieve_guideline_text, user_query, patient_text)
+
+    # 3. Compiled frameworks carry their system prompt; the default one is built here
+    system_prompt = best_fw.get("system_prompt") or build_system_prompt(best_fw)
+    dynamic_values = render_dynamic(best_fw, {
+        "today": datetime.now().strftime("%B %d, %Y"), "window_days": window_days, "patient_id": patient_id})
+
+    guideline_chunks = _await_stage("retrieval", retrieval_future, [GUIDELINE_ERROR_TEXT])
+
+    critical_path = time.perf_counter() - started
+    breakdown = " | ".join(f"{name} {seconds:.3f}s" for name, seconds in timings.items())
+    print(f"⏱️ Stages: {breakdown} | sequential sum {sum(timings.values()):.3f}s "
+          f"→ critical path {critical_path:.3f}s")
+
+    # 4. Fit patient data and guideline chunks into the token budget
+    patient_text, guideline_chunks, budget_report = fit_prompt(
+        system_prompt, patient_text, guideline_chunks, user_query)
+    print(format_report(budget_report))
+    guideline_text = "\n\n---\n\n".join(guideline_chunks) or NO_GUIDELINES_TEXT
+
+    # 5. SEND EVERYTHING TO CLAUDE FOR FINAL ANSWER
     print("🧠 Sending context to Claude for final structured answer...")
 
-    final_prompt = f"""
+    # Most stable first, so Anthropic prompt caching can reuse the prefix:
+    # framework + citation rules (system) → patient data → guideline chunks → today + question.
+    # Each stable part ends with a cache breakpoint; nothing volatile comes before one.
+    system = [_cached_block(system_prompt)]
+    content = [
+        _cached_block(f"""
 Below is all the available information to answer the user's question.
 Use it STRICTLY under the rules of the provided framework.
 
 === PATIENT DATA ===
 {patient_text}
-
+"""),
+        _cached_block(f"""
 === RETRIEVED GUIDELINE TEXT ===
 {guideline_text}
-
+"""),
+        {"type": "text", "text": f"""
 
 ---
 
+Today is {datetime.now().strftime("%B %d, %Y")}.
+{dynamic_values}
 User question: {user_query}
-"""
+"""},
+    ]
+    return system, content, best_fw
+
+
+def _cached_block(text):
+    return {"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}
+
+
+def _log_claude_usage(usage, started):
+    """Token/latency report, including how much of the prompt came from the cache."""
+    if usage is None:
+        return
+    cache_read = getattr(usage, "cache_read_input_tokens", 0) or 0
+    cache_write = getattr(usage, "cache_creation_input_tokens", 0) or 0
+    prompt_tokens = usage.input_tokens + cache_read + cache_write
+    print(f"🪙 Claude tokens: prompt={prompt_tokens} (cache read={cache_read}, cache write={cache_write}, "
+          f"uncached={usage.input_tokens}), output={usage.output_tokens}, "
+          f"cached share={cache_read / prompt_tokens if prompt_tokens else 0:.0%}, "
+          f"latency={time.perf_counter() - started:.2f}s")
+
+
+def generate_response(user_query, patient_id=DEFAULT_PATIENT_ID):
+    try:
+        system, content, best_fw = build_prompts(user_query, patient_id)
+    except StageUnavailable as e:
+        return str(e)
 
     try:
+        started = time.perf_counter()
         claude_resp = claude.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=3000,
-            system=system_prompt,
-            messages=[{"role": "user", "content": final_prompt}]
+            model=CLAUDE_MODEL,
+            max_tokens=CLAUDE_MAX_TOKENS,
+            system=system,
+            messages=[{"role": "user", "content": content}]
         )
+        _log_claude_usage(claude_resp.usage, started)
+
+        answer = format_citations(claude_resp.content[0].text, GUIDELINE_MAP, rules_for(best_fw).disclaimer)
+        if SAFETY_LINT_MODE != "off":
+            answer = lint_text(answer, rules_for(best_fw), SAFETY_LINT_MODE)
+        return answer
+
+    except Exception as e:
+        print("Claude API Error:", e)
+        import traceback
+        traceback.print_exc()
+        return f"Error generating final answer: {e}"
+
 
-        return claude_resp.content[0].text
+def generate_response_stream(user_query, patient_id=DEFAULT_PATIENT_ID):
+    """
+    Same pipeline as generate_response, but yields Claude's answer as text
+    deltas as they arrive. Logs time-to-first-token and total latency.
+    """
+    started = time.perf_counter()
+    try:
+        system, content, best_fw = build_prompts(user_query, patient_id)
+    except StageUnavailable as e:
+        yield str(e)
+        return
+    claude_started = time.perf_counter()
+    first_token_at = None
+    rules = rules_for(best_fw)
+    citations = CitationFormatter(GUIDELINE_MAP, rules.disclaimer)
+    linter = SafetyLinter(rules, SAFETY_LINT_MODE) if SAFETY_LINT_MODE != "off" else None
+
+    try:
+        with claude.messages.stream(
+            model=CLAUDE_MODEL,
+            max_tokens=CLAUDE_MAX_TOKENS,
+            system=system,
+            messages=[{"role": "user", "content": content}]
+        ) as stream:
+            for text in stream.text_stream:
+                text = citations.feed(text)
+                if linter and text:
+                    text = linter.feed(text)
+                if not text:
+                    continue
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                yield text
+            rest = citations.finish()
+            if linter:
+                rest = linter.feed(rest) + linter.finish()
+            if rest:
+                yield rest
+            _log_claude_usage(stream.get_final_message().usage, claude_started)
 
     except Exception as e:
         print("Claude API Error:", e)
         import traceback
         traceback.print_exc()
-        return f"Error generating final answer: {e}"
\ No newline at end of file
+        yield f"Error generating final answer: {e}"
+
+    finished = time.perf_counter()
+    if first_token_at is not None:
+        print(f"⏱️ Time to first token: {first_token_at - started:.2f}s "
+              f"(Claude: {first_token_at - claude_started:.2f}s), total: {finished - started:.2f}s")
\ No newline at end of file